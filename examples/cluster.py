@@ -92,6 +92,7 @@
 from mininet.examples.clustercli import CLI
 from mininet.log import setLogLevel, debug, info, error
 from mininet.clean import addCleanupCallback
+from mininet.journal import journal
 
 # pylint: disable=too-many-arguments
 
@@ -309,8 +310,8 @@ class RemoteOVSSwitch( RemoteMixin, OVSSwitch ):
     OVSVersions = {}
 
     def __init__( self, *args, **kwargs ):
-        # No batch startup yet
-        kwargs.update( batch=True )
+        # No batch startup yet; ovsdb-server may be remote
+        kwargs.update( batch=True, ovsdb=False )
         super( RemoteOVSSwitch, self ).__init__( *args, **kwargs )
 
     def isOldOVS( self ):  # pylint: disable=arguments-differ
@@ -369,6 +370,7 @@ def stop( self ):
         "Stop this link"
         if self.tunnel:
             self.tunnel.terminate()
+            journal.remove( 'process', 'tunnel%d' % self.tunnel.pid )
             self.intf1.delete()
             self.intf2.delete()
         else:
@@ -437,6 +439,7 @@ def makeTunnel( self, node1, node2, intfname1, intfname2,
                 dest, 'echo @' ]
         self.cmd = cmd
         tunnel = node1.rpopen( cmd, sudo=False )
+        journal.add( 'process', 'tunnel%d' % tunnel.pid, tunnel.pid )
         # When we receive the character '@', it means that our
         # tunnel should be set up
         debug( 'Waiting for tunnel to come up...\n' )
@@ -0,0 +1,296 @@
+"""
+aio: asyncio interface to Mininet nodes (Python 3 only)
+
+These coroutines drive the same shell protocol as Node.cmd(), but
+wait for output using loop.add_reader() on each node's pty instead
+of blocking in poll(). Thousands of node commands can therefore run
+concurrently on a single event loop:
+
+    results = await asyncio.gather( *[ h.acmd( 'hostname' )
+                                       for h in net.hosts ] )
+
+    async for line in h1.astream( 'ping -c3 10.0.0.2' ):
+        print( line, end='' )
+
+As with cmd(), each node runs one command at a time: concurrency
+comes from running commands on different nodes. The Node and Mininet
+methods acmd(), acmds(), astream(), aping() and aiperf() are thin
+wrappers around the functions in this module.
+"""
+
+import asyncio
+import errno
+
+from mininet.log import output, error, debug
+from mininet.util import ( fmtBps, nodeSocket, unreachableErrnos,
+                           connectCmd, connectCmdErrno )
+
+# pylint: disable=protected-access
+
+
+async def waitReadable( node ):
+    """Wait until node's output is readable, without blocking
+       node: Node"""
+    if node.readbuf:
+        return
+    loop = asyncio.get_event_loop()
+    ready = loop.create_future()
+    fd = node.stdout.fileno()
+
+    def readable():
+        "Wake up waiter"
+        if not ready.done():
+            ready.set_result( True )
+
+    loop.add_reader( fd, readable )
+    try:
+        await ready
+    finally:
+        loop.remove_reader( fd )
+
+
+async def waitStarted( node ):
+    """Wait for node's shell to finish starting up, without blocking
+       (see Node.waitStarted())
+       node: Node"""
+    while node.starting:
+        await waitReadable( node )
+        node.waitStarted( timeoutms=0 )
+
+
+async def monitor( node, findPid=True ):
+    """Wait for and return the next output of a command (see
+       Node.monitor()); node.waiting is False once it has completed
+       node: Node
+       findPid: look for PID from mnexec -p"""
+    await waitReadable( node )
+    return node.monitor( timeoutms=0, findPid=findPid )
+
+
+async def waitOutput( node, findPid=True ):
+    """Wait for a command to complete and return its output
+       node: Node
+       findPid: look for PID from mnexec -p"""
+    result = []
+    while node.waiting:
+        result.append( await monitor( node, findPid=findPid ) )
+    return ''.join( result )
+
+
+async def acmd( node, *args, **kwargs ):
+    """Run a command on node and return its output (see Node.cmd())
+       node: Node
+       args: command and arguments, or string
+       If the calling task is cancelled, the command is interrupted."""
+    debug( '*** %s : %s\n' % ( node.name, args ) )
+    await waitStarted( node )
+    node.sendCmd( *args, **kwargs )
+    try:
+        return await waitOutput( node )
+    finally:
+        node.stopCmds()
+
+
+async def acmds( node, cmds ):
+    """Run several commands on node with a single round trip to its
+       shell (see Node.cmdBatch())
+       node: Node
+       cmds: list of commands (strings or lists of arguments)
+       returns: list of ( output, exit status ) for each command"""
+    await waitStarted( node )
+    node.sendCmds( cmds )
+    debug( '*** %s : %s\n' % ( node.name, node.batchCmds ) )
+    try:
+        while node.waiting:
+            await waitReadable( node )
+            node.monitorCmds( timeoutms=0 )
+        return node.batchResults
+    finally:
+        node.stopCmds()
+
+
+async def astream( node, *args, **kwargs ):
+    """Run a command on node and yield its output a line at a time
+       node: Node
+       args: command and arguments, or string
+       If the caller stops iterating early, the command is interrupted."""
+    await waitStarted( node )
+    node.sendCmd( *args, **kwargs )
+    buf = ''
+    try:
+        while node.waiting:
+            buf += await monitor( node )
+            *lines, buf = buf.split( '\n' )
+            for line in lines:
+                yield line + '\n'
+        if buf:
+            yield buf
+    finally:
+        node.stopCmds()
+
+
+async def connectErrno( ip, port, node=None, timeout=1 ):
+    """Try once to make a TCP connection to ip:port
+       (see util.connectErrno())
+       ip: server IP address
+       port: server TCP port
+       node: node to connect from (None: our own namespace)
+       timeout: time to wait for the connection, in seconds
+       returns: 0 if connected, else errno (ETIMEDOUT on timeout)"""
+    if getattr( node, 'isRemote', False ):
+        # We can't enter a remote node's namespace, so ask its shell
+        return connectCmdErrno(
+            await acmd( node, connectCmd( ip, port, timeout ) ) )
+    if node is not None:
+        # nodeSocket() would block waiting for node's shell
+        await waitStarted( node )
+    loop = asyncio.get_event_loop()
+    sock = nodeSocket( node )
+    try:
+        await asyncio.wait_for( loop.sock_connect( sock, ( ip, port ) ),
+                                timeout )
+        return 0
+    except asyncio.TimeoutError:
+        return errno.ETIMEDOUT
+    except OSError as e:
+        return e.errno
+    finally:
+        sock.close()
+
+
+async def waitListening( client, server, port, timeout=None,
+                         maxDelay=.1 ):
+    """Wait until server is listening on port (see util.waitListening())
+       client: client Node (None: our own namespace)
+       server: server Node or IP address
+       port: TCP port
+       timeout: time to wait, in seconds (None: wait indefinitely)
+       maxDelay: maximum time between connection attempts
+       returns: True if server is listening"""
+    serverIP = server if isinstance( server, str ) else server.IP()
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    delay = .001
+    while True:
+        attempt = 1
+        if timeout:
+            attempt = max( .01, min( attempt,
+                                     start + timeout - loop.time() ) )
+        err = await connectErrno( serverIP, port, client, timeout=attempt )
+        if not err:
+            return True
+        if err in unreachableErrnos:
+            route = await acmd( client, 'route' ) if client else ''
+            error( 'no route to %s:\n%s' % ( server, route ) )
+            return False
+        if timeout and loop.time() - start >= timeout:
+            error( 'could not connect to %s on port %d\n' % ( server, port ) )
+            return False
+        debug( 'waiting for', server, 'to listen on port', port, '\n' )
+        await asyncio.sleep( delay )
+        delay = min( 2 * delay, maxDelay )
+
+
+async def aping( net, hosts=None, timeout=None ):
+    """Ping between all specified hosts (see Mininet.ping()).
+       Each host pings its peers in turn, and all hosts run at once.
+       net: Mininet
+       hosts: list of hosts
+       timeout: time to wait for a response, as string
+       returns: ploss packet loss percentage"""
+    if not hosts:
+        hosts = net.hosts
+        output( '*** Ping: testing ping reachability\n' )
+    opts = '-W %s' % timeout if timeout else ''
+
+    async def pingFrom( node ):
+        "Ping other hosts from node: return [ ( dest, sent, received ) ]"
+        results = []
+        for dest in hosts:
+            if node == dest:
+                continue
+            if dest.intfs:
+                result = await acmd( node, 'LANG=C ping -c1 %s %s' %
+                                     ( opts, dest.IP() ) )
+                sent, received = net._parsePing( result )
+                if received > sent:
+                    error( '*** Error: received too many packets' )
+                    error( '%s' % result )
+                    raise Exception( 'received too many packets' )
+            else:
+                sent, received = 0, 0
+            results.append( ( dest, sent, received ) )
+        return results
+
+    allResults = await asyncio.gather( *[ pingFrom( node )
+                                          for node in hosts ] )
+    packets = lost = 0
+    for node, results in zip( hosts, allResults ):
+        output( '%s -> ' % node.name )
+        for dest, sent, received in results:
+            packets += sent
+            lost += sent - received
+            output( ( '%s ' % dest.name ) if received else 'X ' )
+        output( '\n' )
+    if packets > 0:
+        ploss = 100.0 * lost / packets
+        output( "*** Results: %i%% dropped (%d/%d received)\n" %
+                ( ploss, packets - lost, packets ) )
+    else:
+        ploss = 0
+        output( "*** Warning: No packets sent\n" )
+    return ploss
+
+
+async def aiperf( net, hosts=None, l4Type='TCP', udpBw='10M', fmt=None,
+                  seconds=5, port=5001 ):
+    """Run iperf between two hosts (see Mininet.iperf()).
+       net: Mininet
+       hosts: list of hosts; if None, uses first and last hosts
+       l4Type: string, one of [ TCP, UDP ]
+       udpBw: bandwidth target for UDP test
+       fmt: scale/format argument (e.g. m/M for Mbps)
+       seconds: iperf time to transmit
+       port: iperf port
+       returns: two-element array of [ server, client ] speeds"""
+    hosts = hosts or [ net.hosts[ 0 ], net.hosts[ -1 ] ]
+    assert len( hosts ) == 2
+    client, server = hosts
+    output( '*** Iperf: testing', l4Type, 'bandwidth between',
+            client, 'and', server, '\n' )
+    await acmd( server, 'killall -9 iperf' )
+    # Note: CSV mode
+    iperfArgs = 'iperf -y C -p %d ' % port
+    bwArgs = ''
+    if l4Type == 'UDP':
+        iperfArgs += '-u '
+        bwArgs = '-b ' + udpBw + ' '
+    serverip = server.IP()
+    server.sendCmd( iperfArgs + '-s' )
+    try:
+        if l4Type == 'TCP':
+            if not await waitListening( client, serverip, port ):
+                raise Exception( 'Could not connect to iperf on port %d'
+                                 % port )
+        cliout = await acmd( client, iperfArgs + '-t %d -c ' % seconds +
+                             serverip + ' ' + bwArgs )
+        cvals = net._iperfVals( cliout, serverip )
+        debug( 'iperf client output:', cliout, cvals )
+        serverout = ''
+        # Wait for output from the client session
+        while True:
+            serverout += await monitor( server )
+            svals = net._iperfVals( serverout, serverip )
+            # Check for the client's source/output port
+            if ( svals and cvals[ 'sport' ] == svals[ 'sport' ]
+                 and int( svals[ 'rate' ] ) > 0 ):
+                break
+        debug( 'iperf server output:', serverout, svals )
+    finally:
+        server.stopCmds()
+    result = [ fmtBps( svals[ 'rate' ], fmt ),
+               fmtBps( cvals[ 'rate' ], fmt ) ]
+    if l4Type == 'UDP':
+        result.insert( 0, udpBw )
+    output( '*** Results: %s\n' % result )
+    return result
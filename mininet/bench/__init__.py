@@ -0,0 +1,4 @@
+"""
+Mininet benchmarks
+Scaling and throughput measurements for Mininet internals
+"""
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""
+buildbench.py: compare network build time for link backends
+
+Builds a tree topology of Linux bridges with the ip/ifconfig
+interface backend and with the rtnetlink backend, and reports the
+total build time and the time spent creating links for each.
+
+Usage: sudo python -m mininet.bench.buildbench [depth fanout]
+       (default: 2 8)
+"""
+
+import sys
+from time import time
+
+from mininet.net import Mininet
+from mininet.topolib import TreeTopo
+from mininet.nodelib import LinuxBridge
+from mininet.log import setLogLevel, info, output
+from mininet.util import ensureRoot
+
+
+def buildTime( topo, netlink ):
+    """Build and tear down a Mininet for topo
+       netlink: use rtnetlink backend?
+       returns: ( total build seconds, link phase seconds )"""
+    net = Mininet( topo, switch=LinuxBridge, controller=None,
+                   build=False, netlink=netlink )
+    start = time()
+    try:
+        net.build()
+        elapsed = time() - start
+    finally:
+        net.stop()
+    return elapsed, dict( net.buildTimes ).get( 'links', 0 )
+
+
+def buildBench( depth=2, fanout=8 ):
+    """Run build time benchmark
+       depth, fanout: tree dimensions
+       returns: list of ( backend, build seconds, link seconds )"""
+    ensureRoot()
+    topo = TreeTopo( depth=depth, fanout=fanout )
+    results = []
+    for backend, netlink in ( 'ip', False ), ( 'netlink', True ):
+        info( '*** Building tree %d,%d with %s backend\n' %
+              ( depth, fanout, backend ) )
+        build, links = buildTime( topo, netlink )
+        results.append( ( backend, build, links ) )
+    output( '%8s %10s %10s\n' % ( 'backend', 'build(s)', 'links(s)' ) )
+    for backend, build, links in results:
+        output( '%8s %10.3f %10.3f\n' % ( backend, build, links ) )
+    return results
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    buildBench( *[ int( arg ) for arg in sys.argv[ 1: 3 ] ] )
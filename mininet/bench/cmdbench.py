@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""
+cmdbench.py: microbenchmark for Node.cmd() output throughput
+
+Pipes N megabytes of output through h1.cmd() and reports the elapsed
+time and throughput for each size. Since cmd() reads large chunks
+and only scans newly read data for markers, elapsed time should
+scale linearly with output size.
+
+Usage: sudo python -m mininet.bench.cmdbench [MB...] (default: 10 100)
+"""
+
+import sys
+from time import time
+
+from mininet.node import Host
+from mininet.log import setLogLevel, info, output
+from mininet.util import ensureRoot
+
+
+def cmdThroughput( node, size ):
+    """Pipe size bytes through node.cmd()
+       returns: elapsed time in seconds"""
+    start = time()
+    result = node.cmd( "head -c %d /dev/zero | tr '\\000' x" % size )
+    elapsed = time() - start
+    assert len( result ) == size, (
+        'expected %d bytes, got %d' % ( size, len( result ) ) )
+    return elapsed
+
+
+def cmdBench( sizes=( 10, 100 ) ):
+    """Run cmd() throughput benchmark
+       sizes: output sizes in MB
+       returns: list of ( MB, seconds, MB/s )"""
+    ensureRoot()
+    results = []
+    h1 = Host( 'h1', inNamespace=False )
+    try:
+        for mb in sizes:
+            info( '*** Piping %d MB through h1.cmd()\n' % mb )
+            elapsed = cmdThroughput( h1, mb * 1024 * 1024 )
+            results.append( ( mb, elapsed, mb / elapsed ) )
+    finally:
+        h1.terminate()
+    output( '%8s %10s %10s\n' % ( 'MB', 'seconds', 'MB/s' ) )
+    for mb, elapsed, rate in results:
+        output( '%8d %10.3f %10.1f\n' % ( mb, elapsed, rate ) )
+    return results
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    cmdBench( [ int( arg ) for arg in sys.argv[ 1: ] ] or ( 10, 100 ) )
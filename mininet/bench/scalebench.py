@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+"""
+scalebench.py: network lifecycle scaling benchmark
+
+Builds, starts and stops networks over a sweep of topologies, sizes
+and link types, and records for every build, start and stop phase:
+the wall time, the commands and processes it ran (see
+Mininet.timings()), our peak RSS during the phase, and the numbers
+of root namespace interfaces, network namespaces and processes on
+the system at the end of the phase.
+
+Results are written as JSON lines, one per network, tagged with the
+current git commit, so that runs from different commits can be
+compared with --compare.
+
+Uses OVSBridge switches if Open vSwitch is installed, and LinuxBridge
+otherwise; bridges run STP for topologies with loops.
+
+--size N,M applies to every topology that takes that many
+parameters; --size topo:N,M applies to one topology only.
+
+Usage: sudo python -m mininet.bench.scalebench [options]
+       python -m mininet.bench.scalebench --compare old.json new.json
+"""
+
+import json
+import os
+import sys
+from glob import glob
+from optparse import OptionParser
+from subprocess import check_output, CalledProcessError, STDOUT
+from time import time
+
+from mininet.net import Mininet
+from mininet.node import OVSBridge
+from mininet.nodelib import LinuxBridge
+from mininet.link import Link, TCLink, OVSLink
+from mininet.topo import SingleSwitchTopo, LinearTopo
+from mininet.topolib import TreeTopo, TorusTopo
+from mininet.journal import netnsInode
+from mininet.clean import cleanup
+from mininet.log import setLogLevel, info, output, warn
+from mininet.util import ensureRoot, quietRun
+
+# name -> ( Topo class, default sizes, has loops? )
+TOPOS = {
+    'single': ( SingleSwitchTopo, [ ( 10, ), ( 100, ) ], False ),
+    'linear': ( LinearTopo, [ ( 10, ), ( 100, ) ], False ),
+    'tree': ( TreeTopo, [ ( 2, 4 ), ( 3, 4 ) ], False ),
+    'torus': ( TorusTopo, [ ( 3, 3 ), ( 6, 6 ) ], True ) }
+
+# name -> ( Link class, link options )
+LINKS = {
+    'veth': ( Link, {} ),
+    'tc': ( TCLink, { 'bw': 100, 'delay': '1ms' } ),
+    'ovs': ( OVSLink, {} ) }
+
+SWITCHES = { 'lxbr': LinuxBridge, 'ovsbr': OVSBridge }
+
+
+def peakRSS():
+    "Return our peak resident set size in kB since the last reset"
+    with open( '/proc/self/status' ) as f:
+        for line in f:
+            if line.startswith( 'VmHWM:' ):
+                return int( line.split()[ 1 ] )
+    return None
+
+
+def resetPeakRSS():
+    "Reset our peak RSS to our current RSS (Linux 4.0 and later)"
+    try:
+        with open( '/proc/self/clear_refs', 'w' ) as f:
+            f.write( '5' )
+    except EnvironmentError:
+        pass
+
+
+def kernelObjects():
+    """Count kernel objects that Mininet creates
+       returns: dict of intfs (in our namespace), netns, procs"""
+    procs = glob( '/proc/[0-9]*' )
+    inodes = set( netnsInode( int( path[ 6: ] ) ) for path in procs )
+    inodes.discard( None )
+    return { 'intfs': len( os.listdir( '/sys/class/net' ) ),
+             'netns': len( inodes ), 'procs': len( procs ) }
+
+
+class BenchMininet( Mininet ):
+    "Mininet that samples memory and kernel objects after each phase"
+
+    def timePhase( self, phase, stage='build' ):
+        "Record phase, then add peak RSS and kernel object counts"
+        super( BenchMininet, self ).timePhase( phase, stage )
+        entry = self.phaseLog[ stage ][ -1 ]
+        entry.update( kernelObjects(), rss=peakRSS() )
+        resetPeakRSS()
+        # Don't charge our sampling to the next phase
+        self.phaseStart = time()
+
+
+def gitCommit():
+    "Return the current git commit of our source tree, or None"
+    try:
+        return check_output(
+            [ 'git', 'rev-parse', 'HEAD' ],
+            cwd=os.path.dirname( os.path.abspath( __file__ ) ),
+            stderr=STDOUT ).decode().strip()
+    except ( CalledProcessError, EnvironmentError ):
+        return None
+
+
+def checkSizes( sizes ):
+    """Check that sizes match the parameters of their topologies
+       sizes: dict of topology name -> list of parameter tuples
+       raises: ValueError for an unknown topology or a bad size"""
+    for topo, topoSizes in sizes.items():
+        if topo not in TOPOS:
+            raise ValueError( 'unknown topology %s' % topo )
+        arity = len( TOPOS[ topo ][ 1 ][ 0 ] )
+        for size in topoSizes:
+            if len( size ) != arity:
+                raise ValueError(
+                    'size %s does not fit %s, which takes %d parameter(s)' %
+                    ( ','.join( str( n ) for n in size ), topo, arity ) )
+
+
+def parseSizes( specs, topos=None ):
+    """Parse --size options into per-topology sizes
+       specs: strings like 3,4 (for every topology taking two
+              parameters) or tree:3,4 (for tree only)
+       topos: topology names to apply unprefixed sizes to (all)
+       returns: dict of topology name -> list of parameter tuples
+       raises: ValueError if a size fits no topology"""
+    sizes = {}
+    for spec in specs:
+        topo, _sep, params = spec.rpartition( ':' )
+        if not all( n.isdigit() for n in params.split( ',' ) ):
+            raise ValueError( 'bad size %s' % spec )
+        size = tuple( int( n ) for n in params.split( ',' ) )
+        if topo:
+            checkSizes( { topo: [ size ] } )
+            targets = [ topo ]
+        else:
+            targets = [ t for t in topos or sorted( TOPOS )
+                        if len( TOPOS[ t ][ 1 ][ 0 ] ) == len( size ) ]
+            if not targets:
+                raise ValueError( 'size %s fits no topology' % spec )
+        for target in targets:
+            sizes.setdefault( target, [] ).append( size )
+    return sizes
+
+
+def runNet( topo, size, link, switch, fastStop=False ):
+    """Build, start and stop one network
+       topo: topology name
+       size: topology parameters
+       link: link type name
+       switch: switch type name
+       fastStop: use fast stop (see Mininet.stop())?
+       returns: result dict
+       Cleans up (mn -c) only if the network itself fails."""
+    topoClass, _sizes, loops = TOPOS[ topo ]
+    linkClass, lopts = LINKS[ link ]
+    sopts = { 'stp': True } if loops else {}
+    net = BenchMininet( topoClass( *size, lopts=lopts, sopts=sopts ),
+                        switch=SWITCHES[ switch ], link=linkClass,
+                        controller=None, build=False, fastStop=fastStop )
+    resetPeakRSS()
+    start = time()
+    try:
+        net.start()
+        net.stop()
+    except Exception:
+        cleanup()
+        raise
+    elapsed = time() - start
+    timings = json.loads( net.timings() )
+    return { 'topo': topo, 'size': list( size ), 'link': link,
+             'switch': switch, 'fastStop': fastStop,
+             'hosts': len( net.hosts ),
+             'switches': len( net.switches ), 'links': len( net.links ),
+             'seconds': elapsed, 'phases': timings[ 'phases' ] }
+
+
+def scaleBench( topos=None, links=None, switch=None, sizes=None,
+                fastStop=False, outfile=sys.stdout ):
+    """Run benchmark sweep, writing a JSON line for each network
+       topos: topology names (all)
+       links: link type names (all)
+       switch: switch type name (ovsbr if OVS is installed, else lxbr)
+       sizes: dict of topology name -> parameter tuples (defaults)
+       fastStop: use fast stop?
+       outfile: file for JSON results
+       returns: list of results
+       raises: ValueError if sizes don't fit their topologies"""
+    sizes = sizes or {}
+    checkSizes( sizes )
+    ensureRoot()
+    if switch is None:
+        switch = 'ovsbr' if quietRun( 'which ovs-vsctl' ) else 'lxbr'
+    commit, results = gitCommit(), []
+    for topo in topos or sorted( TOPOS ):
+        for size in sizes.get( topo, TOPOS[ topo ][ 1 ] ):
+            for link in links or sorted( LINKS ):
+                info( '*** %s %s with %s links and %s switches\n' %
+                      ( topo, ','.join( str( s ) for s in size ), link,
+                        switch ) )
+                try:
+                    result = runNet( topo, size, link, switch, fastStop )
+                except Exception as e:  # pylint: disable=broad-except
+                    warn( '*** %s failed: %s\n' % ( topo, e ) )
+                    continue
+                result.update( commit=commit )
+                results.append( result )
+                outfile.write( json.dumps( result, sort_keys=True ) + '\n' )
+                outfile.flush()
+    return results
+
+
+def readResults( path ):
+    """Read results written by scaleBench()
+       returns: dict of ( topo, size, link, switch, fastStop ) -> result"""
+    results = {}
+    with open( path ) as f:
+        for line in f:
+            result = json.loads( line )
+            key = ( result[ 'topo' ], tuple( result[ 'size' ] ),
+                    result[ 'link' ], result[ 'switch' ],
+                    result.get( 'fastStop', False ) )
+            results[ key ] = result
+    return results
+
+
+def compareResults( oldPath, newPath ):
+    """Print per-stage times from two result files, side by side
+       oldPath: results from baseline commit
+       newPath: results to compare with them"""
+    old, new = readResults( oldPath ), readResults( newPath )
+    output( '%-8s %-8s %-5s %-6s %10s %10s %7s %8s %8s\n' % (
+        'topo', 'size', 'link', 'stage', 'old(s)', 'new(s)', 'ratio',
+        'oldforks', 'newforks' ) )
+    for key in sorted( set( old ) & set( new ) ):
+        topo, size, link, _switch, _fastStop = key
+        for stage in 'build', 'start', 'stop':
+            times, forks = [], []
+            for result in old[ key ], new[ key ]:
+                phases = result[ 'phases' ][ stage ]
+                times.append( sum( p[ 'seconds' ] for p in phases ) )
+                forks.append( sum( p[ 'runs' ] + p[ 'popens' ] + p[ 'cmds' ]
+                                   for p in phases ) )
+            output( '%-8s %-8s %-5s %-6s %10.3f %10.3f %7.2f %8d %8d\n' % (
+                topo, ','.join( str( s ) for s in size ), link, stage,
+                times[ 0 ], times[ 1 ],
+                times[ 1 ] / times[ 0 ] if times[ 0 ] else 0,
+                forks[ 0 ], forks[ 1 ] ) )
+
+
+def parseArgs():
+    "Parse command line"
+    opts = OptionParser( usage=__doc__.split( 'Usage: ' )[ 1 ] )
+    opts.add_option( '--topo', action='append', choices=sorted( TOPOS ),
+                     type='choice', help='topology (repeatable; all)' )
+    opts.add_option( '--size', action='append',
+                     help='topology parameters, e.g. 3,4 or tree:3,4 '
+                     '(repeatable)' )
+    opts.add_option( '--link', action='append', choices=sorted( LINKS ),
+                     type='choice', help='link type (repeatable; all)' )
+    opts.add_option( '--switch', choices=sorted( SWITCHES ),
+                     type='choice', help='switch type (ovsbr if OVS is '
+                     'installed, else lxbr)' )
+    opts.add_option( '--faststop', action='store_true', default=False,
+                     help='stop networks with fast stop' )
+    opts.add_option( '--output', '-o', help='results file (stdout)' )
+    opts.add_option( '--compare', nargs=2, metavar='OLD NEW',
+                     help='compare two results files' )
+    opts.add_option( '--verbosity', '-v', default='info',
+                     help='log level (info)' )
+    options = opts.parse_args()[ 0 ]
+    try:
+        options.size = parseSizes( options.size or [], options.topo )
+    except ValueError as e:
+        opts.error( str( e ) )
+    return options
+
+
+if __name__ == '__main__':
+    args = parseArgs()
+    setLogLevel( args.verbosity )
+    if args.compare:
+        compareResults( *args.compare )
+        sys.exit()
+    if args.output:
+        with open( args.output, 'a' ) as resultFile:
+            scaleBench( args.topo, args.link, args.switch, args.size,
+                        args.faststop, resultFile )
+    else:
+        scaleBench( args.topo, args.link, args.switch, args.size,
+                    args.faststop )
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""
+topobench.py: compare Topo graph backends for large topologies
+
+Builds a k-ary fat tree Topo with MultiGraph and with CompactGraph,
+and reports the build time, the memory allocated for the Topo, and
+the time for the first and second calls to links( sort=True ).
+No network is created, so this does not need root.
+
+Usage: python -m mininet.bench.topobench [k...] (default: 16 32)
+"""
+
+import sys
+import tracemalloc
+from time import time
+
+from mininet.topo import Topo, MultiGraph, CompactGraph
+from mininet.log import setLogLevel, info, output
+
+
+class FatTreeTopo( Topo ):
+    "k-ary fat tree: k pods of k/2 edge and k/2 aggregation switches"
+
+    def build( self, k=4 ):
+        "k: number of ports per switch (even)"
+        half = k // 2
+        cores = [ self.addSwitch( 'c%d' % i, dpid='%x' % ( i + 1 ) )
+                  for i in range( half * half ) ]
+        hostNum = 1
+        for pod in range( k ):
+            aggs = []
+            for i in range( half ):
+                aggs.append( self.addSwitch(
+                    'a%dx%d' % ( pod, i ),
+                    dpid='%x' % ( ( 1 << 20 ) + pod * k + i ) ) )
+            for i in range( half ):
+                edge = self.addSwitch(
+                    'e%dx%d' % ( pod, i ),
+                    dpid='%x' % ( ( 2 << 20 ) + pod * k + i ) )
+                for agg in aggs:
+                    self.addLink( edge, agg )
+                for _ in range( half ):
+                    host = self.addHost( 'h%d' % hostNum )
+                    hostNum += 1
+                    self.addLink( host, edge )
+            for i, agg in enumerate( aggs ):
+                for j in range( half ):
+                    self.addLink( agg, cores[ i * half + j ] )
+
+
+def topoCost( k, graph ):
+    """Build a fat tree Topo
+       k: fat tree arity
+       graph: graph class
+       returns: ( build seconds, MB allocated, first and second
+                  links( sort=True ) seconds, number of links )"""
+    start = time()
+    topo = FatTreeTopo( k=k, graph=graph )
+    build = time() - start
+    # Tracing slows things down, so we build again to measure memory
+    del topo
+    tracemalloc.start()
+    topo = FatTreeTopo( k=k, graph=graph )
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    sortTimes = []
+    for _ in range( 2 ):
+        start = time()
+        links = topo.links( sort=True, withInfo=True )
+        sortTimes.append( time() - start )
+    return ( build, size / 1e6 ) + tuple( sortTimes ) + ( len( links ), )
+
+
+def topoBench( arities=( 16, 32 ) ):
+    """Run Topo backend benchmark
+       arities: fat tree arities to build
+       returns: list of ( k, graph, build s, MB, sort s, resort s, links )"""
+    results = []
+    for k in arities:
+        for graph in MultiGraph, CompactGraph:
+            info( '*** Building fat tree k=%d with %s\n' %
+                  ( k, graph.__name__ ) )
+            results.append( ( k, graph.__name__ ) +
+                            topoCost( k, graph ) )
+    output( '%4s %12s %8s %10s %10s %10s %9s\n' % (
+        'k', 'graph', 'links', 'build(s)', 'memory(MB)', 'sort(s)',
+        'resort(s)' ) )
+    for k, graph, build, size, sort, resort, links in results:
+        output( '%4d %12s %8d %10.3f %10.1f %10.3f %9.3f\n' % (
+            k, graph, links, build, size, sort, resort ) )
+    return results
+
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    if sys.argv[ 1: ]:
+        topoBench( [ int( arg ) for arg in sys.argv[ 1: ] ] )
+    else:
+        topoBench()
@@ -8,23 +8,28 @@
 code), this script may be used to get rid of unwanted garbage.
 It may also get rid of 'false positives', but hopefully
 nothing irreplaceable!
+
+If Mininet left a journal of what it created (see journal.py), we
+remove exactly those resources instead of sweeping the system.
 """
 
-from subprocess import ( Popen, PIPE, check_output as co,
-                         CalledProcessError )
+from subprocess import ( check_output as co, CalledProcessError,
+                         Popen, PIPE, STDOUT )
+from glob import glob
+import os
+import signal
 import time
 
-from mininet.log import info
+from mininet.log import info, debug
 from mininet.term import cleanUpScreens
-from mininet.util import decode
+from mininet.util import errRun, communicateAll
+from mininet.journal import readJournals, procStart, netnsInode
+import mininet.journal
 
 def sh( cmd ):
     "Print a command and send it to the shell"
     info( cmd + '\n' )
-    p = Popen(  # pylint: disable=consider-using-with
-        [ '/bin/sh', '-c', cmd ], stdout=PIPE )
-    result = p.communicate()[ 0 ]
-    return decode( result )
+    return errRun( cmd, shell=True, stderr=None ).out
 
 def killprocs( pattern ):
     "Reliably terminate processes matching a pattern (including args)"
@@ -41,14 +46,146 @@ def killprocs( pattern ):
         else:
             break
 
+def signalProcs( procs, sig, group=False ):
+    """Send a signal to recorded processes which still exist
+       procs: list of ( pid, start time )
+       sig: signal to send
+       group: signal process groups rather than processes?
+       returns: procs that we signalled"""
+    kill = os.killpg if group else os.kill
+    signalled = []
+    for pid, start in procs:
+        if start is None or procStart( pid ) != start:
+            continue  # gone, or pid has been reused
+        try:
+            kill( pid, sig )
+            signalled.append( ( pid, start ) )
+        except OSError:
+            pass
+    return signalled
+
+
+def waitProcs( procs, timeout=1 ):
+    """Wait for recorded processes to exit
+       procs: list of ( pid, start time )
+       timeout: max seconds to wait
+       returns: procs which are still running"""
+    end = time.time() + timeout
+    while True:
+        procs = [ ( pid, start ) for pid, start in procs
+                  if procStart( pid ) == start ]
+        if not procs or time.time() >= end:
+            return procs
+        time.sleep( .01 )
+
+
+def netnsProcs( inodes ):
+    """Return processes in any of the given network namespaces
+       inodes: set of network namespace inodes
+       returns: list of ( pid, start time )"""
+    # Never touch the root namespace, even if a record is wrong
+    inodes = set( inodes ) - { netnsInode( 1 ) }
+    procs = []
+    if not inodes:
+        return procs
+    for path in glob( '/proc/[0-9]*' ):
+        pid = int( path[ 6: ] )
+        if netnsInode( pid ) in inodes:
+            procs.append( ( pid, procStart( pid ) ) )
+    return procs
+
+
+def cleanJournal( paths, records ):
+    """Remove the resources recorded in Mininet journals
+       paths: journal files
+       records: dict of ( kind, name ) -> value for live resources"""
+    kinds = {}
+    for ( kind, name ), value in sorted( records.items() ):
+        kinds.setdefault( kind, [] ).append( ( name, value ) )
+    nodes = [ value for _name, value in kinds.get( 'node', [] ) if value ]
+    procs = [ value for _name, value in kinds.get( 'process', [] )
+              if value ]
+    info( "*** Killing %d node shells and %d processes\n" %
+          ( len( nodes ), len( procs ) ) )
+    # Kill everything in our namespaces, not just node shells, and
+    # node process groups, which include their background jobs
+    killed = signalProcs(
+        netnsProcs( inode for _pid, _start, inode in nodes if inode ),
+        signal.SIGKILL )
+    killed += signalProcs( [ ( pid, start ) for pid, start, _inode
+                             in nodes ], signal.SIGKILL, group=True )
+    # Give other processes (e.g. xterms) a chance to exit cleanly
+    killed += signalProcs( [ ( pid, start ) for pid, start, _inode
+                             in procs ], signal.SIGTERM )
+    signalProcs( waitProcs( killed ), signal.SIGKILL )
+    # Delete interfaces, OVS bridges and cgroups concurrently
+    # Most interfaces will have gone with their namespaces
+    intfs = [ name for name, _value in kinds.get( 'intf', [] )
+              if os.path.exists( '/sys/class/net/' + name ) ]
+    bridges = [ name for name, _value in kinds.get( 'ovs', [] ) ]
+    cgroups = [ name for name, _value in kinds.get( 'cgroup', [] ) ]
+    info( "*** Removing %d interfaces, %d OVS bridges and %d cgroups\n" %
+          ( len( intfs ), len( bridges ), len( cgroups ) ) )
+    popens = []
+    if intfs:
+        popens.append( ( [ 'ip', '-force', '-batch', '-' ], ''.join(
+            'link del %s\n' % intf for intf in intfs ) ) )
+    if bridges:
+        cmd = [ 'ovs-vsctl', '--timeout=1' ]
+        for bridge in bridges:
+            cmd += [ '--', '--if-exists', 'del-br', bridge ]
+        popens.append( ( cmd, '' ) )
+    if cgroups:
+        popens.append( ( [ 'cgdelete', '-r' ] + cgroups, '' ) )
+    started = []
+    for cmd, data in popens:
+        try:
+            started.append( ( cmd, Popen( cmd, stdin=PIPE, stdout=PIPE,
+                                          stderr=STDOUT ), data ) )
+        except OSError as e:
+            info( '*** Cannot run %s: %s\n' % ( cmd[ 0 ], e ) )
+    # Run the commands in parallel
+    outs = communicateAll( [ ( popen, data )
+                             for _cmd, popen, data in started ] )
+    for ( cmd, popen, _data ), out in zip( started, outs ):
+        # Errors are mostly for things which are already gone
+        debug( cmd[ 0 ], popen.returncode, out, '\n' )
+    for path in paths:
+        try:
+            os.unlink( path )
+        except OSError:
+            pass
+    # Our own journal may have been one of them
+    if mininet.journal.journal.path in paths:
+        mininet.journal.journal.close()
+
+
 class Cleanup( object ):
     "Wrapper for cleanup()"
 
     callbacks = []
 
     @classmethod
-    def cleanup( cls):
-        """Clean up junk which might be left over from old runs;
+    def cleanup( cls ):
+        """Clean up junk which might be left over from old runs,
+           using Mininet journals if there are any"""
+        paths, records = readJournals()
+        if paths:
+            info( "*** Cleaning up resources from %d journals\n" %
+                  len( paths ) )
+            cleanJournal( paths, records )
+        else:
+            cls.sweep()
+
+        # Call any additional cleanup code if necessary
+        for callback in cls.callbacks:
+            callback()
+
+        info( "*** Cleanup complete.\n" )
+
+    @classmethod
+    def sweep( cls ):
+        """Clean up anything which looks like it came from Mininet;
            do fast stuff before slow dp and link removal!"""
 
         info( "*** Removing excess controllers/ofprotocols/ofdatapaths/"
@@ -61,7 +198,11 @@ def cleanup( cls):
         # you can't connect to them either, so they're mostly harmless.
         # Send SIGTERM first to give processes a chance to shutdown cleanly.
         sh( 'killall ' + zombies + ' 2> /dev/null' )
-        time.sleep( 1 )
+        # Wait up to a second for them to exit
+        for _ in range( 20 ):
+            if errRun( [ 'killall', '-q', '-0' ] + zombies.split() ).ret:
+                break
+            time.sleep( .05 )
         sh( 'killall -9 ' + zombies + ' 2> /dev/null' )
 
         # And kill off sudo mnexec
@@ -112,12 +253,6 @@ def cleanup( cls):
         killprocs( '.ssh/mn')
         sh( 'rm -f ~/.ssh/mn/*' )
 
-        # Call any additional cleanup code if necessary
-        for callback in cls.callbacks:
-            callback()
-
-        info( "*** Cleanup complete.\n" )
-
     @classmethod
     def addCleanupCallback( cls, callback ):
         "Add cleanup callback"
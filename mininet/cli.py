@@ -105,6 +105,7 @@ def run( self ):
             try:
                 # Make sure no nodes are still waiting
                 for node in self.mn.values():
+                    node.waitStarted()
                     while node.waiting:
                         info( 'stopping', node, '\n' )
                         node.sendInt()
@@ -375,6 +376,17 @@ def do_dpctl( self, line ):
             output( '*** ' + sw.name + ' ' + ('-' * 72) + '\n' )
             output( sw.dpctl( *args ) )
 
+    def do_cmdall( self, line ):
+        """Run a shell command on all hosts in parallel.
+           Usage: cmdall command [arg1] [arg2] ..."""
+        if not line.strip():
+            error( 'usage: cmdall command [arg1] [arg2] ...\n' )
+            return
+        results = self.mn.cmdAll( line )
+        for host in self.mn.hosts:
+            output( '*** ' + host.name + ' ' + ('-' * 72) + '\n' )
+            output( results[ host ] )
+
     def do_time( self, line ):
         "Measure time taken for any command in Mininet."
         start = time.time()
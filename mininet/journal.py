@@ -0,0 +1,153 @@
+"""
+journal.py: record the resources Mininet creates, for mn -c
+
+Each Mininet process appends the resources that it creates - node
+shells and their network namespaces, other processes such as
+controllers and tunnels, root-namespace interfaces, OVS bridges and
+cgroups - to its own journal file in journalDir, one JSON record per
+line, and records their removal as well. When everything has been
+removed, the journal file is deleted.
+
+If a process exits without cleaning up, its journal lets cleanup()
+remove exactly what it left behind, rather than sweeping the system
+for things that look like they might belong to Mininet.
+
+Processes are recorded with their start time, so that we never kill
+a process which merely reused a recorded pid.
+"""
+
+import json
+import os
+from glob import glob
+
+from mininet.log import warn, debug
+
+journalDir = '/run/mininet'
+
+
+def procStart( pid ):
+    """Return start time of process pid, in clock ticks since boot,
+       or None if it doesn't exist or has exited (is a zombie)"""
+    try:
+        with open( '/proc/%d/stat' % pid ) as f:
+            stat = f.read()
+    except EnvironmentError:
+        return None
+    # The command name may contain spaces, so skip past it
+    fields = stat[ stat.rindex( ')' ) + 2: ].split()
+    if fields[ 0 ] == 'Z':
+        return None
+    return int( fields[ 19 ] )
+
+
+def netnsInode( pid ):
+    "Return inode of process pid's network namespace, or None"
+    try:
+        return os.stat( '/proc/%d/ns/net' % pid ).st_ino
+    except EnvironmentError:
+        return None
+
+
+class Journal( object ):
+    "Journal of the resources created by this process"
+
+    def __init__( self, path=None ):
+        "path: journal file (journalDir/<pid>.journal)"
+        self.path = self.defaultPath = path
+        self.file = None
+        self.live = {}
+        self.broken = False
+
+    def write( self, record ):
+        "Append record to our journal file, creating it if necessary"
+        if self.broken:
+            return
+        try:
+            if self.file is None:
+                if self.path is None:
+                    if not os.path.isdir( journalDir ):
+                        os.makedirs( journalDir )
+                    self.path = os.path.join( journalDir,
+                                              '%d.journal' % os.getpid() )
+                # pylint: disable=consider-using-with
+                self.file = open( self.path, 'a' )
+            self.file.write( json.dumps( record ) + '\n' )
+            # Flush so that the record survives if we are killed
+            self.file.flush()
+        except EnvironmentError as e:
+            warn( '*** Cannot write journal %s (%s): mn -c will sweep\n'
+                  % ( self.path or journalDir, e ) )
+            self.broken = True
+            # An incomplete journal is worse than none at all
+            self.close()
+
+    def add( self, kind, name, pid=None, netns=False ):
+        """Record that we created a resource
+           kind: node, process, intf, ovs or cgroup
+           name: resource name (unique for kind)
+           pid: process id for node and process resources
+           netns: also record the inode of pid's network namespace"""
+        value = None
+        if pid:
+            value = [ pid, procStart( pid ),
+                      netnsInode( pid ) if netns else None ]
+        self.live[ kind, name ] = value
+        self.write( [ '+', kind, name, value ] )
+
+    def remove( self, kind, name ):
+        """Record that we removed a resource
+           kind: resource kind
+           name: resource name"""
+        if ( kind, name ) not in self.live:
+            return
+        del self.live[ kind, name ]
+        if self.live:
+            self.write( [ '-', kind, name ] )
+        else:
+            # Nothing left to clean up
+            self.close()
+
+    def close( self ):
+        "Forget everything and delete our journal file"
+        self.live = {}
+        if self.file is not None:
+            try:
+                self.file.close()
+                os.unlink( self.path )
+            except EnvironmentError:
+                pass
+            self.file = None
+        self.path = self.defaultPath
+
+
+journal = Journal()
+
+
+def readJournals( pattern=None ):
+    """Read all journals
+       pattern: glob for journal files (journalDir/*.journal)
+       returns: journal paths, dict of ( kind, name ) -> value
+                for resources which were not removed"""
+    paths = sorted( glob( pattern or
+                          os.path.join( journalDir, '*.journal' ) ) )
+    live = {}
+    for path in paths:
+        try:
+            with open( path ) as f:
+                lines = f.readlines()
+        except EnvironmentError:
+            continue
+        for line in lines:
+            try:
+                record = json.loads( line )
+            except ValueError:
+                # Probably the last line of a journal being written
+                debug( 'bad journal line in %s: %r\n' % ( path, line ) )
+                continue
+            if record[ 0 ] == '+':
+                _op, kind, name, value = record
+                live[ kind, name ] = value
+            else:
+                _op, kind, name = record
+                live.pop( ( kind, name ), None )
+    return paths, live
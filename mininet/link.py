@@ -24,10 +24,16 @@
 Link: basic link class for creating veth pairs
 """
 
+import os
 import re
+from functools import partial
+from time import sleep, time
 
 from mininet.log import info, error, debug
-from mininet.util import makeIntfPair
+from mininet.journal import journal
+from mininet.netlink import netlinkFor, netlinkError, IFF_UP
+from mininet.util import ( makeIntfPair, makeIntfPairs, moveIntf,
+                           batchDelIntfs )
 
 # Make pylint happy:
 # pylint: disable=too-many-arguments
@@ -38,15 +44,17 @@ class Intf( object ):
     "Basic interface object that can configure itself."
 
     def __init__( self, name, node=None, port=None, link=None,
-                  mac=None, **params ):
+                  mac=None, netlink=False, **params ):
         """name: interface name (e.g. h1-eth0)
            node: owning node (where this intf most likely lives)
            link: parent link if we're part of a link
+           netlink: configure using rtnetlink rather than ifconfig?
            other arguments are passed to config()"""
         self.node = node
         self.name = name
         self.link = link
         self.mac = mac
+        self.netlink = netlink
         self.ip, self.prefixLen = None, None
 
         # if interface is lo, we know the ip is 127.0.0.1.
@@ -73,33 +81,77 @@ def ifconfig( self, *args ):
         "Configure ourselves using ifconfig"
         return self.cmd( 'ifconfig', self.name, *args )
 
+    def rtnl( self ):
+        """Return RtNetlink for our node's namespace if we are using
+           rtnetlink, or None to use ifconfig/ip"""
+        return netlinkFor( self.node ) if self.netlink else None
+
+    @staticmethod
+    def nlcmd( fn, *args, **kwargs ):
+        """Call rtnetlink method fn
+           returns: '' on success, or error message like ip's"""
+        try:
+            fn( *args, **kwargs )
+        except EnvironmentError as e:
+            return netlinkError( e )
+        return ''
+
     def setIP( self, ipstr, prefixLen=None ):
         """Set our IP address"""
         # This is a sign that we should perhaps rethink our prefix
         # mechanism and/or the way we specify IP addresses
         if '/' in ipstr:
             self.ip, self.prefixLen = ipstr.split( '/' )
-            return self.ifconfig( ipstr, 'up' )
+            ifconfigArgs = ( ipstr, 'up' )
         else:
             if prefixLen is None:
                 raise Exception( 'No prefix length set for IP address %s'
                                  % ( ipstr, ) )
             self.ip, self.prefixLen = ipstr, prefixLen
-            return self.ifconfig( '%s/%s' % ( ipstr, prefixLen ) )
+            ifconfigArgs = ( '%s/%s' % ( ipstr, prefixLen ), )
+        nl = self.rtnl()
+        if nl:
+            return self.nlcmd( nl.setAddr, self.name, self.ip,
+                               self.prefixLen )
+        return self.ifconfig( *ifconfigArgs )
 
     def setMAC( self, macstr ):
         """Set the MAC address for an interface.
            macstr: MAC address as string"""
         self.mac = macstr
-        return ( self.ifconfig( 'down' ) +
-                 self.ifconfig( 'hw', 'ether', macstr ) +
-                 self.ifconfig( 'up' ) )
+        nl = self.rtnl()
+        if nl:
+            return ( self.nlcmd( nl.setLink, self.name, up=False ) +
+                     self.nlcmd( nl.setLink, self.name, mac=macstr ) +
+                     self.nlcmd( nl.setLink, self.name, up=True ) )
+        deferred = self.node.deferCmds()
+        result = ( self.ifconfig( 'down' ) +
+                   self.ifconfig( 'hw', 'ether', macstr ) +
+                   self.ifconfig( 'up' ) )
+        if deferred:
+            result = ''.join( out for out, _status
+                              in self.node.runDeferred() )
+        return result
 
     _ipMatchRegex = re.compile( r'\d+\.\d+\.\d+\.\d+' )
     _macMatchRegex = re.compile( r'..:..:..:..:..:..' )
 
+    def nlAddr( self, nl ):
+        """Return IP address and MAC address using rtnetlink
+           nl: RtNetlink for our node"""
+        try:
+            ips = nl.getAddrs( self.name )
+            mac = nl.getLink( self.name ).mac
+        except EnvironmentError:
+            return None, None
+        return ( ips[ 0 ][ 0 ] if ips else None ), mac
+
     def updateIP( self ):
         "Return updated IP address based on ifconfig"
+        nl = self.rtnl()
+        if nl:
+            self.ip = self.nlAddr( nl )[ 0 ]
+            return self.ip
         # use pexec instead of node.cmd so that we dont read
         # backgrounded output from the cli.
         ifconfig, _err, _exitCode = self.node.pexec(
@@ -110,6 +162,10 @@ def updateIP( self ):
 
     def updateMAC( self ):
         "Return updated MAC address based on ifconfig"
+        nl = self.rtnl()
+        if nl:
+            self.mac = self.nlAddr( nl )[ 1 ]
+            return self.mac
         ifconfig = self.ifconfig()
         macs = self._macMatchRegex.findall( ifconfig )
         self.mac = macs[ 0 ] if macs else None
@@ -121,6 +177,10 @@ def updateMAC( self ):
 
     def updateAddr( self ):
         "Return IP address and MAC address based on ifconfig."
+        nl = self.rtnl()
+        if nl:
+            self.ip, self.mac = self.nlAddr( nl )
+            return self.ip, self.mac
         ifconfig = self.ifconfig()
         ips = self._ipMatchRegex.findall( ifconfig )
         macs = self._macMatchRegex.findall( ifconfig )
@@ -138,14 +198,23 @@ def MAC( self ):
 
     def isUp( self, setUp=False ):
         "Return whether interface is up"
+        nl = self.rtnl()
         if setUp:
-            cmdOutput = self.ifconfig( 'up' )
+            if nl:
+                cmdOutput = self.nlcmd( nl.setLink, self.name, up=True )
+            else:
+                cmdOutput = self.ifconfig( 'up' )
             # no output indicates success
             if cmdOutput:
                 error( "Error setting %s up: %s " % ( self.name, cmdOutput ) )
                 return False
             else:
                 return True
+        elif nl:
+            try:
+                return bool( nl.getLink( self.name ).flags & IFF_UP )
+            except EnvironmentError:
+                return False
         else:
             return "UP" in self.ifconfig()
 
@@ -154,6 +223,13 @@ def rename( self, newname ):
         if self.node and self.name in self.node.nameToIntf:
             # rename intf in node's nameToIntf
             self.node.nameToIntf[newname] = self.node.nameToIntf.pop(self.name)
+        nl = self.rtnl()
+        if nl:
+            result = ( self.nlcmd( nl.setLink, self.name, up=False ) +
+                       self.nlcmd( nl.setLink, self.name, newName=newname ) )
+            self.name = newname
+            self.nlcmd( nl.setLink, self.name, up=True )
+            return result
         self.ifconfig( 'down' )
         result = self.cmd( 'ip link set', self.name, 'name', newname )
         self.name = newname
@@ -197,15 +273,28 @@ def config( self, mac=None, ip=None, ifconfig=None,
         # the superclass config method here as follows:
         # r = Parent.config( **params )
         r = {}
+        # Send all of our configuration commands in one batch
+        deferred = self.node.deferCmds()
         self.setParam( r, 'setMAC', mac=mac )
         self.setParam( r, 'setIP', ip=ip )
         self.setParam( r, 'isUp', up=up )
         self.setParam( r, 'ifconfig', ifconfig=ifconfig )
+        if deferred:
+            self.node.runDeferred()
         return r
 
     def delete( self ):
         "Delete interface"
-        self.cmd( 'ip link del ' + self.name )
+        nl = self.rtnl()
+        if nl:
+            self.nlcmd( nl.delLink, self.name )
+        else:
+            self.cmd( 'ip link del ' + self.name )
+        # Deleting either end of a veth pair deletes both
+        link = self.link
+        for intf in ( link.intf1, link.intf2 ) if link else ( self, ):
+            if intf:
+                journal.remove( 'intf', intf.name )
         # We used to do this, but it slows us down:
         # if self.node.inNamespace:
         # Link may have been dumped into root NS
@@ -237,6 +326,17 @@ class TCIntf( Intf ):
     # For higher data rates, we will probably need to change them.
     bwParamMax = 1000
 
+    # Installed tc commands (without 'tc'), or None if unknown
+    tcCmds = None
+    # Installed ( gro, txo, rxo ) offload settings, or None if unknown
+    offload = None
+    # qdisc and class kinds that we use
+    tcKinds = ( 'htb', 'hfsc', 'tbf', 'red', 'netem' )
+    # Parameters that tcUpdate() can change
+    tcParams = ( 'bw', 'delay', 'jitter', 'loss', 'speedup', 'use_hfsc',
+                 'use_tbf', 'latency_ms', 'enable_ecn', 'enable_red',
+                 'max_queue_size' )
+
     def bwCmds( self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
                 latency_ms=None, enable_ecn=False, enable_red=False ):
         "Return tc commands to set bandwidth"
@@ -316,6 +416,73 @@ def tc( self, cmd, tc='tc' ):
         debug(" *** executing command: %s\n" % c)
         return self.cmd( c )
 
+    def tcBatch( self, cmds, tc='tc' ):
+        """Execute tc commands in a single tc -batch
+           cmds: list of tc commands without the initial 'tc'
+           returns: tc output"""
+        c = "printf '%%s\\n' %s | %s -force -batch -" % (
+            ' '.join( "'%s'" % cmd for cmd in cmds ), tc )
+        debug(" *** executing command: %s\n" % c)
+        return self.cmd( c )
+
+    @classmethod
+    def tcKey( cls, cmd ):
+        """Return the part of a tc add command which identifies
+           the qdisc or class it adds (words up to the kind)"""
+        words = cmd.split()
+        for i, word in enumerate( words ):
+            if word in cls.tcKinds:
+                return words[ :i + 1 ]
+        return words
+
+    def tcChanges( self, cmds ):
+        """Return tc commands to get from our installed configuration
+           to the one that cmds would add. If only parameters have
+           changed, we change qdiscs and classes in place rather
+           than rebuilding them and dropping their queued packets.
+           cmds: list of tc add commands without the initial 'tc'"""
+        old = self.tcCmds
+        if old is not None and ( [ self.tcKey( cmd ) for cmd in old ] ==
+                                 [ self.tcKey( cmd ) for cmd in cmds ] ):
+            return [ cmd.replace( ' add ', ' change ', 1 )
+                     for prev, cmd in zip( old, cmds ) if cmd != prev ]
+        # Clear existing configuration and start over
+        if old is None:
+            tcoutput = self.tc( '%s qdisc show dev %s' )
+            clear = "priomap" not in tcoutput and "noqueue" not in tcoutput
+        else:
+            clear = bool( old )
+        return ( [ 'qdisc del dev %s root' % self ] if clear else [] ) + cmds
+
+    def tcUpdate( self, bw=None, delay=None, jitter=None, loss=None,
+                  speedup=0, use_hfsc=False, use_tbf=False,
+                  latency_ms=None, enable_ecn=False, enable_red=False,
+                  max_queue_size=None ):
+        """Return tc commands to change our traffic control settings
+           to the given parameters (as for config()), and record the
+           new configuration as installed; if the commands fail,
+           the caller should reset tcCmds to None
+           returns: tc commands without the initial 'tc', parent"""
+        # Bandwidth limits via various methods
+        bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
+                                      use_hfsc=use_hfsc, use_tbf=use_tbf,
+                                      latency_ms=latency_ms,
+                                      enable_ecn=enable_ecn,
+                                      enable_red=enable_red )
+        cmds = bwcmds
+
+        # Delay/jitter/loss/max_queue_size using netem
+        delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
+                                            loss=loss,
+                                            max_queue_size=max_queue_size,
+                                            parent=parent )
+        cmds += delaycmds
+
+        cmds = [ ' '.join( ( cmd % ( '', self ) ).split() ) for cmd in cmds ]
+        changes = self.tcChanges( cmds )
+        self.tcCmds = cmds
+        return changes, parent
+
     def config(  # pylint: disable=arguments-renamed,arguments-differ
                 self,
                 bw=None, delay=None, jitter=None, loss=None,
@@ -348,11 +515,14 @@ def on( isOn ):
             "Helper method: bool -> 'on'/'off'"
             return 'on' if isOn else 'off'
 
-        # Set offload parameters with ethool
-        self.cmd( 'ethtool -K', self,
-                  'gro', on( gro ),
-                  'tx', on( txo ),
-                  'rx', on( rxo ) )
+        # Set offload parameters with ethool, if they have changed
+        offload = ( gro, txo, rxo )
+        if offload != self.offload:
+            self.cmd( 'ethtool -K', self,
+                      'gro', on( gro ),
+                      'tx', on( txo ),
+                      'rx', on( rxo ) )
+            self.offload = offload
 
         # Optimization: return if nothing else to configure
         # Question: what happens if we want to reset things?
@@ -360,27 +530,11 @@ def on( isOn ):
              and max_queue_size is None ):
             return None
 
-        # Clear existing configuration
-        tcoutput = self.tc( '%s qdisc show dev %s' )
-        if "priomap" not in tcoutput and "noqueue" not in tcoutput:
-            cmds = [ '%s qdisc del dev %s root' ]
-        else:
-            cmds = []
-
-        # Bandwidth limits via various methods
-        bwcmds, parent = self.bwCmds( bw=bw, speedup=speedup,
-                                      use_hfsc=use_hfsc, use_tbf=use_tbf,
-                                      latency_ms=latency_ms,
-                                      enable_ecn=enable_ecn,
-                                      enable_red=enable_red )
-        cmds += bwcmds
-
-        # Delay/jitter/loss/max_queue_size using netem
-        delaycmds, parent = self.delayCmds( delay=delay, jitter=jitter,
-                                            loss=loss,
-                                            max_queue_size=max_queue_size,
-                                            parent=parent )
-        cmds += delaycmds
+        changes, parent = self.tcUpdate(
+            bw=bw, delay=delay, jitter=jitter, loss=loss, speedup=speedup,
+            use_hfsc=use_hfsc, use_tbf=use_tbf, latency_ms=latency_ms,
+            enable_ecn=enable_ecn, enable_red=enable_red,
+            max_queue_size=max_queue_size )
 
         # Ugly but functional: display configuration info
         stuff = ( ( [ '%.2fMbit' % bw ] if bw is not None else [] ) +
@@ -391,13 +545,15 @@ def on( isOn ):
                     if enable_red else [] ) )
         info( '(' + ' '.join( stuff ) + ') ' )
 
-        # Execute all the commands in our node
-        debug("at map stage w/cmds: %s\n" % cmds)
-        tcoutputs = [ self.tc(cmd) for cmd in cmds ]
+        # Execute whatever commands we need in a single batch
+        debug("at map stage w/cmds: %s\n" % changes)
+        tcoutputs = [ self.tcBatch( changes ) ] if changes else []
         for output in tcoutputs:
             if output != '':
                 error( "*** Error: %s" % output )
-        debug( "cmds:", cmds, '\n' )
+                # We no longer know what is installed
+                self.tcCmds = None
+        debug( "cmds:", changes, '\n' )
         debug( "outputs:", tcoutputs, '\n' )
         result[ 'tcoutputs'] = tcoutputs
         result[ 'parent' ] = parent
@@ -414,7 +570,8 @@ class Link( object ):
     def __init__( self, node1, node2, port1=None, port2=None,
                   intfName1=None, intfName2=None, addr1=None, addr2=None,
                   intf=Intf, cls1=None, cls2=None, params1=None,
-                  params2=None, fast=True, **params ):
+                  params2=None, fast=True, netlink=False, batch=False,
+                  **params ):
         """Create veth link to another node, making two new interfaces.
            node1: first node
            node2: second node
@@ -426,6 +583,10 @@ def __init__( self, node1, node2, port1=None, port2=None,
            intfName2: node2  interface name (optional)
            params1: parameters for interface 1 (optional)
            params2: parameters for interface 2 (optional)
+           fast: create interfaces directly in their nodes (True)
+           netlink: use rtnetlink rather than ip/ifconfig (False)
+           batch: leave veth pair and interface creation to
+                  batchCreate() (False; requires fast)
            **params: additional parameters for both interfaces"""
 
         # This is a bit awkward; it seems that having everything in
@@ -451,19 +612,44 @@ def __init__( self, node1, node2, port1=None, port2=None,
         params2.update( params )
 
         self.fast = fast
+        # Only pass netlink option if set, for makeIntfPair() overrides
+        nlopts = { 'netlink': True } if netlink else {}
+        if netlink:
+            params1.setdefault( 'netlink', True )
+            params2.setdefault( 'netlink', True )
+        if not cls1:
+            cls1 = intf
+        if not cls2:
+            cls2 = intf
+        self.intfArgs = ( ( cls1, intfName1, node1, addr1, params1 ),
+                          ( cls2, intfName2, node2, addr2, params2 ) )
+        self.intf1, self.intf2 = None, None
+
         if fast:
             params1.setdefault( 'moveIntfFn', self._ignore )
             params2.setdefault( 'moveIntfFn', self._ignore )
+            if batch:
+                # batchCreate() will make our veth pair and interfaces
+                self.pair = ( intfName1, intfName2, addr1, addr2,
+                              node1, node2 )
+                return
             self.makeIntfPair( intfName1, intfName2, addr1, addr2,
-                               node1, node2, deleteIntfs=False )
+                               node1, node2, deleteIntfs=False, **nlopts )
         else:
-            self.makeIntfPair( intfName1, intfName2, addr1, addr2 )
+            if netlink:
+                nlMoveIntf = partial( moveIntf, netlink=True )
+                params1.setdefault( 'moveIntfFn', nlMoveIntf )
+                params2.setdefault( 'moveIntfFn', nlMoveIntf )
+            self.makeIntfPair( intfName1, intfName2, addr1, addr2, **nlopts )
 
-        if not cls1:
-            cls1 = intf
-        if not cls2:
-            cls2 = intf
+        self.makeIntfs()
+
+    # pylint: enable=too-many-branches
 
+    def makeIntfs( self ):
+        "Create our interface objects once our veth pair exists"
+        ( cls1, intfName1, node1, addr1, params1 ), (
+            cls2, intfName2, node2, addr2, params2 ) = self.intfArgs
         intf1 = cls1( name=intfName1, node=node1,
                       link=self, mac=addr1, **params1  )
         intf2 = cls2( name=intfName2, node=node2,
@@ -471,8 +657,86 @@ def __init__( self, node1, node2, port1=None, port2=None,
 
         # All we are is dust in the wind, and our two interfaces
         self.intf1, self.intf2 = intf1, intf2
+        # Record a root namespace end (deleting it deletes both ends)
+        name = self.rootIntfName()
+        if name:
+            journal.add( 'intf', name )
+
+    def rootIntfName( self ):
+        """Return the name of one of our interfaces in the root
+           namespace, or None if both ends are in node namespaces"""
+        for intf in self.intf1, self.intf2:
+            if not intf.node.inNamespace and not isinstance(
+                    intf, OVSIntf ):
+                return intf.name
+        return None
 
-    # pylint: enable=too-many-branches
+    @classmethod
+    def batchable( cls ):
+        """Can links of this class be created with batch=True?
+           (only if they are stock veth pairs)"""
+        # Subclasses such as OVSLink override it with an instance method
+        return getattr( cls.makeIntfPair, '__func__', None ) is (
+            Link.makeIntfPair.__func__ )
+
+    @classmethod
+    def batchCreate( cls, links ):
+        """Create veth pairs for links made with batch=True using
+           a single ip -batch command, then create their interfaces
+           links: links to create"""
+        def wantUp( link ):
+            "Should link's interfaces both come up (as by default)?"
+            return all( params.get( 'up', True ) is True
+                        for _cls, _name, _node, _addr, params
+                        in link.intfArgs )
+        upLinks = [ link for link in links if wantUp( link ) ]
+        downLinks = [ link for link in links if not wantUp( link ) ]
+        for up, batch in ( True, upLinks ), ( False, downLinks ):
+            isUp = makeIntfPairs( [ link.pair for link in batch ], up=up )
+            for link, flags in zip( batch, isUp ):
+                for args, flag in zip( link.intfArgs, flags ):
+                    if flag:
+                        # Already up, so skip ifconfig in config()
+                        args[ 4 ][ 'up' ] = None
+        for link in links:
+            link.makeIntfs()
+
+    @staticmethod
+    def batchDelete( links, timeout=1 ):
+        """Delete stock veth links once the shells of their nodes have
+           exited. The kernel removes veth pairs with an end in a dead
+           namespace by itself, much faster than one by one; we delete
+           the rest (and any stragglers) with a single ip -batch command.
+           links: links to delete (see batchable())
+           timeout: seconds to wait for the kernel to remove them
+           returns: interfaces that we had to delete ourselves"""
+        names, inNamespace = [], set()
+        for link in links:
+            # We only need to delete one end of each veth pair
+            name = link.rootIntfName()
+            if name:
+                names.append( name )
+                if ( link.intf1.node.inNamespace or
+                     link.intf2.node.inNamespace ):
+                    inNamespace.add( name )
+            for intf in link.intf1, link.intf2:
+                journal.remove( 'intf', intf.name )
+                intf.node.delIntf( intf )
+                intf.link = None
+            link.intf1, link.intf2 = None, None
+
+        def exists( name ):
+            "Does interface name still exist in the root namespace?"
+            return os.path.exists( '/sys/class/net/' + name )
+
+        end = time() + timeout
+        waiting = [ name for name in names if name in inNamespace ]
+        while waiting and time() < end:
+            sleep( .01 )
+            waiting = [ name for name in waiting if exists( name ) ]
+        names = [ name for name in names if exists( name ) ]
+        batchDelIntfs( names )
+        return names
 
     @staticmethod
     def _ignore( *args, **kwargs ):
@@ -487,7 +751,8 @@ def intfName( self, node, n ):
 
     @classmethod
     def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
-                      node1=None, node2=None, deleteIntfs=True ):
+                      node1=None, node2=None, deleteIntfs=True,
+                      netlink=False ):
         """Create pair of interfaces
            intfname1: name for interface 1
            intfname2: name for interface 2
@@ -495,12 +760,13 @@ def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
            addr2: MAC address for interface 2 (optional)
            node1: home node for interface 1 (optional)
            node2: home node for interface 2 (optional)
+           netlink: use rtnetlink rather than ip (False)
            (override this method [and possibly delete()]
            to change link type)"""
         # Leave this as a class method for now
         assert cls
         return makeIntfPair( intfname1, intfname2, addr1, addr2, node1, node2,
-                             deleteIntfs=deleteIntfs )
+                             deleteIntfs=deleteIntfs, netlink=netlink )
 
     def delete( self ):
         "Delete this link"
@@ -524,6 +790,10 @@ def __str__( self ):
 class OVSIntf( Intf ):
     "Patch interface on an OVSSwitch"
 
+    def rtnl( self ):
+        "OVS patch ports are not kernel interfaces"
+        return None
+
     def ifconfig( self, *args ):
         cmd = ' '.join( args )
         if cmd == 'up':
@@ -86,14 +86,16 @@
 
 """
 
+import json
 import os
 import re
 import select
 import signal
 import random
 
+from subprocess import PIPE, STDOUT
 from sys import exit  # pylint: disable=redefined-builtin
-from time import sleep
+from time import sleep, time
 from itertools import chain, groupby
 from math import ceil
 
@@ -102,11 +104,15 @@
 from mininet.node import ( Node, Host, OVSKernelSwitch, DefaultController,
                            Controller )
 from mininet.nodelib import NAT
-from mininet.link import Link, Intf
+from mininet.link import Link, Intf, TCIntf
+from mininet.topo import Topo
 from mininet.util import ( quietRun, fixLimits, numCores, ensureRoot,
                            macColonHex, ipStr, ipParse, netParse, ipAdd,
-                           waitListening, BaseString, fmtBps )
+                           waitListening, BaseString, fmtBps, encode,
+                           pmonitor, runCounts, Multiplexer,
+                           communicateAll )
 from mininet.term import cleanUpScreens, makeTerms
+from mininet.journal import journal
 
 # Mininet version: should be consistent with README and LICENSE
 VERSION = "2.3.1b4"
@@ -120,7 +126,8 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
                   build=True, xterms=False, cleanup=False, ipBase='10.0.0.0/8',
                   inNamespace=False,
                   autoSetMacs=False, autoStaticArp=False, autoPinCpus=False,
-                  listenPort=None, waitConnected=False ):
+                  listenPort=None, waitConnected=False, netlink=False,
+                  fastStop=False ):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -139,7 +146,11 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
            listenPort: base listening port to open; will be incremented for
                each additional switch in the net if inNamespace=False
            waitConnected: wait for switches to Connect?
-               (False; True/None=wait indefinitely; time(s)=timed wait)"""
+               (False; True/None=wait indefinitely; time(s)=timed wait)
+           netlink: create and configure links using rtnetlink rather
+               than ip/ifconfig commands, where possible?
+           fastStop: stop() shuts down node namespaces rather than
+               deleting stock links one by one (see stop())?"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -161,6 +172,8 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
         self.nextCore = 0  # next core for pinning hosts to CPUs
         self.listenPort = listenPort
         self.waitConn = waitConnected
+        self.netlink = netlink
+        self.fastStop = fastStop
 
         self.hosts = []
         self.switches = []
@@ -171,36 +184,64 @@ def __init__( self, topo=None, switch=OVSKernelSwitch, host=Host,
 
         self.terms = []  # list of spawned xterm processes
 
+        self.buildTimes = []  # list of ( build phase, seconds )
+        self.startTimes = []  # list of ( start phase, seconds )
+        self.stopTimes = []  # list of ( stop phase, seconds )
+        self.connectTimes = {}  # switch name -> seconds to connect
+        # build, start or stop -> phase times and run counts
+        self.phaseLog = { 'build': [], 'start': [], 'stop': [] }
+        # operation -> node or link name -> seconds
+        self.nodeTimes = {}
+        self.phaseStart, self.phaseCounts = time(), dict( runCounts )
+
         Mininet.init()  # Initialize Mininet if necessary
 
         self.built = False
+        self.started = False
         if topo and build:
             self.build()
 
     def waitConnected( self, timeout=None, delay=.5 ):
         """wait for each switch to connect to a controller
            timeout: time to wait, or None or True to wait indefinitely
-           delay: seconds to sleep per iteration
-           returns: True if all switches are connected"""
+           delay: seconds to sleep per iteration when polling
+           returns: True if all switches are connected
+           Connection times are recorded in self.connectTimes."""
         info( '*** Waiting for switches to connect\n' )
-        time = 0.0
+        start, self.connectTimes = time(), {}
         remaining = list( self.switches )
         # False: 0s timeout; None: wait forever (preserve 2.2 behavior)
         if isinstance( timeout, bool ):
             timeout = None if timeout else 0
+
+        def connected( switch ):
+            "Record switch connection"
+            self.connectTimes[ switch.name ] = time() - start
+            info( '%s ' % switch )
+            remaining.remove( switch )
+
+        def timeLeft():
+            "Return remaining time (None: wait forever)"
+            return None if timeout is None else max(
+                0, timeout - ( time() - start ) )
+        # Switch classes that can report connections wait for them...
+        for swclass, switches in groupby(
+                sorted( remaining, key=lambda s: str( type( s ) ) ), type ):
+            if hasattr( swclass, 'batchWaitConnected' ):
+                swclass.batchWaitConnected( tuple( switches ), connected,
+                                            timeout=timeLeft() )
+        # ...and we poll the rest
         while True:
             for switch in tuple( remaining ):
                 if switch.connected():
-                    info( '%s ' % switch )
-                    remaining.remove( switch )
+                    connected( switch )
             if not remaining:
                 info( '\n' )
                 return True
-            if timeout is not None and time >= timeout:
+            if timeLeft() == 0:
                 break
             sleep( delay )
-            time += delay
-        warn( 'Timed out after %d seconds\n' % time )
+        warn( 'Timed out after %d seconds\n' % ( time() - start ) )
         for switch in remaining.copy():
             if not switch.connected():
                 warn( 'Warning: %s is not connected to a controller\n'
@@ -215,6 +256,7 @@ def addHost( self, name, cls=None, **params ):
            cls: custom host class/constructor (optional)
            params: parameters for host
            returns: added host"""
+        start = time()
         # Default IP and MAC addresses
         defaults = { 'ip': ipAdd( self.nextIP,
                                   ipBaseNum=self.ipBaseNum,
@@ -232,6 +274,7 @@ def addHost( self, name, cls=None, **params ):
         h = cls( name, **defaults )
         self.hosts.append( h )
         self.nameToNode[ name ] = h
+        self.timeNode( 'addHost', name, start )
         return h
 
     def delNode( self, node, nodes=None):
@@ -258,6 +301,7 @@ def addSwitch( self, name, cls=None, **params ):
            cls: custom switch class/constructor (optional)
            returns: added switch
            side effect: increments listenPort ivar ."""
+        start = time()
         defaults = { 'listenPort': self.listenPort,
                      'inNamespace': self.inNamespace }
         defaults.update( params )
@@ -268,6 +312,7 @@ def addSwitch( self, name, cls=None, **params ):
             self.listenPort += 1
         self.switches.append( sw )
         self.nameToNode[ name ] = sw
+        self.timeNode( 'addSwitch', name, start )
         return sw
 
     def delSwitch( self, switch ):
@@ -399,12 +444,17 @@ def addLink( self, node1, node2, port1=None, port2=None,
             options.setdefault( 'port2', port2 )
         if self.intf is not None:
             options.setdefault( 'intf', self.intf )
+        if self.netlink:
+            options.setdefault( 'netlink', True )
         # Set default MAC - this should probably be in Link
         options.setdefault( 'addr1', self.randMac() )
         options.setdefault( 'addr2', self.randMac() )
         cls = self.link if cls is None else cls
+        start = time()
         link = cls( node1, node2, **options )
         self.links.append( link )
+        self.timeNode( 'addLink', '%s<->%s' % tuple(
+            args[ 1 ] for args in link.intfArgs ), start )
         return link
 
     def delLink( self, link ):
@@ -431,23 +481,379 @@ def delLinkBetween( self, node1, node2, index=0, allLinks=False ):
             self.delLink( link )
         return links
 
-    def configHosts( self ):
-        "Configure a set of hosts."
-        for host in self.hosts:
-            info( host.name + ' ' )
-            intf = host.defaultIntf()
-            if intf:
-                host.configDefault()
+    def updateLinks( self, updates ):
+        """Change traffic control parameters of many links at once.
+           The tc commands for each network namespace are sent in a
+           single tc -batch, and the batches run in parallel.
+           updates: dict of link -> params for TCIntf.tcUpdate()
+                    (bw, delay, loss etc.) for both interfaces,
+                    or ( params1, params2 ) for each interface;
+                    interfaces that aren't TCIntfs are ignored
+           Params are merged into each interface's params, which
+           keeps them for later config() calls: parameters that are
+           not given keep their values, and None removes a setting
+           (e.g. { 'delay': '5ms' } keeps bw; { 'bw': None } clears it)
+           returns: time taken to apply updates, in seconds"""
+        start = time()
+        batches, rootNode = {}, None
+        for link, params in updates.items():
+            if isinstance( params, dict ):
+                params = ( params, params )
+            for intf, intfParams in zip( ( link.intf1, link.intf2 ),
+                                         params ):
+                if not hasattr( intf, 'tcUpdate' ):
+                    continue
+                merged = dict( intf.params, **intfParams )
+                intf.params = merged
+                changes, _parent = intf.tcUpdate( **{
+                    k: v for k, v in merged.items()
+                    if k in TCIntf.tcParams and v is not None } )
+                if not changes:
+                    continue
+                # Root namespace interfaces share a single batch
+                node = intf.node
+                if not node.inNamespace:
+                    rootNode = rootNode or node
+                    node = rootNode
+                batches.setdefault( node, [] ).append( ( intf, changes ) )
+        # Start all of the batches, then wait for them
+        popens = []
+        for node, intfChanges in batches.items():
+            popen = node.popen( [ 'tc', '-force', '-batch', '-' ],
+                                stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+            popens.append( ( popen, ''.join(
+                cmd + '\n' for _intf, changes in intfChanges
+                for cmd in changes ) ) )
+        outs = communicateAll( popens )
+        for ( popen, _cmds ), out, ( node, intfChanges ) in zip(
+                popens, outs, batches.items() ):
+            if popen.returncode:
+                error( '*** Error updating links on %s: %s' % ( node, out ) )
+                # We no longer know what is installed
+                for intf, _changes in intfChanges:
+                    intf.tcCmds = None
+        elapsed = time() - start
+        debug( '*** Updated %d links (%d tc batches) in %.3f seconds\n' %
+               ( len( updates ), len( batches ), elapsed ) )
+        return elapsed
+
+    # Link() options that aren't interface parameters
+    linkOptions = ( 'node1', 'node2', 'port1', 'port2', 'cls', 'intf',
+                    'cls1', 'cls2', 'intfName1', 'intfName2', 'addr1',
+                    'addr2', 'params1', 'params2', 'fast', 'netlink',
+                    'batch' )
+
+    @classmethod
+    def linkParams( cls, info ):
+        """Split topo link info as Link() does
+           returns: link options, params1, params2"""
+        options = { k: v for k, v in info.items()
+                    if k in cls.linkOptions and
+                    k not in ( 'params1', 'params2' ) }
+        shared = { k: v for k, v in info.items()
+                   if k not in cls.linkOptions }
+        params1 = dict( info.get( 'params1' ) or {}, **shared )
+        params2 = dict( info.get( 'params2' ) or {}, **shared )
+        return options, params1, params2
+
+    def applyTopo( self, topo ):
+        """Reconfigure the network to match topo, changing only what
+           differs from the topology it was built from (self.topo).
+           Removed nodes and links are deleted; new ones are added,
+           and attached to running switches. Links whose traffic
+           control parameters changed are updated in place with
+           updateLinks(); other changed links and nodes are recreated.
+           Nodes and links that didn't come from a topology are left
+           alone.
+           topo: new topology
+           returns: dict of addNodes, delNodes (node names) and
+                    addLinks, delLinks, updateLinks ( node1, node2 )"""
+        start = time()
+        old = self.topo or Topo()
+        changes = { change: [] for change in (
+            'addNodes', 'delNodes', 'addLinks', 'delLinks', 'updateLinks' ) }
+        # Nodes to delete or recreate
+        newNodes = set( topo.nodes( sort=False ) )
+        dead = [ name for name in old.nodes()
+                 if name in self.nameToNode and (
+                     name not in newNodes or
+                     old.nodeInfo( name ) != topo.nodeInfo( name ) ) ]
+        births = [ name for name in topo.nodes()
+                   if name not in self.nameToNode or name in dead ]
+        deadNodes = set( self.nameToNode[ name ] for name in dead )
+
+        # Links are identified by their nodes and ports
+        def linkKey( node1, port1, node2, port2 ):
+            "Return key for link"
+            return tuple( sorted( ( ( node1, port1 ), ( node2, port2 ) ) ) )
+
+        def optsKey( opts ):
+            "Return key for topo link options"
+            return linkKey( opts[ 'node1' ], opts[ 'port1' ],
+                            opts[ 'node2' ], opts[ 'port2' ] )
+        live = { linkKey( link.intf1.node.name,
+                          link.intf1.node.ports.get( link.intf1 ),
+                          link.intf2.node.name,
+                          link.intf2.node.ports.get( link.intf2 ) ): link
+                 for link in self.links }
+        newLinks = [ opts for _node1, _node2, opts in
+                     topo.links( sort=True, withInfo=True ) ]
+        newOpts = { optsKey( opts ): opts for opts in newLinks }
+        delLinks, updates = [], {}
+        for _node1, _node2, opts in old.links( sort=True, withInfo=True ):
+            key = optsKey( opts )
+            link = live.get( key )
+            if not link or opts == newOpts.get( key ):
+                continue
+            params = None
+            if key in newOpts and not deadNodes.intersection(
+                    ( link.intf1.node, link.intf2.node ) ):
+                params = self.tcChanges( link, opts, newOpts[ key ] )
+            if params is None:
+                delLinks.append( link )
+            else:
+                updates[ link ] = params
+        # Other links of nodes that we delete
+        delLinks += [ link for link in self.links if link not in delLinks
+                      and deadNodes.intersection( ( link.intf1.node,
+                                                    link.intf2.node ) ) ]
+        deleted = set( delLinks )
+        addLinks = [ opts for opts in newLinks
+                     if live.get( optsKey( opts ) ) in deleted or
+                     optsKey( opts ) not in live ]
+
+        # Delete links and nodes
+        for link in delLinks:
+            for intf in link.intf1, link.intf2:
+                if ( self.started and intf.node in self.switches and
+                        intf.node not in deadNodes and
+                        hasattr( intf.node, 'detach' ) ):
+                    intf.node.detach( intf )
+            changes[ 'delLinks' ].append( ( link.intf1.node.name,
+                                            link.intf2.node.name ) )
+            self.delLink( link )
+        for node in deadNodes:
+            self.delNode( node )
+        changes[ 'delNodes' ] = dead
+        # Add nodes
+        nodes = []
+        for name in births:
+            params = topo.nodeInfo( name )
+            if topo.isSwitch( name ):
+                nodes.append( self.addSwitch( name, **params ) )
             else:
-                # Don't configure nonexistent intf
-                host.configDefault( ip=None, mac=None )
-            # You're low priority, dude!
-            # BL: do we want to do this here or not?
-            # May not make sense if we have CPU limiting...
-            # quietRun( 'renice +18 -p ' + repr( host.pid ) )
-            # This may not be the right place to do this, but
-            # it needs to be done somewhere.
+                nodes.append( self.addHost( name, **params ) )
+        self.waitStarted( nodes )
+        changes[ 'addNodes' ] = births
+        # Add links
+        configure = set( node for node in nodes if node in self.hosts )
+        for opts in addLinks:
+            params = dict( opts )
+            node1, node2 = params.pop( 'node1' ), params.pop( 'node2' )
+            link = self.addLink( node1, node2, **params )
+            for intf in link.intf1, link.intf2:
+                node = intf.node
+                if node in nodes:
+                    continue
+                if node in self.hosts and intf == node.defaultIntf():
+                    configure.add( node )
+                if ( self.started and node in self.switches and
+                        hasattr( node, 'attach' ) ):
+                    node.attach( intf )
+            changes[ 'addLinks' ].append( ( node1, node2 ) )
+        # Start new switches and configure new hosts
+        for node in nodes:
+            if self.started and node in self.switches:
+                node.start( self.controllers )
+        self.configHosts( [ host for host in self.hosts
+                            if host in configure ] )
+        # Update traffic control in place
+        if updates:
+            self.updateLinks( updates )
+            for link in updates:
+                changes[ 'updateLinks' ].append( ( link.intf1.node.name,
+                                                   link.intf2.node.name ) )
+        self.topo = topo
+        info( '*** Applied topology changes in %.3f seconds: %s\n' % (
+            time() - start, ', '.join( '%d %s' % ( len( v ), k )
+                                       for k, v in sorted( changes.items() )
+                                       if v ) or 'none' ) )
+        return changes
+
+    def tcChanges( self, link, oldInfo, newInfo ):
+        """Return ( params1, params2 ) for updateLinks() if only
+           traffic control parameters differ between old and new
+           topo link info, or None if link must be recreated"""
+        oldOptions, old1, old2 = self.linkParams( oldInfo )
+        newOptions, new1, new2 = self.linkParams( newInfo )
+        if oldOptions != newOptions:
+            return None
+        result = []
+        for intf, old, new in ( ( link.intf1, old1, new1 ),
+                                ( link.intf2, old2, new2 ) ):
+            changed = set( k for k in set( old ) | set( new )
+                           if old.get( k ) != new.get( k ) )
+            if changed and not isinstance( intf, TCIntf ):
+                return None
+            if not changed.issubset( TCIntf.tcParams ):
+                return None
+            # Clear parameters that have been removed
+            result.append( { k: new.get( k ) for k in TCIntf.tcParams
+                             if k in old or k in new } )
+        return tuple( result )
+
+    def waitStarted( self, nodes=None ):
+        """Wait for node shells to start up, polling all of them at once
+           nodes: nodes to wait for (default: all nodes)"""
+        nodes = [ node for node in ( nodes or self.values() )
+                  if node.starting ]
+        poller = select.poll()
+        for node in nodes:
+            poller.register( node.stdout, select.POLLIN )
+        remaining = len( nodes )
+        while remaining:
+            for fd, _event in poller.poll():
+                node = Node.outToNode[ fd ]
+                if node.waitStarted( timeoutms=0 ):
+                    poller.unregister( fd )
+                    remaining -= 1
+
+    def cmdAll( self, cmds, nodes=None, timeout=None ):
+        """Run command(s) on many nodes at once, collecting output
+           with a single poll loop over all of their shells.
+           cmds: command for every node, or dict of node -> command;
+                 a command may also be a list of commands (see cmdBatch)
+           nodes: nodes to run on (default: cmds keys if dict, or hosts)
+           timeout: per-node timeout in seconds (None: wait forever)
+           returns: dict of node -> output (None if node timed out)"""
+        if nodes is None:
+            nodes = list( cmds ) if isinstance( cmds, dict ) else self.hosts
+        nodes = [ self[ node ] if isinstance( node, BaseString ) else node
+                  for node in nodes ]
+        if isinstance( cmds, dict ):
+            cmds = { ( self[ node ] if isinstance( node, BaseString )
+                       else node ): cmd for node, cmd in cmds.items() }
+        poller = select.poll()
+        results = {}
+        remaining = set()
+        for node in nodes:
+            cmd = cmds[ node ] if isinstance( cmds, dict ) else cmds
+            node.sendCmds( [ cmd ] if isinstance( cmd, BaseString )
+                           else cmd )
+            # Nodes with nothing to run are already done
+            if node.waiting:
+                remaining.add( node )
+                poller.register( node.stdout, select.POLLIN )
+
+        def check( node ):
+            "Process node's output, and stop polling it when done"
+            node.monitorCmds( timeoutms=0 )
+            if not node.waiting and node in remaining:
+                remaining.remove( node )
+                poller.unregister( node.stdout )
+
+        start = time()
+        while remaining:
+            # poll() doesn't report output that is already buffered
+            buffered = [ node for node in remaining if node.readbuf ]
+            for node in buffered:
+                check( node )
+            timeoutms = None
+            if timeout is not None:
+                remainingSecs = start + timeout - time()
+                timeoutms = max( 0, int( 1000 * remainingSecs ) )
+            if buffered:
+                timeoutms = 0
+            ready = poller.poll( timeoutms )
+            for fd, _event in ready:
+                check( Node.outToNode[ fd ] )
+            if not ready and not buffered and timeout is not None:
+                break
+        for node in nodes:
+            if node in remaining:
+                warn( '*** %s: timed out after %ss\n' % ( node, timeout ) )
+                node.stopCmds()
+                results[ node ] = None
+            else:
+                results[ node ] = ''.join( out for out, _status
+                                           in node.batchResults )
+        return results
+
+    # Maximum number of hosts that configHosts() configures at once
+    configWindow = 256
+
+    @staticmethod
+    def configHost( host ):
+        "Configure host with its default parameters"
+        if host.defaultIntf():
+            host.configDefault()
+        else:
+            # Don't configure nonexistent intf
+            host.configDefault( ip=None, mac=None )
+
+    @classmethod
+    def deferConfig( cls, host ):
+        """Configure host, queueing its shell commands rather than
+           running them. A host with a custom config() is configured
+           directly, since its config() may use the output of its
+           commands or tolerate their failure.
+           returns: list of queued commands"""
+        if type( host ).config != Node.config:
+            cls.configHost( host )
+            return []
+        deferred = host.deferCmds()
+        try:
+            cls.configHost( host )
+        finally:
+            cmds = host.deferred if deferred else []
+            if deferred:
+                host.deferred = None
+        return cmds
+
+    def configHosts( self, hosts=None ):
+        """Configure a set of hosts. Each host's configuration commands
+           are sent to its shell as one batch, and up to configWindow
+           hosts are configured at once, with a single poll loop over
+           their shells. If any of these commands fails, we stop
+           configuring further hosts and raise an exception. Hosts
+           with a custom config() run their commands one at a time,
+           and a failure there is left to the host to handle.
+           hosts: hosts to configure (default: all hosts)"""
+        if hosts is None:
+            hosts = self.hosts
+        pending = list( reversed( hosts ) )
+        running, failed = {}, []
+        poller = select.poll()
+        while pending or running:
+            while ( pending and not failed and
+                    len( running ) < self.configWindow ):
+                host = pending.pop()
+                info( host.name + ' ' )
+                cmds = self.deferConfig( host )
+                if not cmds or not host.shell:
+                    continue
+                host.sendCmds( cmds )
+                running[ host.stdout.fileno() ] = host, cmds, time()
+                poller.register( host.stdout, select.POLLIN )
+            if not running:
+                break
+            for fd, _event in poller.poll():
+                host, cmds, start = running[ fd ]
+                host.monitorCmds( timeoutms=0 )
+                if host.waiting:
+                    continue
+                poller.unregister( fd )
+                del running[ fd ]
+                self.timeNode( 'configHost', host.name, start )
+                for cmd, ( out, status ) in zip( cmds, host.batchResults ):
+                    if status:
+                        error( '\n*** %s: %s failed (%d): %s\n' %
+                               ( host, cmd, status, out.strip() ) )
+                if any( status for _out, status in host.batchResults ):
+                    failed.append( host.name )
         info( '\n' )
+        if failed:
+            raise Exception( 'Could not configure %s' % ' '.join( failed ) )
 
     def buildFromTopo( self, topo=None ):
         """Build mininet from a topology object
@@ -460,6 +866,7 @@ def buildFromTopo( self, topo=None ):
             pass
 
         info( '*** Creating network\n' )
+        phase = self.timePhase
 
         if not self.controllers and self.controller:
             # Add a default controller
@@ -473,11 +880,13 @@ def buildFromTopo( self, topo=None ):
                     self.addController( cls )
                 else:
                     self.addController( 'c%d' % i, cls )
+            phase( 'controllers' )
 
         info( '*** Adding hosts:\n' )
         for hostName in topo.hosts():
             self.addHost( hostName, **topo.nodeInfo( hostName ) )
             info( hostName + ' ' )
+        phase( 'hosts' )
 
         info( '\n*** Adding switches:\n' )
         for switchName in topo.switches():
@@ -488,12 +897,31 @@ def buildFromTopo( self, topo=None ):
                 params.setdefault( 'batch', True )
             self.addSwitch( switchName, **params )
             info( switchName + ' ' )
+        phase( 'switches' )
+
+        # Node shells start up concurrently; wait for all of them
+        self.waitStarted()
+        phase( 'shells' )
 
         info( '\n*** Adding links:\n' )
+        batched = []
         for srcName, dstName, params in topo.links(
                 sort=True, withInfo=True ):
-            self.addLink( **params )
+            # Create stock veth pairs in bulk below, if we can
+            params = dict( params )
+            cls = params.get( 'cls', self.link )
+            if ( hasattr( cls, 'batchCreate' ) and cls.batchable() and
+                 params.get( 'fast', True ) and
+                 'port1' in params and 'port2' in params ):
+                params.setdefault( 'batch', True )
+            link = self.addLink( **params )
+            if params.get( 'batch' ):
+                batched.append( link )
             info( '(%s, %s) ' % ( srcName, dstName ) )
+        for cls, links in groupby(
+                sorted( batched, key=lambda b: str( type( b ) ) ), type ):
+            cls.batchCreate( tuple( links ) )
+        phase( 'links' )
 
         info( '\n' )
 
@@ -502,18 +930,74 @@ def configureControlNetwork( self ):
         raise Exception( 'configureControlNetwork: '
                          'should be overriden in subclass', self )
 
+    def startPhases( self, stage ):
+        """Start timing the phases of a stage
+           stage: build, start or stop"""
+        setattr( self, stage + 'Times', [] )
+        self.phaseLog[ stage ] = []
+        self.phaseStart, self.phaseCounts = time(), dict( runCounts )
+
+    def timePhase( self, phase, stage='build' ):
+        """Record time taken by a phase since the last one, along with
+           the numbers of commands and processes that it ran
+           phase: name of phase
+           stage: build, start or stop"""
+        now, counts = time(), dict( runCounts )
+        seconds = now - self.phaseStart
+        getattr( self, stage + 'Times' ).append( ( phase, seconds ) )
+        entry = { 'phase': phase, 'seconds': seconds }
+        for key, count in counts.items():
+            entry[ key ] = count - self.phaseCounts[ key ]
+        self.phaseLog[ stage ].append( entry )
+        self.phaseStart, self.phaseCounts = now, counts
+
+    def timeNode( self, op, name, start ):
+        """Record time taken by an operation on a node or link
+           op: operation, e.g. addHost
+           name: node or link name
+           start: time() when the operation started"""
+        self.nodeTimes.setdefault( op, {} )[ name ] = time() - start
+
+    def timings( self ):
+        """Return timings as JSON:
+           phases: for build, start and stop, a list of phases with
+             their durations and the numbers of root commands (runs),
+             other processes (popens) and node shell commands (cmds)
+             that they ran
+           nodes: for each timed operation (addHost, addSwitch, addLink,
+             startShell, configHost, startSwitch, waitConnected), the
+             seconds it took for each node or link
+           counts: total runs, popens and cmds"""
+        nodes = dict( self.nodeTimes )
+        shells = { node.name: node.shellTime for node in self.values()
+                   if node.shellTime is not None }
+        if shells:
+            nodes[ 'startShell' ] = shells
+        if self.connectTimes:
+            nodes[ 'waitConnected' ] = dict( self.connectTimes )
+        return json.dumps( { 'phases': self.phaseLog, 'nodes': nodes,
+                             'counts': dict( runCounts ) },
+                           sort_keys=True )
+
     def build( self ):
         "Build mininet."
+        self.startPhases( 'build' )
         if self.topo:
             self.buildFromTopo( self.topo )
         if self.inNamespace:
             self.configureControlNetwork()
+            self.timePhase( 'control network' )
         info( '*** Configuring hosts\n' )
         self.configHosts()
+        self.timePhase( 'config' )
         if self.xterms:
             self.startTerms()
+            self.timePhase( 'terms' )
         if self.autoStaticArp:
             self.staticArp()
+            self.timePhase( 'arp' )
+        info( '*** Build times: %s\n' % ', '.join(
+            '%s %.3fs' % times for times in self.buildTimes ) )
         self.built = True
 
     def startTerms( self ):
@@ -526,33 +1010,91 @@ def startTerms( self ):
         self.terms += makeTerms( self.controllers, 'controller' )
         self.terms += makeTerms( self.switches, 'switch' )
         self.terms += makeTerms( self.hosts, 'host' )
+        for term in self.terms:
+            journal.add( 'process', 'term%d' % term.pid, term.pid )
 
     def stopXterms( self ):
         "Kill each xterm."
         for term in self.terms:
             os.kill( term.pid, signal.SIGKILL )
+            journal.remove( 'process', 'term%d' % term.pid )
         cleanUpScreens()
 
+    # Maximum number of ip -batch processes that staticArp() runs at once
+    arpWindow = 256
+
+    @staticmethod
+    def arpBatch( src, entries ):
+        """Return ip -batch commands to add static ARP entries to src
+           src: host
+           entries: list of ( ip, ip as int, mac ) of other hosts
+           returns: neigh commands, one per line"""
+        intfs = []
+        for intf in src.intfList():
+            if intf.ip:
+                prefixLen = int( intf.prefixLen )
+                mask = ( 0xffffffff << ( 32 - prefixLen ) ) & 0xffffffff
+                intfs.append( ( intf.name, ipParse( intf.ip ) & mask,
+                                mask ) )
+        if not intfs:
+            return ''
+        # Use the interface on the destination's subnet if there is one
+        default = src.defaultIntf().name
+        cmds = []
+        for ip, ipInt, mac in entries:
+            if ip == src.IP():
+                continue
+            dev = next( ( name for name, net, mask in intfs
+                          if ipInt & mask == net ), default )
+            cmds.append( 'neigh replace %s lladdr %s dev %s nud permanent\n'
+                         % ( ip, mac, dev ) )
+        return ''.join( cmds )
+
     def staticArp( self ):
-        "Add all-pairs ARP entries to remove the need to handle broadcast."
-        for src in self.hosts:
-            for dst in self.hosts:
-                if src != dst:
-                    src.setARP( ip=dst.IP(), mac=dst.MAC() )
+        """Add all-pairs ARP entries to remove the need to handle broadcast.
+           Each host loads its entries with a single ip -batch, and up
+           to arpWindow hosts are loaded in parallel."""
+        entries = [ ( host.IP(), ipParse( host.IP() ), host.MAC() )
+                    for host in self.hosts if host.IP() and host.MAC() ]
+        srcs, popens = [], []
+
+        def batches():
+            "Start an ip -batch for each host, as communicateAll() asks"
+            for src in self.hosts:
+                cmds = self.arpBatch( src, entries )
+                if not cmds:
+                    continue
+                popen = src.popen( [ 'ip', '-force', '-batch', '-' ],
+                                   stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+                srcs.append( src )
+                popens.append( popen )
+                yield popen, cmds
+
+        outs = communicateAll( batches(), window=self.arpWindow )
+        for src, popen, out in zip( srcs, popens, outs ):
+            if popen.returncode or out:
+                error( '*** Error setting static ARP entries on %s: %s'
+                       % ( src, out ) )
 
     def start( self ):
-        "Start controller and switches."
+        """Start controller and switches.
+           Phase times are recorded in self.startTimes."""
         if not self.built:
             self.build()
+        self.startPhases( 'start' )
         info( '*** Starting controller\n' )
         for controller in self.controllers:
             info( controller.name + ' ')
             controller.start()
         info( '\n' )
+        self.timePhase( 'controllers', 'start' )
         info( '*** Starting %s switches\n' % len( self.switches ) )
         for switch in self.switches:
             info( switch.name + ' ')
+            start = time()
             switch.start( self.controllers )
+            self.timeNode( 'startSwitch', switch.name, start )
+        self.timePhase( 'switches', 'start' )
         started = {}
         for swclass, switches in groupby(
                 sorted( self.switches,
@@ -562,16 +1104,35 @@ def start( self ):
                 success = swclass.batchStartup( switches )
                 started.update( { s: s for s in success } )
         info( '\n' )
+        self.timePhase( 'batchStartup', 'start' )
+        self.started = True
         if self.waitConn:
             self.waitConnected( self.waitConn )
+            self.timePhase( 'waitConnected', 'start' )
+
+    def stop( self, fast=None ):
+        """Stop the controller(s), switches and hosts
+           fast: stop hosts first, sending all of their shells kill
+                 signals before waiting for any of them, and let the
+                 kernel remove stock veth pairs along with the host
+                 namespaces rather than deleting them one by one
+                 (default: self.fastStop)
+           Phase times are recorded in self.stopTimes."""
+        if fast is None:
+            fast = self.fastStop
+        self.started = False
+        self.startPhases( 'stop' )
+
+        def phase( name ):
+            "Record time for stop phase"
+            self.timePhase( name, 'stop' )
 
-    def stop( self ):
-        "Stop the controller(s), switches and hosts"
         info( '*** Stopping %i controllers\n' % len( self.controllers ) )
         for controller in self.controllers:
             info( controller.name + ' ' )
             controller.stop()
         info( '\n' )
+        phase( 'controllers' )
         # Unlimit cfs hosts to speed up shutdown
         for h in self.hosts:
             if hasattr( h, 'unlimit' ):
@@ -579,11 +1140,24 @@ def stop( self ):
         if self.terms:
             info( '*** Stopping %i terms\n' % len( self.terms ) )
             self.stopXterms()
-        info( '*** Stopping %i links\n' % len( self.links ) )
-        for link in self.links:
+            phase( 'terms' )
+        links, deferred = self.links, []
+        if fast:
+            # Stock veth pairs go away with their namespaces
+            links = [ link for link in self.links if not link.batchable() ]
+            deferred = [ link for link in self.links if link.batchable() ]
+        info( '*** Stopping %i links\n' % len( links ) )
+        for link in links:
             info( '.' )
             link.stop()
         info( '\n' )
+        phase( 'links' )
+        if fast:
+            self.stopHosts( fast )
+            phase( 'hosts' )
+            info( '*** Removing %i links\n' % len( deferred ) )
+            Link.batchDelete( deferred )
+            phase( 'namespace links' )
         info( '*** Stopping %i switches\n' % len( self.switches ) )
         stopped = {}
         for swclass, switches in groupby(
@@ -597,13 +1171,47 @@ def stop( self ):
             info( switch.name + ' ' )
             if switch not in stopped:
                 switch.stop()
-            switch.terminate()
+            if not fast:
+                switch.terminate()
+        if fast:
+            self.terminateNodes( self.switches )
         info( '\n' )
+        phase( 'switches' )
+        if not fast:
+            self.stopHosts( fast )
+            phase( 'hosts' )
+        info( '*** Stop times: %s\n' % ', '.join(
+            '%s %.3fs' % times for times in self.stopTimes ) )
+        info( '*** Done\n' )
+
+    def stopHosts( self, fast=False ):
+        """Terminate our hosts
+           fast: terminate them concurrently?"""
         info( '*** Stopping %i hosts\n' % len( self.hosts ) )
-        for host in self.hosts:
-            info( host.name + ' ' )
-            host.terminate()
-        info( '\n*** Done\n' )
+        info( ' '.join( host.name for host in self.hosts ) + ' ' )
+        if fast:
+            self.terminateNodes( self.hosts )
+        else:
+            for host in self.hosts:
+                host.terminate()
+        info( '\n' )
+
+    @staticmethod
+    def terminateNodes( nodes ):
+        """Terminate nodes, sending all of their shells kill signals
+           before waiting for any of them to exit
+           nodes: nodes to terminate"""
+        reap = []
+        for node in nodes:
+            if type( node ).terminate == Node.terminate:
+                node.unmountPrivateDirs()
+                node.killShell()
+                reap.append( node )
+            else:
+                # A custom terminate() may still need the node's shell
+                node.terminate()
+        for node in reap:
+            node.cleanup()
 
     def run( self, test, *args, **kwargs ):
         "Perform a complete start/test/stop cycle."
@@ -618,24 +1226,31 @@ def monitor( self, hosts=None, timeoutms=-1 ):
            and return their output, a line at a time.
            hosts: (optional) set of hosts to monitor
            timeoutms: (optional) timeout value in ms
-           returns: iterator which returns host, line"""
+           returns: iterator which returns host, line
+           (minus newline), or None, None after timeoutms
+           without output, until all host shells have exited"""
         if hosts is None:
             hosts = self.hosts
-        poller = select.poll()
-        h1 = hosts[ 0 ]  # so we can call class method fdToNode
+        mux = Multiplexer()
         for host in hosts:
-            poller.register( host.stdout )
-        while True:
-            ready = poller.poll( timeoutms )
-            for fd, event in ready:
-                host = h1.fdToNode( fd )
-                if event & select.POLLIN:
-                    line = host.readline()
-                    if line is not None:
-                        yield host, line
-            # Return if non-blocking
-            if not ready and timeoutms >= 0:
-                yield None, None
+            mux.add( host, host.stdout, data=encode( host.readbuf ) )
+            host.readbuf = ''
+        try:
+            for host, line in mux.lines(
+                    None if timeoutms < 0 else timeoutms ):
+                if host is None:
+                    yield None, None
+                    continue
+                if line.endswith( '\n' ):
+                    line = line[ :-1 ]
+                yield host, line
+        finally:
+            # Give back any partial lines that we read
+            for host in hosts:
+                if host in mux:
+                    leftover = host.decoder.decode( mux.remove( host ) )
+                    host.readbuf = leftover + host.readbuf
+            mux.close()
 
     # XXX These test methods should be moved out of this class.
     # Probably we should create a tests.py for them
@@ -655,8 +1270,62 @@ def _parsePing( pingOutput ):
         sent, received = int( m.group( 1 ) ), int( m.group( 2 ) )
         return sent, received
 
+    # Maximum number of pings that _pingAllPairs() runs at once
+    pingWindow = 256
+
+    def _pingAllPairs( self, hosts, timeout=None, count=1 ):
+        """Internal method: ping between all pairs of hosts at once.
+           Each host runs a shell which pings its peers in the
+           background, a group at a time, and we collect the output
+           of all of the shells with a single poll loop. Shells are
+           started as others finish, so that at most pingWindow pings
+           run at once.
+           hosts: list of hosts
+           timeout: time to wait for a response, as string
+           count: number of pings to send to each peer
+           returns: N x N list of ping outputs from hosts[ i ] to
+             hosts[ j ], or None for i == j and peers without intfs"""
+        opts = '-q -c%d' % count
+        if timeout:
+            opts += ' -W %s' % timeout
+        results = [ [ None ] * len( hosts ) for _host in hosts ]
+        # Pings per shell, and shells at once
+        group = max( 1, self.pingWindow // max( 1, len( hosts ) ) )
+        window = max( 1, self.pingWindow // group )
+        sources = []
+        for i, node in enumerate( hosts ):
+            peers = [ j for j, dest in enumerate( hosts )
+                      if dest != node and dest.intfs ]
+            if peers:
+                sources.append( ( i, node, peers ) )
+                for j in peers:
+                    results[ i ][ j ] = ''
+
+        def shells():
+            "Start a shell for each source, with its script"
+            for _i, node, peers in sources:
+                # One line of output per peer, which is short enough
+                # that concurrent writes to the pipe won't be
+                # interleaved
+                script = ''.join(
+                    'echo "%d $(LANG=C ping %s %s 2>&1 | tr \'\\n\' \' \')"'
+                    ' &\n%s' % ( j, opts, hosts[ j ].IP(),
+                                 'wait\n' if n % group == group - 1
+                                 else '' )
+                    for n, j in enumerate( peers ) )
+                yield ( node.popen( [ 'sh' ], stdin=PIPE, stdout=PIPE,
+                                    stderr=STDOUT ), script + 'wait\n' )
+
+        outs = communicateAll( shells(), window=window )
+        for ( i, _node, _peers ), out in zip( sources, outs ):
+            for line in out.splitlines():
+                j, _, result = line.partition( ' ' )
+                results[ i ][ int( j ) ] = result
+        return results
+
     def ping( self, hosts=None, timeout=None ):
-        """Ping between all specified hosts.
+        """Ping between all specified hosts, with all hosts pinging
+           all of their peers at once.
            hosts: list of hosts
            timeout: time to wait for a response, as string
            returns: ploss packet loss percentage"""
@@ -667,16 +1336,12 @@ def ping( self, hosts=None, timeout=None ):
         if not hosts:
             hosts = self.hosts
             output( '*** Ping: testing ping reachability\n' )
-        for node in hosts:
+        results = self._pingAllPairs( hosts, timeout=timeout )
+        for node, row in zip( hosts, results ):
             output( '%s -> ' % node.name )
-            for dest in hosts:
+            for dest, result in zip( hosts, row ):
                 if node != dest:
-                    opts = ''
-                    if timeout:
-                        opts = '-W %s' % timeout
-                    if dest.intfs:
-                        result = node.cmd( 'LANG=C ping -c1 %s %s' %
-                                           (opts, dest.IP()) )
+                    if result is not None:
                         sent, received = self._parsePing( result )
                     else:
                         sent, received = 0, 0
@@ -699,6 +1364,41 @@ def ping( self, hosts=None, timeout=None ):
             output( "*** Warning: No packets sent\n" )
         return ploss
 
+    def pingMatrix( self, hosts=None, timeout=None, count=1 ):
+        """Ping between all specified hosts at once.
+           hosts: list of hosts (default: all hosts)
+           timeout: time to wait for a response, as string
+           count: number of pings to send between each pair
+           returns: loss, rtt: N x N lists of packet loss percentage
+             and average rtt (ms) from hosts[ i ] to hosts[ j ], which
+             are nan if no packets were sent (or none came back, for
+             rtt); e.g. numpy.array( loss ) is an N x N array"""
+        if not hosts:
+            hosts = self.hosts
+        nan = float( 'nan' )
+        loss = [ [ nan ] * len( hosts ) for _host in hosts ]
+        rtt = [ [ nan ] * len( hosts ) for _host in hosts ]
+        results = self._pingAllPairs( hosts, timeout=timeout, count=count )
+        for i, row in enumerate( results ):
+            for j, result in enumerate( row ):
+                if result is None:
+                    continue
+                sent, received, _rttmin, rttavg, _rttmax, _rttdev = (
+                    self._parsePingFull( result ) )
+                loss[ i ][ j ] = 100.0 * ( sent - received ) / sent
+                if received:
+                    rtt[ i ][ j ] = rttavg
+        return loss, rtt
+
+    def aping( self, hosts=None, timeout=None ):
+        """Coroutine: ping between all specified hosts, with all
+           hosts pinging at once (Python 3 only; see mininet.aio)
+           hosts: list of hosts
+           timeout: time to wait for a response, as string
+           returns: awaitable ploss packet loss percentage"""
+        from mininet.aio import aping
+        return aping( self, hosts=hosts, timeout=timeout )
+
     @staticmethod
     def _parsePingFull( pingOutput ):
         "Parse ping output and return all data."
@@ -731,7 +1431,7 @@ def _parsePingFull( pingOutput ):
         return sent, received, rttmin, rttavg, rttmax, rttdev
 
     def pingFull( self, hosts=None, timeout=None ):
-        """Ping between all specified hosts and return all data.
+        """Ping between all specified hosts at once and return all data.
            hosts: list of hosts
            timeout: time to wait for a response, as string
            returns: all ping data; see function body."""
@@ -741,15 +1441,15 @@ def pingFull( self, hosts=None, timeout=None ):
         if not hosts:
             hosts = self.hosts
             output( '*** Ping: testing ping reachability\n' )
-        for node in hosts:
+        results = self._pingAllPairs( hosts, timeout=timeout )
+        for node, row in zip( hosts, results ):
             output( '%s -> ' % node.name )
-            for dest in hosts:
+            for dest, result in zip( hosts, row ):
                 if node != dest:
-                    opts = ''
-                    if timeout:
-                        opts = '-W %s' % timeout
-                    result = node.cmd( 'ping -c1 %s %s' % (opts, dest.IP()) )
-                    outputs = self._parsePingFull( result )
+                    if result is not None:
+                        outputs = self._parsePingFull( result )
+                    else:
+                        outputs = ( 0, 0, 0, 0, 0, 0 )
                     sent, received, rttmin, rttavg, rttmax, rttdev = outputs
                     all_outputs.append( (node, dest, outputs) )
                     output( ( '%s ' % dest.name ) if received else 'X ' )
@@ -863,6 +1563,118 @@ def iperf( self, hosts=None, l4Type='TCP', udpBw='10M', fmt=None,
         output( '*** Results: %s\n' % result )
         return result
 
+    def aiperf( self, hosts=None, l4Type='TCP', udpBw='10M', fmt=None,
+                seconds=5, port=5001 ):
+        """Coroutine: run iperf between two hosts without blocking
+           the event loop (Python 3 only; see iperf() and mininet.aio)
+           returns: awaitable [ server, client ] speeds"""
+        from mininet.aio import aiperf
+        return aiperf( self, hosts=hosts, l4Type=l4Type, udpBw=udpBw,
+                       fmt=fmt, seconds=seconds, port=port )
+
+    def trafficMatrix( self, pairs=None, duration=5, l4Type='TCP',
+                       udpBw='10M', fmt=None, port=5001, timeout=10 ):
+        """Run iperf flows between many pairs of hosts at once.
+           All servers are started in parallel, all clients are
+           released at the same moment, and the CSV output of every
+           iperf is collected with a single pmonitor() loop.
+           pairs: list of ( client, server ) hosts or names
+                  (default: all ordered pairs of hosts)
+           duration: iperf time to transmit
+           l4Type: string, one of [ TCP, UDP ]
+           udpBw: bandwidth target for UDP flows
+           fmt: scale/format argument (e.g. m/M for Mbps)
+           port: iperf server port
+           timeout: extra seconds to wait for clients and servers
+           returns: flows, total: list of dicts with client, server,
+             sent (client rate) and received (server rate) in bps for
+             each pair, and total received bps"""
+        if pairs is None:
+            pairs = [ ( client, server ) for client in self.hosts
+                      for server in self.hosts if client != server ]
+        pairs = [ tuple( self[ h ] if isinstance( h, BaseString ) else h
+                         for h in pair ) for pair in pairs ]
+        servers = sorted( set( server for _client, server in pairs ),
+                          key=lambda server: server.name )
+        output( '*** Iperf: testing %s bandwidth of %d flows between '
+                '%d hosts\n' % ( l4Type, len( pairs ), len(
+                    set( chain.from_iterable( pairs ) ) ) ) )
+        quietRun( 'killall -9 iperf' )
+        # Note: CSV mode
+        iperfArgs = [ 'iperf', '-y', 'C', '-p', str( port ) ]
+        bwArgs = []
+        if l4Type == 'UDP':
+            iperfArgs.append( '-u' )
+            bwArgs = [ '-b', udpBw ]
+        popens = {}
+        for server in servers:
+            popens[ server ] = server.popen( iperfArgs + [ '-s' ],
+                                             stdout=PIPE, stderr=STDOUT )
+        if l4Type == 'TCP':
+            for client, server in pairs:
+                if server in servers:
+                    servers.remove( server )
+                    if not waitListening( client, server.IP(), port,
+                                          timeout=timeout ):
+                        raise Exception( 'Could not connect to iperf on '
+                                         'port %d' % port )
+        # Clients wait for a line on stdin so that they all start at once
+        for i, ( client, server ) in enumerate( pairs ):
+            cmd = ' '.join( iperfArgs + [ '-t', str( duration ), '-c',
+                                          server.IP() ] + bwArgs )
+            popens[ i ] = client.popen(
+                [ 'sh', '-c', 'read go && exec ' + cmd ],
+                stdin=PIPE, stdout=PIPE, stderr=STDOUT )
+        for i in range( len( pairs ) ):
+            popens[ i ].stdin.write( b'\n' )
+            popens[ i ].stdin.close()
+        start = time()
+        clientVals = [ None ] * len( pairs )
+        serverVals = {}
+        procs = dict( popens )
+        stopped = False
+        for key, line in pmonitor( popens, timeoutms=1000 ):
+            if key is not None:
+                debug( 'iperf %s: %s' % ( key, line ) )
+            if isinstance( key, int ):
+                vals = self._iperfVals( line, pairs[ key ][ 1 ].IP() )
+                # UDP clients also report what the server received
+                if vals and clientVals[ key ] is None:
+                    clientVals[ key ] = vals
+            elif key is not None:
+                vals = self._iperfVals( line, key.IP() )
+                if vals:
+                    serverVals[ vals[ 'cip' ], vals[ 'cport' ] ] = vals
+            if stopped:
+                continue
+            clientsDone = not any( isinstance( key, int )
+                                   for key in popens )
+            reported = all( vals and ( vals[ 'cip' ], vals[ 'cport' ] )
+                            in serverVals for vals in clientVals )
+            elapsed = time() - start
+            if ( ( clientsDone and reported ) or
+                 elapsed > duration + 2 * timeout or
+                 ( clientsDone and elapsed > duration + timeout ) ):
+                for popen in popens.values():
+                    popen.terminate()
+                stopped = True
+        for popen in procs.values():
+            popen.wait()
+        flows, total = [], 0
+        for ( client, server ), cvals in zip( pairs, clientVals ):
+            svals = serverVals.get( ( cvals[ 'cip' ], cvals[ 'cport' ] )
+                                    if cvals else None, {} )
+            flow = { 'client': client, 'server': server,
+                     'sent': int( cvals[ 'rate' ] ) if cvals else 0,
+                     'received': int( svals.get( 'rate', 0 ) ) }
+            total += flow[ 'received' ]
+            flows.append( flow )
+            output( '%s -> %s: %s / %s\n' % (
+                client, server, fmtBps( flow[ 'received' ], fmt ),
+                fmtBps( flow[ 'sent' ], fmt ) ) )
+        output( '*** Results: %s total received\n' % fmtBps( total, fmt ) )
+        return flows, total
+
     def runCpuLimitTest( self, cpu, duration=5 ):
         """run CPU limit test with 'while true' processes.
         cpu: desired CPU fraction of each host
@@ -0,0 +1,318 @@
+"""
+netlink.py: minimal rtnetlink client for interface configuration
+
+Creating, moving and configuring interfaces with ip and ifconfig costs
+a process (and often a node shell round trip) per operation. RtNetlink
+talks to the kernel directly over a NETLINK_ROUTE socket instead. A
+socket stays bound to the network namespace it was created in, so we
+briefly setns() into a node's namespace to create its socket, and then
+reuse that socket for all of the node's interfaces.
+
+Only the handful of operations Mininet needs are supported:
+
+- creating veth pairs, with the peer in another namespace
+- deleting, renaming and moving links, and setting MACs and up/down
+- setting and querying IPv4 addresses
+
+netlinkFor() returns None if rtnetlink is unavailable, in which case
+callers should fall back to running ip/ifconfig.
+"""
+
+import ctypes
+import errno
+import os
+import socket
+import struct
+from collections import namedtuple
+
+from mininet.log import warn, debug
+
+# Netlink and rtnetlink constants (linux/netlink.h, linux/rtnetlink.h,
+# linux/if_link.h, linux/if_addr.h, linux/veth.h)
+
+NETLINK_ROUTE = 0
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+NLM_F_REQUEST, NLM_F_MULTI, NLM_F_ACK = 0x1, 0x2, 0x4
+NLM_F_DUMP, NLM_F_EXCL, NLM_F_CREATE = 0x300, 0x200, 0x400
+RTM_NEWLINK, RTM_DELLINK, RTM_GETLINK, RTM_SETLINK = 16, 17, 18, 19
+RTM_NEWADDR, RTM_DELADDR, RTM_GETADDR = 20, 21, 22
+IFLA_ADDRESS, IFLA_IFNAME, IFLA_LINKINFO, IFLA_NET_NS_PID = 1, 3, 18, 19
+IFLA_INFO_KIND, IFLA_INFO_DATA, VETH_INFO_PEER = 1, 2, 1
+IFA_ADDRESS, IFA_LOCAL, IFA_BROADCAST = 1, 2, 4
+IFF_UP = 0x1
+CLONE_NEWNET = 0x40000000
+
+# struct nlmsghdr, struct ifinfomsg, struct ifaddrmsg, struct rtattr
+NLMSG_HDR = struct.Struct( 'IHHII' )
+IFINFOMSG = struct.Struct( 'BxHiII' )
+IFADDRMSG = struct.Struct( 'BBBBI' )
+RTATTR = struct.Struct( 'HH' )
+
+LinkInfo = namedtuple( 'LinkInfo', 'index name flags mac' )
+
+
+def attr( atype, data ):
+    "Return rtattr of type atype containing data (bytes)"
+    length = RTATTR.size + len( data )
+    return RTATTR.pack( length, atype ) + data + b'\0' * ( -length % 4 )
+
+
+def strAttr( atype, string ):
+    "Return rtattr of type atype containing NUL-terminated string"
+    return attr( atype, string.encode( 'ascii' ) + b'\0' )
+
+
+def macAttr( atype, mac ):
+    "Return rtattr of type atype containing MAC address mac (xx:xx:...)"
+    return attr( atype, bytes( bytearray( int( b, 16 )
+                                          for b in mac.split( ':' ) ) ) )
+
+
+def parseAttrs( data, pos=0 ):
+    "Return dict of rtattr type -> data for rtattrs in data[ pos: ]"
+    attrs = {}
+    while pos + RTATTR.size <= len( data ):
+        length, atype = RTATTR.unpack_from( data, pos )
+        if length < RTATTR.size:
+            break
+        attrs[ atype ] = data[ pos + RTATTR.size: pos + length ]
+        pos += ( length + 3 ) & ~3
+    return attrs
+
+
+def setns( fd ):
+    "Move the calling thread into the network namespace open on fd"
+    libc = ctypes.CDLL( None, use_errno=True )
+    if libc.setns( fd, CLONE_NEWNET ) != 0:
+        err = ctypes.get_errno()
+        raise OSError( err, os.strerror( err ) )
+
+
+def nsCall( pid, fn, *args ):
+    """Call fn( *args ) in the network namespace of process pid and
+       return its result; sockets created by fn stay in that namespace
+       pid: process whose network namespace we enter"""
+    ours = os.open( '/proc/self/ns/net', os.O_RDONLY )
+    try:
+        theirs = os.open( '/proc/%d/ns/net' % pid, os.O_RDONLY )
+        try:
+            setns( theirs )
+            try:
+                return fn( *args )
+            finally:
+                setns( ours )
+        finally:
+            os.close( theirs )
+    finally:
+        os.close( ours )
+
+
+class RtNetlink( object ):
+    "NETLINK_ROUTE socket in a single network namespace"
+
+    def __init__( self, pid=None ):
+        """pid: process whose network namespace we configure
+                (None: our own namespace)"""
+        self.pid = pid
+        self.seq = 0
+        if pid is None:
+            self.sock = self.socket()
+        else:
+            self.sock = nsCall( pid, self.socket )
+
+    @staticmethod
+    def socket():
+        "Return a new NETLINK_ROUTE socket in our current namespace"
+        sock = socket.socket( socket.AF_NETLINK, socket.SOCK_RAW,
+                              NETLINK_ROUTE )
+        sock.bind( ( 0, 0 ) )
+        return sock
+
+    def close( self ):
+        "Close our socket"
+        self.sock.close()
+
+    def request( self, msgtype, body, flags=NLM_F_ACK ):
+        """Send a request and return its replies
+           msgtype: RTM_* message type
+           body: message body (bytes)
+           flags: NLM_F_* flags (NLM_F_ACK)
+           returns: list of reply payloads
+           raises OSError if the kernel returns an error"""
+        self.seq += 1
+        self.sock.send( NLMSG_HDR.pack( NLMSG_HDR.size + len( body ), msgtype,
+                                        flags | NLM_F_REQUEST, self.seq, 0 )
+                        + body )
+        replies = []
+        while True:
+            data = self.sock.recv( 65536 )
+            pos = 0
+            while pos + NLMSG_HDR.size <= len( data ):
+                length, mtype, mflags, seq, _pid = NLMSG_HDR.unpack_from(
+                    data, pos )
+                payload = data[ pos + NLMSG_HDR.size: pos + length ]
+                pos += ( length + 3 ) & ~3
+                if seq != self.seq:
+                    continue
+                if mtype == NLMSG_ERROR:
+                    err = -struct.unpack_from( 'i', payload )[ 0 ]
+                    if err:
+                        raise OSError( err, os.strerror( err ) )
+                    return replies
+                if mtype == NLMSG_DONE:
+                    return replies
+                replies.append( payload )
+                if not mflags & NLM_F_MULTI and not flags & NLM_F_ACK:
+                    return replies
+
+    # Links
+
+    @staticmethod
+    def ifinfo( index=0, flags=0, change=0 ):
+        "Return struct ifinfomsg"
+        return IFINFOMSG.pack( socket.AF_UNSPEC, 0, index, flags, change )
+
+    def getLink( self, name ):
+        """Look up link by name
+           returns: LinkInfo( index, name, flags, mac )"""
+        body = self.ifinfo() + strAttr( IFLA_IFNAME, name )
+        payload = self.request( RTM_GETLINK, body, flags=0 )[ 0 ]
+        _family, _type, index, flags, _change = IFINFOMSG.unpack_from(
+            payload )
+        attrs = parseAttrs( payload, IFINFOMSG.size )
+        mac = ':'.join( '%02x' % b for b in
+                        bytearray( attrs.get( IFLA_ADDRESS, b'' ) ) )
+        ifname = attrs[ IFLA_IFNAME ].rstrip( b'\0' ).decode( 'ascii' )
+        return LinkInfo( index, ifname, flags, mac or None )
+
+    def setLink( self, name, up=None, mac=None, newName=None, netns=None ):
+        """Change link settings
+           name: link name
+           up: set link up (True) or down (False)
+           mac: new MAC address
+           newName: new link name
+           netns: move link to namespace of this pid"""
+        flags, change = 0, 0
+        if up is not None:
+            flags, change = ( IFF_UP if up else 0 ), IFF_UP
+        body = self.ifinfo( self.getLink( name ).index, flags, change )
+        if mac:
+            body += macAttr( IFLA_ADDRESS, mac )
+        if newName:
+            body += strAttr( IFLA_IFNAME, newName )
+        if netns is not None:
+            body += attr( IFLA_NET_NS_PID, struct.pack( 'I', netns ) )
+        self.request( RTM_SETLINK, body )
+
+    def addVeth( self, name1, name2, mac1=None, mac2=None, netns=None ):
+        """Create veth pair name1 <-> name2
+           mac1, mac2: MAC addresses (optional)
+           netns: create name2 in namespace of this pid (optional)"""
+        peer = self.ifinfo() + strAttr( IFLA_IFNAME, name2 )
+        if mac2:
+            peer += macAttr( IFLA_ADDRESS, mac2 )
+        if netns is not None:
+            peer += attr( IFLA_NET_NS_PID, struct.pack( 'I', netns ) )
+        linkinfo = ( strAttr( IFLA_INFO_KIND, 'veth' ) +
+                     attr( IFLA_INFO_DATA, attr( VETH_INFO_PEER, peer ) ) )
+        body = self.ifinfo() + strAttr( IFLA_IFNAME, name1 )
+        if mac1:
+            body += macAttr( IFLA_ADDRESS, mac1 )
+        body += attr( IFLA_LINKINFO, linkinfo )
+        self.request( RTM_NEWLINK, body,
+                      flags=NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL )
+
+    def delLink( self, name, missingOk=False ):
+        """Delete link
+           missingOk: ignore nonexistent link?"""
+        body = self.ifinfo() + strAttr( IFLA_IFNAME, name )
+        try:
+            self.request( RTM_DELLINK, body )
+        except OSError as e:
+            if not missingOk or e.errno != errno.ENODEV:
+                raise
+
+    # IPv4 addresses
+
+    def getAddrs( self, name ):
+        "Return list of IPv4 ( address, prefixLen ) for link"
+        index = self.getLink( name ).index
+        body = IFADDRMSG.pack( socket.AF_INET, 0, 0, 0, 0 )
+        addrs = []
+        for payload in self.request( RTM_GETADDR, body, flags=NLM_F_DUMP ):
+            _family, prefixLen, _flags, _scope, ifindex = (
+                IFADDRMSG.unpack_from( payload ) )
+            if ifindex != index:
+                continue
+            attrs = parseAttrs( payload, IFADDRMSG.size )
+            addr = attrs.get( IFA_LOCAL, attrs.get( IFA_ADDRESS ) )
+            if addr:
+                addrs.append( ( socket.inet_ntoa( addr ), prefixLen ) )
+        return addrs
+
+    def setAddr( self, name, ip, prefixLen ):
+        """Replace link's IPv4 addresses with ip/prefixLen and bring
+           it up, as ifconfig does"""
+        index = self.getLink( name ).index
+        for oldIP, oldPrefixLen in self.getAddrs( name ):
+            self.request( RTM_DELADDR,
+                          IFADDRMSG.pack( socket.AF_INET, oldPrefixLen,
+                                          0, 0, index ) +
+                          attr( IFA_LOCAL, socket.inet_aton( oldIP ) ) )
+        prefixLen = int( prefixLen )
+        addr = socket.inet_aton( ip )
+        body = ( IFADDRMSG.pack( socket.AF_INET, prefixLen, 0, 0, index ) +
+                 attr( IFA_LOCAL, addr ) + attr( IFA_ADDRESS, addr ) )
+        if prefixLen < 31:
+            hostmask = ( 1 << ( 32 - prefixLen ) ) - 1
+            bcast = struct.unpack( '!I', addr )[ 0 ] | hostmask
+            body += attr( IFA_BROADCAST, struct.pack( '!I', bcast ) )
+        self.request( RTM_NEWADDR, body,
+                      flags=NLM_F_ACK | NLM_F_CREATE | NLM_F_EXCL )
+        self.setLink( name, up=True )
+
+
+# Sockets for the root namespace and for nodes (stored in node.rtnetlink)
+
+# RtNetlink for our own namespace (False if it couldn't be opened)
+rootNetlink = None
+
+
+def openNetlink( pid=None, name='root namespace' ):
+    """Return RtNetlink for pid's namespace, or False (with a warning)
+       if we can't open it
+       pid: process in namespace (None: our own namespace)
+       name: namespace name for warning"""
+    try:
+        return RtNetlink( pid )
+    except EnvironmentError as e:
+        warn( '*** rtnetlink unavailable for %s (%s): using ip/ifconfig\n'
+              % ( name, e ) )
+        return False
+
+
+def netlinkFor( node=None ):
+    """Return RtNetlink for node's network namespace (or our own if
+       node is None or not in a namespace), or None if rtnetlink is
+       not available there. If a namespace can't be opened, e.g.
+       because the node's shell has exited, we don't try it again."""
+    global rootNetlink  # pylint: disable=global-statement
+    if getattr( node, 'isRemote', False ):
+        # node.pid is on another machine, so we can't enter its namespace
+        return None
+    if node is None or not node.inNamespace:
+        if rootNetlink is None:
+            rootNetlink = openNetlink()
+        return rootNetlink or None
+    if node.rtnetlink is None or (
+            node.rtnetlink and node.rtnetlink.pid != node.pid ):
+        # Make sure node's shell has entered its namespace
+        node.waitStarted()
+        node.rtnetlink = openNetlink( node.pid, node.name )
+    return node.rtnetlink or None
+
+
+def netlinkError( e ):
+    "Return error message for netlink error e, in the style of ip"
+    debug( 'rtnetlink error: %s\n' % e )
+    return 'RTNETLINK answers: %s\n' % e.strerror
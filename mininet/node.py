@@ -57,18 +57,21 @@
 import re
 import signal
 import select
+import termios
 from re import findall
 from subprocess import Popen, PIPE
 from sys import exit  # pylint: disable=redefined-builtin
-from time import sleep
+from time import sleep, time
 
 from mininet.log import info, error, warn, debug
 from mininet.util import ( quietRun, errRun, errFail, moveIntf, isShellBuiltin,
                            numCores, retry, mountCgroups, BaseString, decode,
                            encode, getincrementaldecoder, Python3, which,
-                           StrictVersion )
+                           StrictVersion, connectErrno, runCounts )
 from mininet.moduledeps import moduleDeps, pathCheck, TUN
 from mininet.link import Link, Intf, TCIntf, OVSIntf
+from mininet.ovsdb import ovsdbClient
+from mininet.journal import journal
 
 
 # pylint: disable=too-many-arguments
@@ -108,12 +111,23 @@ def __init__( self, name, inNamespace=True, **params ):
 
         self.nameToIntf = {}  # dict of interface names to Intfs
 
+        self.rtnetlink = None  # RtNetlink for our namespace, if used
+
         # Make pylint happy
         ( self.shell, self.execed, self.pid, self.stdin, self.stdout,
             self.lastPid, self.lastCmd, self.pollOut ) = (
                 None, None, None, None, None, None, None, None )
         self.waiting = False
+        self.starting = False  # shell started but not yet ready
+        self.shellStart = None  # time() when our shell was started
+        self.shellTime = None  # seconds for our shell to become ready
         self.readbuf = ''
+        self.framebuf = ''  # partial status frame held back by monitor()
+        self.lastStatus = None  # exit status of last command
+        self.deferred = None  # commands queued by deferCmds()
+        # Commands sent by sendCmds(), and their results so far
+        self.batchCmds, self.batchLines, self.batchResults = [], [], []
+        self.batchOutput, self.batchSent = [], 0
 
         # Incremental decoder for buffered reading
         self.decoder = getincrementaldecoder()
@@ -139,7 +153,9 @@ def fdToNode( cls, fd ):
 
     # Command support via shell process in namespace
     def startShell( self, mnopts=None ):
-        "Start a shell process for running commands"
+        """Start a shell process for running commands. We don't wait
+           for the shell to start up: the first command (or a call to
+           waitStarted()) does, so that many shells can start at once."""
         if self.shell:
             error( "%s: shell is already running\n" % self.name )
             return
@@ -150,8 +166,8 @@ def startShell( self, mnopts=None ):
             opts += 'n'
         # bash -i: force interactive
         # -s: pass $* to shell, and make process easy to find in ps
-        # prompt is set to sentinel chr( 127 )
-        cmd = [ 'mnexec', opts, 'env', 'PS1=' + chr( 127 ),
+        # prompt is empty until our setup command below sets it
+        cmd = [ 'mnexec', opts, 'env', 'PS1=',
                 'bash', '--norc', '--noediting',
                 '-is', 'mininet:' + self.name ]
 
@@ -159,6 +175,11 @@ def startShell( self, mnopts=None ):
         # in the subprocess and insulate it from signals (e.g. SIGINT)
         # received by the parent
         self.master, self.slave = pty.openpty()
+        # Turn off echo before the shell starts, so that we can send
+        # our setup command without waiting for a first prompt
+        attrs = termios.tcgetattr( self.slave )
+        attrs[ 3 ] &= ~termios.ECHO
+        termios.tcsetattr( self.slave, termios.TCSANOW, attrs )
         self.shell = self._popen( cmd, stdin=self.slave, stdout=self.slave,
                                   stderr=self.slave, close_fds=False )
         # XXX BL: This doesn't seem right, and we should also probably
@@ -166,8 +187,12 @@ def startShell( self, mnopts=None ):
         self.stdin = os.fdopen( self.master, 'r' )
         self.stdout = self.stdin
         self.pid = self.shell.pid
+        self.shellStart, self.shellTime = time(), None
+        # Record our shell so that mn -c can find it if we crash
+        if not getattr( self, 'isRemote', False ):
+            journal.add( 'node', self.name, self.pid )
         self.pollOut = select.poll()
-        self.pollOut.register( self.stdout )
+        self.pollOut.register( self.stdout, select.POLLIN )
         # Maintain mapping between file descriptors and nodes
         # This is useful for monitoring multiple nodes
         # using select.poll()
@@ -176,16 +201,33 @@ def startShell( self, mnopts=None ):
         self.execed = False
         self.lastCmd = None
         self.lastPid = None
+        self.lastStatus = None
         self.readbuf = ''
-        # Wait for prompt
-        while True:
-            data = self.read( 1024 )
-            if data[ -1 ] == chr( 127 ):
-                break
-            self.pollOut.poll()
+        self.framebuf = ''
         self.waiting = False
         # +m: disable job control notification
-        self.cmd( 'unset HISTFILE; stty -echo; set +m' )
+        # PS1: frame each prompt as ^B<exit status>^C<sentinel>, so that
+        # monitor() can pick up $? along with the end of the output
+        self.sendCmd( 'unset HISTFILE; stty -echo; set +m; PS1=' +
+                      self.framedPrompt )
+        self.starting = True
+
+    def waitStarted( self, timeoutms=None ):
+        """Wait for our shell to finish starting up.
+           timeoutms: timeout in ms or None to wait indefinitely
+           returns: True if our shell is ready"""
+        while self.starting:
+            self.monitor( timeoutms )
+            self.starting = self.waiting
+            if not self.starting:
+                self.shellTime = time() - self.shellStart
+                if self.inNamespace and not getattr(
+                        self, 'isRemote', False ):
+                    # Now that mnexec has unshared, record our namespace
+                    journal.add( 'node', self.name, self.pid, netns=True )
+            if timeoutms is not None:
+                break
+        return not self.starting
 
     def mountPrivateDirs( self ):
         "mount private directories"
@@ -220,6 +262,7 @@ def _popen( self, cmd, **params ):
         # Leave this is as an instance method for now
         assert self
         popen = Popen( cmd, **params )  # pylint: disable=consider-using-with
+        runCounts[ 'popens' ] += 1
         debug( '_popen', cmd, popen.pid )
         return popen
 
@@ -238,14 +281,32 @@ def cleanup( self ):
                 debug( 'waiting for', self.pid, 'to terminate\n' )
                 self.shell.wait()
         self.shell = None
+        if self.rtnetlink:
+            self.rtnetlink.close()
+            self.rtnetlink = None
 
     # Subshell I/O, commands and control
 
+    # Framed shell protocol: once the shell is started, every prompt
+    # is printed as chr(2) + exit status + chr(3) + chr(127). The
+    # prompt is set using bash $'' quoting, so that no control
+    # characters are ever written to the pty (^C would be an interrupt)
+    framedPrompt = r"$'\002$?\003\177'"
+    _frameRegex = re.compile( '\x02(\\d+)\x03\x7f' )
+    _partialFrameRegex = re.compile( '\x02\\d*\x03?$' )
+    _pidJobRegex = re.compile( r'\[\d+\] \d+\r\n' )
+    _pidMarkerRegex = re.compile( '\x01(\\d+)\r\n' )
+
+    # Maximum number of bytes read from the shell per monitor() call.
+    # Large reads keep cmd() linear in the size of its output.
+    readmax = 65536
+
     def read( self, size=1024 ):
         """Buffered read from node, potentially blocking.
            size: maximum number of characters to return"""
         count = len( self.readbuf )
-        if count < size:
+        # Don't block if we already have something to return
+        if count < size and ( not count or self.pollOut.poll( 0 ) ):
             data = os.read( self.stdout.fileno(), size - count )
             self.readbuf += self.decoder.decode( data )
         if size >= len( self.readbuf ):
@@ -275,10 +336,16 @@ def write( self, data ):
     def terminate( self ):
         "Send kill signal to Node and clean up after it."
         self.unmountPrivateDirs()
+        self.killShell()
+        self.cleanup()
+
+    def killShell( self ):
+        """Send kill signal to our shell and its jobs, without waiting
+           for it to exit (cleanup() does that)"""
         if self.shell:
             if self.shell.poll() is None:
                 os.killpg( self.shell.pid, signal.SIGHUP )
-        self.cleanup()
+            journal.remove( 'node', self.name )
 
     def stop( self, deleteIntfs=False ):
         """Stop node.
@@ -293,13 +360,39 @@ def waitReadable( self, timeoutms=None ):
            returns: result of poll()"""
         if len( self.readbuf ) == 0:
             return self.pollOut.poll( timeoutms )
-        return None
+        # Buffered output is ready now
+        return [ ( self.stdout.fileno(), select.POLLIN ) ]
+
+    @staticmethod
+    def _cmdString( cmd ):
+        """Internal method: return cmd as a command string
+           cmd: string or list of command and arguments"""
+        # Convert to string
+        if not isinstance( cmd, str ):
+            cmd = ' '.join( [ str( c ) for c in cmd ] )
+        if not re.search( r'\w', cmd ):
+            # Replace empty commands with something harmless
+            cmd = 'echo -n'
+        return cmd
+
+    @staticmethod
+    def _cmdLine( cmd, printPid=False ):
+        """Internal method: return shell input line for command string
+           printPid: print command's PID? (False)"""
+        # if a builtin command is backgrounded, it still yields a PID
+        if len( cmd ) > 0 and cmd[ -1 ] == '&':
+            # print ^A{pid}\n so monitor() can set lastPid
+            cmd += ' printf "\\001%d\\012" $! '
+        elif printPid and not isShellBuiltin( cmd ):
+            cmd = 'mnexec -p ' + cmd
+        return cmd + '\n'
 
     def sendCmd( self, *args, **kwargs ):
         """Send a command, followed by a command to echo a sentinel,
            and return without waiting for the command to complete.
            args: command and arguments, or string
            printPid: print command's PID? (False)"""
+        self.waitStarted()
         assert self.shell and not self.waiting
         printPid = kwargs.get( 'printPid', False )
         # Allow sendCmd( [ list ] )
@@ -308,20 +401,12 @@ def sendCmd( self, *args, **kwargs ):
         # Allow sendCmd( cmd, arg1, arg2... )
         elif len( args ) > 0:
             cmd = args
-        # Convert to string
-        if not isinstance( cmd, str ):
-            cmd = ' '.join( [ str( c ) for c in cmd ] )
-        if not re.search( r'\w', cmd ):
-            # Replace empty commands with something harmless
-            cmd = 'echo -n'
+        else:
+            raise TypeError( 'sendCmd: no command given' )
+        cmd = self._cmdString( cmd )
         self.lastCmd = cmd
-        # if a builtin command is backgrounded, it still yields a PID
-        if len( cmd ) > 0 and cmd[ -1 ] == '&':
-            # print ^A{pid}\n so monitor() can set lastPid
-            cmd += ' printf "\\001%d\\012" $! '
-        elif printPid and not isShellBuiltin( cmd ):
-            cmd = 'mnexec -p ' + cmd
-        self.write( cmd + '\n' )
+        runCounts[ 'cmds' ] += 1
+        self.write( self._cmdLine( cmd, printPid ) )
         self.lastPid = None
         self.waiting = True
 
@@ -338,28 +423,40 @@ def monitor( self, timeoutms=None, findPid=True ):
         ready = self.waitReadable( timeoutms )
         if not ready:
             return ''
-        data = self.read( 1024 )
-        pidre = r'\[\d+\] \d+\r\n'
+        # Only newly read data is scanned for markers; a status
+        # frame split across reads is held back in self.framebuf
+        data = self.framebuf + self.read( self.readmax )
+        self.framebuf = ''
+        # Suppress the job and PID of a backgrounded command, which
+        # may arrive in an earlier chunk than the PID marker
+        if ( findPid and '[' in data and self.lastCmd and
+             self.lastCmd[ -1 ] == '&' ):
+            data = self._pidJobRegex.sub( '', data )
         # Look for PID
-        marker = chr( 1 ) + r'\d+\r\n'
         if findPid and chr( 1 ) in data:
-            # suppress the job and PID of a backgrounded command
-            if re.findall( pidre, data ):
-                data = re.sub( pidre, '', data )
             # Marker can be read in chunks; continue until all of it is read
-            while not re.findall( marker, data ):
-                data += self.read( 1024 )
-            markers = re.findall( marker, data )
+            start = data.find( chr( 1 ) )
+            while not self._pidMarkerRegex.search( data, start ):
+                data += self.read( self.readmax )
+            markers = self._pidMarkerRegex.findall( data, start )
             if markers:
-                self.lastPid = int( markers[ 0 ][ 1: ] )
-                data = re.sub( marker, '', data )
+                self.lastPid = int( markers[ 0 ] )
+                data = self._pidMarkerRegex.sub( '', data )
         # Look for sentinel/EOF
-        if len( data ) > 0 and data[ -1 ] == chr( 127 ):
-            self.waiting = False
-            data = data[ :-1 ]
-        elif chr( 127 ) in data:
+        if chr( 127 ) in data:
             self.waiting = False
-            data = data.replace( chr( 127 ), '' )
+            statuses = self._frameRegex.findall( data )
+            if statuses:
+                self.lastStatus = int( statuses[ -1 ] )
+                data = self._frameRegex.sub( '', data )
+            if chr( 127 ) in data:
+                # Unframed sentinel (e.g. initial prompt)
+                data = data.replace( chr( 127 ), '' )
+        # Hold back a partial status frame until the rest arrives
+        pos = data.rfind( chr( 2 ), -8 )
+        if pos >= 0 and self._partialFrameRegex.match( data, pos ):
+            self.framebuf = data[ pos: ]
+            data = data[ :pos ]
         return data
 
     def waitOutput( self, verbose=False, findPid=True ):
@@ -369,12 +466,13 @@ def waitOutput( self, verbose=False, findPid=True ):
            the output, including trailing newline.
            verbose: print output interactively"""
         log = info if verbose else debug
-        output = ''
+        # Accumulate chunks and join once, rather than growing a string
+        output = []
         while self.waiting:
             data = self.monitor( findPid=findPid )
-            output += data
+            output.append( data )
             log( data )
-        return output
+        return ''.join( output )
 
     def cmd( self, *args, **kwargs ):
         """Send a command, wait for output, and return it.
@@ -382,6 +480,12 @@ def cmd( self, *args, **kwargs ):
         verbose = kwargs.get( 'verbose', False )
         log = info if verbose else debug
         log( '*** %s : %s\n' % ( self.name, args ) )
+        if self.deferred is not None:
+            # Queue command for runDeferred()
+            if len( args ) == 1 and isinstance( args[ 0 ], list ):
+                args = args[ 0 ]
+            self.deferred.append( self._cmdString( args ) )
+            return ''
         if self.shell:
             self.sendCmd( *args, **kwargs )
             return self.waitOutput( verbose )
@@ -394,10 +498,190 @@ def cmdPrint( self, *args):
            cmd: string"""
         return self.cmd( *args, **{ 'verbose': True } )
 
+    # Pipelined commands: sendCmds() writes many commands at once and
+    # monitorCmds() splits the output stream at each framed prompt. We
+    # stop writing when batchWindow bytes of input are outstanding, so
+    # that the tty input queue (4 KB) never fills up and blocks us.
+    batchWindow = 2048
+
+    def sendCmds( self, cmds ):
+        """Send several commands and return without waiting for them
+           to complete; use monitorCmds() to collect their output.
+           Each command must fit on one line and must not read stdin.
+           cmds: list of commands (strings or lists of arguments)"""
+        self.waitStarted()
+        assert self.shell and not self.waiting
+        self.batchCmds = [ self._cmdString( cmd ) for cmd in cmds ]
+        self.batchLines = [ self._cmdLine( cmd ) for cmd in self.batchCmds ]
+        runCounts[ 'cmds' ] += len( self.batchCmds )
+        self.batchResults, self.batchOutput, self.batchSent = [], [], 0
+        self.lastPid = None
+        self.waiting = bool( self.batchCmds )
+        self._sendBatch()
+
+    def _sendBatch( self ):
+        "Internal method: write batched commands, up to batchWindow bytes"
+        lines, sent = self.batchLines, self.batchSent
+        outstanding = sum( len( line ) for line in
+                           lines[ len( self.batchResults ): sent ] )
+        while sent < len( lines ) and (
+                not outstanding or
+                outstanding + len( lines[ sent ] ) <= self.batchWindow ):
+            self.write( lines[ sent ] )
+            outstanding += len( lines[ sent ] )
+            sent += 1
+        self.batchSent = sent
+
+    def monitorCmds( self, timeoutms=None ):
+        """Collect output of commands sent using sendCmds().
+           Set self.waiting to False when all commands have completed.
+           timeoutms: timeout in ms or None to wait indefinitely
+           returns: list of newly completed ( output, exit status )"""
+        if not self.readbuf and not self.pollOut.poll( timeoutms ):
+            return []
+        data = self.framebuf + self.read( self.readmax )
+        results, start = [], 0
+        # Split output at each framed prompt
+        for match in self._frameRegex.finditer( data ):
+            self.batchOutput.append( data[ start: match.start() ] )
+            results.append( ( ''.join( self.batchOutput ),
+                              int( match.group( 1 ) ) ) )
+            self.batchOutput, start = [], match.end()
+        data = data[ start: ]
+        # Keep a possibly partial frame for the next read
+        pos = data.rfind( chr( 2 ), -8 )
+        if pos < 0 or not self._partialFrameRegex.match( data, pos ):
+            pos = len( data )
+        self.batchOutput.append( data[ :pos ] )
+        self.framebuf = data[ pos: ]
+        # Strip job and PID markers of backgrounded commands
+        for i, ( out, status ) in enumerate( results ):
+            if self.batchCmds[ len( self.batchResults ) + i ][ -1 ] == '&':
+                out = self._pidJobRegex.sub( '', out )
+                pids = self._pidMarkerRegex.findall( out )
+                if pids:
+                    self.lastPid = int( pids[ -1 ] )
+                results[ i ] = ( self._pidMarkerRegex.sub( '', out ), status )
+        self.batchResults += results
+        if len( self.batchResults ) < len( self.batchCmds ):
+            self._sendBatch()
+        elif self.waiting:
+            self.waiting = False
+            self.lastCmd = self.batchCmds[ -1 ]
+            self.lastStatus = self.batchResults[ -1 ][ 1 ]
+        return results
+
+    def stopCmds( self, timeoutms=200 ):
+        """Interrupt commands sent using sendCmd() or sendCmds(),
+           discard any pending output and wait for our shell
+           timeoutms: time to wait before interrupting again"""
+        if not self.waiting or self.starting:
+            return
+        self.batchCmds = self.batchCmds[ :self.batchSent ]
+        # ^C also flushes the tty input queue, so we don't know how
+        # many queued commands the shell has read. Instead, we send a
+        # numbered marker and skip everything up to its prompt. A shell
+        # loop may survive a ^C that arrives between its commands, so
+        # we keep interrupting until the marker shows up.
+        data, attempt, match = self.framebuf, 0, None
+        while not match:
+            attempt += 1
+            self.sendInt()
+            self.write( "printf '\\005resync%d\\005'\n" % attempt )
+            marker = '\x05resync%d\x05' % attempt
+            deadline = time() + timeoutms / 1000.0
+            while not match and time() < deadline:
+                wait = max( 0, int( 1000 * ( deadline - time() ) ) )
+                if self.waitReadable( wait ) == []:
+                    break
+                data = data[ -64: ] + self.read( self.readmax )
+                pos = data.find( marker )
+                match = pos >= 0 and self._frameRegex.search( data, pos )
+        self.framebuf, self.readbuf = '', data[ match.end(): ]
+        self.batchOutput = []
+        self.lastStatus = None
+        self.waiting = False
+
+    def cmdBatch( self, cmds, verbose=False ):
+        """Run several commands with a single round trip to our shell.
+           Each command must fit on one line and must not read stdin.
+           cmds: list of commands (strings or lists of arguments)
+           verbose: print output interactively
+           returns: list of ( output, exit status ) for each command"""
+        log = info if verbose else debug
+        self.sendCmds( cmds )
+        log( '*** %s : %s\n' % ( self.name, self.batchCmds ) )
+        while self.waiting:
+            for out, _status in self.monitorCmds():
+                log( out )
+        return self.batchResults
+
+    def cmds( self, cmds, verbose=False ):
+        """Run several commands with a single round trip to our shell
+           cmds: list of commands (strings or lists of arguments)
+           verbose: print output interactively
+           returns: combined output of all commands"""
+        if self.deferred is not None:
+            self.deferred.extend( self._cmdString( cmd ) for cmd in cmds )
+            return ''
+        return ''.join( out for out, _status in
+                        self.cmdBatch( cmds, verbose=verbose ) )
+
+    # Deferred commands: while deferring, cmd() queues commands and
+    # returns '' instead of running them, so that a sequence of
+    # configuration calls can be sent with one cmdBatch(). This is
+    # only safe for commands whose output is not needed.
+
+    def deferCmds( self ):
+        """Start queueing cmd() calls for runDeferred()
+           returns: True, or False if we were already deferring"""
+        if self.deferred is not None:
+            return False
+        self.deferred = []
+        return True
+
+    def runDeferred( self ):
+        """Stop deferring and run queued commands using cmdBatch()
+           returns: list of ( output, exit status ) for each command"""
+        cmds, self.deferred = self.deferred, None
+        if not cmds or not self.shell:
+            return []
+        results = self.cmdBatch( cmds )
+        for cmd, ( out, status ) in zip( cmds, results ):
+            if status:
+                error( '*** %s: %s failed (%d): %s\n' %
+                       ( self.name, cmd, status, out.strip() ) )
+        return results
+
+    # asyncio interface (Python 3 only): see mininet.aio
+
+    def acmd( self, *args, **kwargs ):
+        """Coroutine: run a command without blocking the event loop
+           args: command and arguments, or string
+           returns: awaitable output"""
+        from mininet.aio import acmd
+        return acmd( self, *args, **kwargs )
+
+    def acmds( self, cmds ):
+        """Coroutine: run several commands (see cmdBatch())
+           cmds: list of commands (strings or lists of arguments)
+           returns: awaitable list of ( output, exit status )"""
+        from mininet.aio import acmds
+        return acmds( self, cmds )
+
+    def astream( self, *args, **kwargs ):
+        """Run a command and return an async iterator over its output
+           lines, for use with async for
+           args: command and arguments, or string"""
+        from mininet.aio import astream
+        return astream( self, *args, **kwargs )
+
     def popen( self, *args, **kwargs ):
         """Return a Popen() object in our namespace
            args: Popen() args, single list, or string
            kwargs: Popen() keyword args"""
+        # Make sure our shell has entered its namespace
+        self.waitStarted()
         defaults = { 'stdout': PIPE, 'stderr': PIPE,
                      'mncmd':
                      [ 'mnexec', '-da', str( self.pid ) ] }
@@ -619,11 +903,15 @@ def config( self, mac=None, ip=None,
         # the superclass config method here as follows:
         # r = Parent.config( **_params )
         r = {}
+        # Send all of our configuration commands in one batch
+        deferred = self.deferCmds()
         self.setParam( r, 'setMAC', mac=mac )
         self.setParam( r, 'setIP', ip=ip )
         self.setParam( r, 'setDefaultRoute', defaultRoute=defaultRoute )
         # This should be examined
         self.cmd( 'ifconfig lo ' + lo )
+        if deferred:
+            self.runDeferred()
         return r
 
     def configDefault( self, **moreParams ):
@@ -706,6 +994,7 @@ def initCgroups( self ):
         # Create a cgroup and move shell into it
         self.cgroup = 'cpu,cpuacct,cpuset:/' + self.name
         errFail( 'cgcreate -g ' + self.cgroup )
+        journal.add( 'cgroup', self.cgroup )
         # We don't add ourselves to a cpuset because you must
         # specify the cpu and memory placement first
         errFail( 'cgclassify -g cpu,cpuacct:/%s %s' % ( self.name, self.pid ) )
@@ -734,6 +1023,7 @@ def cgroupDel( self ):
         "Clean up our cgroup"
         # info( '*** deleting cgroup', self.cgroup, '\n' )
         _out, _err, exitcode = errRun( 'cgdelete -r ' + self.cgroup )
+        journal.remove( 'cgroup', self.cgroup )
         # Sometimes cgdelete returns a resource busy error but still
         # deletes the group; next attempt will give "no such file"
         return exitcode == 0 or ( 'no such file' in _err.lower() )
@@ -1039,6 +1329,8 @@ def TCReapply( intf ):
             ifspeed = 10000000000  # 10 Gbps
             minspeed = ifspeed * 0.001
 
+            # Rebuild our configuration, since the switch replaced it
+            intf.tcCmds = None
             res = intf.config( **intf.params )
 
             if res is None:  # link may not have TC parameters
@@ -1092,7 +1384,8 @@ class OVSSwitch( Switch ):
 
     def __init__( self, name, failMode='secure', datapath='kernel',
                   inband=False, protocols=None,
-                  reconnectms=1000, stp=False, batch=False, **params ):
+                  reconnectms=1000, stp=False, batch=False, ovsdb=True,
+                  **params ):
         """name: name for switch
            failMode: controller loss behavior (secure|standalone)
            datapath: userspace or kernel mode (kernel|user)
@@ -1101,7 +1394,9 @@ def __init__( self, name, failMode='secure', datapath='kernel',
                       Unspecified (or old OVS version) uses OVS default
            reconnectms: max reconnect timeout in ms (0/None for default)
            stp: enable STP (False, requires failMode=standalone)
-           batch: enable batch startup (False)"""
+           batch: enable batch startup (False)
+           ovsdb: talk to ovsdb-server directly rather than
+                  running ovs-vsctl, if possible (True)"""
         Switch.__init__( self, name, **params )
         self.failMode = failMode
         self.datapath = datapath
@@ -1112,6 +1407,8 @@ def __init__( self, name, failMode='secure', datapath='kernel',
         self._uuids = []  # controller UUIDs
         self.batch = batch
         self.commands = []  # saved commands for batch startup
+        self.ovsdb = ovsdb
+        self.pendingBridge = None  # saved OVSDB bridge for batch startup
 
     @classmethod
     def setup( cls ):
@@ -1145,6 +1442,13 @@ def dpctl( self, *args ):
         "Run ovs-ofctl command"
         return self.cmd( 'ovs-ofctl', args[ 0 ], self, *args[ 1: ] )
 
+    def db( self ):
+        """Return OVSDB connection if we are using one, or None
+           to use ovs-vsctl"""
+        if not self.ovsdb or self.isOldOVS():
+            return None
+        return ovsdbClient()
+
     def vsctl( self, *args, **kwargs ):
         "Run ovs-vsctl command (or queue for later execution)"
         if self.batch:
@@ -1164,18 +1468,33 @@ def TCReapply( intf ):
 
     def attach( self, intf ):
         "Connect a data port"
-        self.vsctl( 'add-port', self, intf )
+        db = self.db()
+        if db and self.pendingBridge:
+            self.pendingBridge[ 'ports' ].append(
+                ( intf.name, self.intfColumns( intf ) ) )
+        elif db and not self.batch:
+            db.addPort( self.name, intf.name, self.intfColumns( intf ) )
+        else:
+            self.vsctl( 'add-port', self, intf )
         self.cmd( 'ifconfig', intf, 'up' )
         self.TCReapply( intf )
 
     def detach( self, intf ):
         "Disconnect a data port"
-        self.vsctl( 'del-port', self, intf )
+        db = self.db()
+        if db and not self.batch:
+            db.delPort( self.name, intf.name )
+        else:
+            self.vsctl( 'del-port', self, intf )
 
     def controllerUUIDs( self, update=False ):
         """Return ovsdb UUIDs for our controllers
            update: update cached value"""
         if not self._uuids or update:
+            db = self.db()
+            if db:
+                self._uuids = db.bridgeControllers( self.name )
+                return self._uuids
             controllers = self.cmd( 'ovs-vsctl -- get Bridge', self,
                                     'Controller' ).strip()
             if controllers.startswith( '[' ) and controllers.endswith( ']' ):
@@ -1187,6 +1506,11 @@ def controllerUUIDs( self, update=False ):
 
     def connected( self ):
         "Are we connected to at least one of our controllers?"
+        db = self.db()
+        if db:
+            if any( db.connected( self.controllerUUIDs() ) ):
+                return True
+            return self.failMode == 'standalone'
         for uuid in self.controllerUUIDs():
             if 'true' in self.vsctl( '-- get Controller',
                                      uuid, 'is_connected' ):
@@ -1206,6 +1530,15 @@ def intfOpts( self, intf ):
                 opts += ' type=patch options:peer=%s' % peer
         return '' if not opts else ' -- set Interface %s' % intf + opts
 
+    def intfColumns( self, intf ):
+        "Return OVSDB Interface columns for intf (as for intfOpts())"
+        columns = { 'ofport_request': self.ports[ intf ] }
+        if isinstance( intf, OVSIntf ):
+            intf1, intf2 = intf.link.intf1, intf.link.intf2
+            peer = intf1 if intf1 != intf else intf2
+            columns.update( type='patch', options={ 'peer': str( peer ) } )
+        return columns
+
     def bridgeOpts( self ):
         "Return OVS bridge options"
         opts = ( ' other_config:datapath-id=%s' % self.dpid +
@@ -1221,24 +1554,69 @@ def bridgeOpts( self ):
         opts += ' other-config:dp-desc=%s' % self.name
         return opts
 
+    def bridgeColumns( self ):
+        "Return OVSDB Bridge columns (as for bridgeOpts())"
+        otherConfig = { 'datapath-id': self.dpid, 'dp-desc': self.name }
+        if not self.inband:
+            otherConfig[ 'disable-in-band' ] = 'true'
+        columns = { 'other_config': otherConfig,
+                    'fail_mode': self.failMode }
+        if self.datapath == 'user':
+            columns[ 'datapath_type' ] = 'netdev'
+        if self.protocols:
+            columns[ 'protocols' ] = self.protocols.split( ',' )
+        if self.stp and self.failMode == 'standalone':
+            columns[ 'stp_enable' ] = True
+        return columns
+
+    def controllerTargets( self, controllers ):
+        "Return list of ( name, target ) for controllers"
+        clist = [ ( self.name + c.name, '%s:%s:%d' %
+                  ( c.protocol, c.IP(), c.port ) )
+                  for c in controllers ]
+        if self.listenPort:
+            clist.append( ( self.name + '-listen',
+                            'ptcp:%s' % self.listenPort ) )
+        return clist
+
+    def bridgeSpec( self, controllers ):
+        "Return our bridge description for OVSDB.addBridges()"
+        ports = [ ( intf.name, self.intfColumns( intf ) )
+                  for intf in self.intfList()
+                  if self.ports[ intf ] and not intf.IP() ]
+        clist = []
+        for _name, target in self.controllerTargets( controllers ):
+            controller = { 'target': target }
+            if self.reconnectms:
+                controller[ 'max_backoff' ] = self.reconnectms
+            clist.append( controller )
+        return { 'name': self.name, 'columns': self.bridgeColumns(),
+                 'ports': ports, 'controllers': clist }
+
     def start( self, controllers ):
-        "Start up a new OVS OpenFlow switch using ovs-vsctl"
+        "Start up a new OVS OpenFlow switch using ovsdb or ovs-vsctl"
         if self.inNamespace:
             raise Exception(
                 'OVS kernel switch does not work in a namespace' )
         int( self.dpid, 16 )  # DPID must be a hex string
+        journal.add( 'ovs', self.name )
+        db = self.db()
+        if db:
+            # One transaction, which batchStartup() may share
+            if self.batch:
+                self.pendingBridge = self.bridgeSpec( controllers )
+            else:
+                db.addBridges( [ self.bridgeSpec( controllers ) ] )
+                for intf in self.intfList():
+                    self.TCReapply( intf )
+            return
         # Command to add interfaces
         intfs = ''.join( ' -- add-port %s %s' % ( self, intf ) +
                          self.intfOpts( intf )
                          for intf in self.intfList()
                          if self.ports[ intf ] and not intf.IP() )
         # Command to create controller entries
-        clist = [ ( self.name + c.name, '%s:%s:%d' %
-                  ( c.protocol, c.IP(), c.port ) )
-                  for c in controllers ]
-        if self.listenPort:
-            clist.append( ( self.name + '-listen',
-                            'ptcp:%s' % self.listenPort ) )
+        clist = self.controllerTargets( controllers )
         ccmd = '-- --id=@%s create Controller target=\\"%s\\"'
         if self.reconnectms:
             ccmd += ' max_backoff=%d' % self.reconnectms
@@ -1270,6 +1648,14 @@ def batchStartup( cls, switches, run=errRun ):
            switches: switches to start up
            run: function to run commands (errRun)"""
         info( '...' )
+        # Create all bridges saved for OVSDB in one transaction
+        pending = [ switch for switch in switches if switch.pendingBridge ]
+        if pending:
+            pending[ 0 ].db().addBridges(
+                [ switch.pendingBridge for switch in pending ] )
+            for switch in pending:
+                switch.pendingBridge = None
+                switch.batch = False
         cmds = 'ovs-vsctl'
         for switch in switches:
             if switch.isOldOVS():
@@ -1284,7 +1670,7 @@ def batchStartup( cls, switches, run=errRun ):
                 cmds += ' ' + cmd
                 switch.cmds = []
                 switch.batch = False
-        if cmds:
+        if cmds != 'ovs-vsctl':
             run( cmds, shell=True )
         # Reapply link config if necessary...
         for switch in switches:
@@ -1293,12 +1679,39 @@ def batchStartup( cls, switches, run=errRun ):
                     intf.config( **intf.params )
         return switches
 
+    @classmethod
+    def batchWaitConnected( cls, switches, callback, timeout=None ):
+        """Wait for switches to connect to a controller, using an
+           OVSDB monitor if we can (otherwise Mininet polls them)
+           switches: switches to wait for
+           callback: function called with each switch as it connects
+           timeout: time to wait in seconds (None: wait forever)"""
+        db = switches[ 0 ].db() if switches else None
+        if not db:
+            return
+        waiting = {}
+        for switch in switches:
+            # Standalone switches count as connected (see connected())
+            if switch.failMode == 'standalone':
+                callback( switch )
+            else:
+                waiting[ switch.name ] = switch
+        if waiting:
+            db.waitConnected( list( waiting ),
+                              lambda name: callback( waiting[ name ] ),
+                              timeout=timeout )
+
     def stop( self, deleteIntfs=True ):
         """Terminate OVS switch.
            deleteIntfs: delete interfaces? (True)"""
-        self.cmd( 'ovs-vsctl del-br', self )
+        db = self.db()
+        if db:
+            db.delBridges( [ self.name ] )
+        else:
+            self.cmd( 'ovs-vsctl del-br', self )
         if self.datapath == 'user':
             self.cmd( 'ip link del', self )
+        journal.remove( 'ovs', self.name )
         super( OVSSwitch, self ).stop( deleteIntfs )
 
     @classmethod
@@ -1308,8 +1721,14 @@ def batchShutdown( cls, switches, run=errRun ):
         if switches and not switches[ 0 ].isOldOVS():
             delcmd = '--if-exists ' + delcmd
         # First, delete them all from ovsdb
-        run( 'ovs-vsctl ' +
-             ' -- '.join( delcmd % s for s in switches ) )
+        db = switches[ 0 ].db() if switches else None
+        if db:
+            db.delBridges( [ s.name for s in switches ] )
+        else:
+            run( 'ovs-vsctl ' +
+                 ' -- '.join( delcmd % s for s in switches ) )
+        for switch in switches:
+            journal.remove( 'ovs', switch.name )
         # Next, shut down all of the processes
         pids = ' '.join( str( switch.pid ) for switch in switches )
         run( 'kill -HUP ' + pids )
@@ -1438,15 +1857,7 @@ def __init__( self, name, inNamespace=False, command='controller',
 
     def checkListening( self ):
         "Make sure no controllers are running on our port"
-        # Verify that Telnet is installed first:
-        out, _err, returnCode = errRun( "which telnet" )
-        if 'telnet' not in out or returnCode != 0:
-            raise Exception( "Error running telnet to check for listening "
-                             "controllers; please check that it is "
-                             "installed." )
-        listening = self.cmd( "echo A | telnet -e A %s %d" %
-                              ( self.ip, self.port ) )
-        if 'Connected' in listening:
+        if connectErrno( self.ip, self.port, self ) == 0:
             servers = self.cmd( 'netstat -natp' ).split( '\n' )
             pstr = ':%d ' % self.port
             clist = servers[ 0:1 ] + [ s for s in servers if pstr in s ]
@@ -1587,8 +1998,7 @@ def checkListening( self ):
 
     def isListening( self, ip, port ):
         "Check if a remote controller is listening at a specific ip and port"
-        listening = self.cmd( "echo A | telnet -e A %s %d" % ( ip, port ) )
-        if 'Connected' not in listening:
+        if connectErrno( ip, port, self ) != 0:
             warn( "Unable to contact the remote controller"
                   " at %s:%d\n" % ( ip, port ) )
             return False
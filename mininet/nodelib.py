@@ -7,7 +7,8 @@
 from mininet.node import Node, Switch
 from mininet.log import info, warn
 from mininet.moduledeps import pathCheck
-from mininet.util import quietRun
+from mininet.util import quietRun, batchDelIntfs
+from mininet.journal import journal
 
 
 class LinuxBridge( Switch ):
@@ -38,6 +39,7 @@ def start( self, _controllers ):
         self.cmd( 'ifconfig', self, 'down' )
         self.cmd( 'brctl delbr', self )
         self.cmd( 'brctl addbr', self )
+        journal.add( 'intf', self.name )
         if self.stp:
             self.cmd( 'brctl setbridgeprio', self.prio )
             self.cmd( 'brctl stp', self, 'on' )
@@ -46,13 +48,32 @@ def start( self, _controllers ):
                 self.cmd( 'brctl addif', self, i )
         self.cmd( 'ifconfig', self, 'up' )
 
+    def attach( self, intf ):
+        "Connect a data port"
+        self.cmd( 'brctl addif', self, intf )
+        self.cmd( 'ifconfig', intf, 'up' )
+
+    def detach( self, intf ):
+        "Disconnect a data port"
+        self.cmd( 'brctl delif', self, intf )
+
     def stop( self, deleteIntfs=True ):
         """Stop Linux bridge
            deleteIntfs: delete interfaces? (True)"""
         self.cmd( 'ifconfig', self, 'down' )
         self.cmd( 'brctl delbr', self )
+        journal.remove( 'intf', self.name )
         super( LinuxBridge, self ).stop( deleteIntfs )
 
+    @classmethod
+    def batchShutdown( cls, switches ):
+        """Delete all of our bridges at once
+           switches: switches to shut down"""
+        for switch in switches:
+            journal.remove( 'intf', switch.name )
+        batchDelIntfs( [ switch.name for switch in switches ] )
+        return switches
+
     def dpctl( self, *args ):
         "Run brctl command"
         return self.cmd( 'brctl', *args )
@@ -0,0 +1,444 @@
+"""
+ovsdb.py: minimal OVSDB (RFC 7047) client for Open vSwitch
+
+ovs-vsctl costs a process, a new database connection and a full
+database download per invocation, and its output has to be scraped.
+OVSDB talks JSON-RPC to ovsdb-server over its unix socket instead,
+using a single persistent connection. Bridges, ports and controllers
+are created and deleted in single transactions, however many switches
+are involved, and results come back as JSON.
+
+Like ovs-vsctl (without --no-wait), transactions that change the
+switch configuration wait for ovs-vswitchd to apply them.
+
+ovsdbClient() returns None if ovsdb-server can't be reached, in which
+case callers should fall back to running ovs-vsctl.
+"""
+
+import json
+import os
+import socket
+from select import poll, POLLIN
+from time import time
+
+from mininet.log import debug, warn
+from mininet.util import encode, getincrementaldecoder
+
+
+class OVSDBError( Exception ):
+    "Error returned by ovsdb-server"
+
+
+def sockPath():
+    "Return path of ovsdb-server's unix socket"
+    rundir = os.environ.get( 'OVS_RUNDIR', '/var/run/openvswitch' )
+    return os.path.join( rundir, 'db.sock' )
+
+
+# OVSDB data representation
+
+def uuid( value ):
+    "Return reference to row with UUID value"
+    return [ 'uuid', value ]
+
+
+def namedUUID( name ):
+    "Return reference to row inserted as uuid-name name"
+    return [ 'named-uuid', name ]
+
+
+def datum( value ):
+    """Return OVSDB datum for Python value
+       dict -> map, list/tuple -> set, other values as atoms"""
+    if isinstance( value, dict ):
+        return [ 'map', [ [ k, v ] for k, v in sorted( value.items() ) ] ]
+    if isinstance( value, ( list, tuple ) ):
+        if len( value ) == 2 and value[ 0 ] in ( 'uuid', 'named-uuid' ):
+            return value
+        return [ 'set', list( value ) ]
+    return value
+
+
+def atoms( value ):
+    "Return list of atoms in OVSDB datum"
+    if isinstance( value, list ) and value[ 0 ] == 'set':
+        return value[ 1 ]
+    return [ value ]
+
+
+def condition( column, value ):
+    "Return where clause for column == value"
+    return [ column, '==', datum( value ) ]
+
+
+class OVSDB( object ):
+    "Persistent JSON-RPC connection to ovsdb-server"
+
+    def __init__( self, path=None, database='Open_vSwitch' ):
+        """path: path of ovsdb-server unix socket (sockPath())
+           database: database name (Open_vSwitch)"""
+        self.path = path or sockPath()
+        self.database = database
+        self.sock = None
+        self.poller = None
+        self.buf = ''
+        self.textDecoder = None
+        self.decoder = json.JSONDecoder()
+        self.nextId = 0
+        self.monitors = {}  # monitor id -> update callback
+        self.curCfg = None  # ovs-vswitchd's cur_cfg, once monitored
+        self.connect()
+
+    def connect( self ):
+        "Connect to ovsdb-server"
+        self.sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        try:
+            self.sock.connect( self.path )
+        except socket.error:
+            self.sock.close()
+            raise
+        # We use poll() because select() can't handle fds over 1023
+        self.poller = poll()
+        self.poller.register( self.sock, POLLIN )
+        # Multibyte characters may be split between reads
+        self.textDecoder = getincrementaldecoder()
+
+    def close( self ):
+        "Close our connection"
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    # JSON-RPC
+
+    def send( self, msg ):
+        "Send JSON-RPC message msg"
+        debug( 'ovsdb send: %s\n' % msg )
+        self.sock.sendall( encode( json.dumps( msg ) ) )
+
+    def recv( self, timeout=None ):
+        """Return next JSON-RPC message, or None on timeout
+           timeout: timeout in seconds (None: wait forever)"""
+        while True:
+            self.buf = self.buf.lstrip()
+            if self.buf:
+                try:
+                    msg, end = self.decoder.raw_decode( self.buf )
+                    self.buf = self.buf[ end: ]
+                    debug( 'ovsdb recv: %s\n' % msg )
+                    return msg
+                except ValueError:
+                    pass  # incomplete message
+            if timeout is not None and not self.poller.poll(
+                    int( 1000 * timeout ) ):
+                return None
+            data = self.sock.recv( 65536 )
+            if not data:
+                raise OVSDBError( 'ovsdb-server closed connection' )
+            self.buf += self.textDecoder.decode( data )
+
+    def handle( self, msg ):
+        "Handle request or notification msg from ovsdb-server"
+        method = msg.get( 'method' )
+        if method == 'echo':
+            self.send( { 'result': msg[ 'params' ], 'error': None,
+                         'id': msg[ 'id' ] } )
+        elif method == 'update':
+            monitorId, updates = msg[ 'params' ]
+            if monitorId in self.monitors:
+                self.monitors[ monitorId ]( updates )
+
+    def call( self, method, *params ):
+        """Call JSON-RPC method and return its result, handling any
+           notifications that arrive while we wait
+           raises OVSDBError on error"""
+        self.nextId += 1
+        callId = self.nextId
+        self.send( { 'method': method, 'params': params, 'id': callId } )
+        while True:
+            msg = self.recv()
+            if msg.get( 'id' ) == callId and 'method' not in msg:
+                if msg.get( 'error' ):
+                    raise OVSDBError( msg[ 'error' ] )
+                return msg[ 'result' ]
+            self.handle( msg )
+
+    def poll( self, timeout=None ):
+        """Wait for and handle a notification
+           timeout: timeout in seconds (None: wait forever)
+           returns: True if we handled a message"""
+        msg = self.recv( timeout )
+        if msg is None:
+            return False
+        self.handle( msg )
+        return True
+
+    # Transactions and monitors
+
+    def transact( self, ops, wait=False ):
+        """Run a transaction
+           ops: list of OVSDB operations
+           wait: wait for ovs-vswitchd to apply the changes?
+           returns: list of operation results
+           raises OVSDBError if any operation fails"""
+        ops = list( ops )
+        count = len( ops )
+        if wait:
+            ops += [ { 'op': 'mutate', 'table': 'Open_vSwitch',
+                       'where': [],
+                       'mutations': [ [ 'next_cfg', '+=', 1 ] ] },
+                     { 'op': 'select', 'table': 'Open_vSwitch',
+                       'where': [], 'columns': [ 'next_cfg' ] } ]
+        results = self.call( 'transact', self.database, *ops )
+        errors = [ result for result in results
+                   if result and 'error' in result ]
+        if errors:
+            raise OVSDBError( errors )
+        if wait:
+            self.waitCfg( results[ -1 ][ 'rows' ][ 0 ][ 'next_cfg' ] )
+        return results[ :count ]
+
+    def monitor( self, table, columns, callback, where=None ):
+        """Monitor columns of table, calling callback( uuid, row ) for
+           initial rows and changes; row is None for deleted rows
+           where: not supported (must be None)
+           returns: monitor id"""
+        assert where is None
+        self.nextId += 1
+        monitorId = 'monitor%d' % self.nextId
+
+        def update( updates ):
+            "Dispatch table updates to callback"
+            for rowId, change in updates.get( table, {} ).items():
+                callback( rowId, change.get( 'new' ) )
+        self.monitors[ monitorId ] = update
+        update( self.call( 'monitor', self.database, monitorId,
+                           { table: { 'columns': columns } } ) )
+        return monitorId
+
+    def cancel( self, monitorId ):
+        "Cancel monitor"
+        self.monitors.pop( monitorId, None )
+        self.call( 'monitor_cancel', monitorId )
+
+    def waitCfg( self, nextCfg ):
+        "Wait for ovs-vswitchd to apply configuration nextCfg"
+        if self.curCfg is None:
+            def setCfg( _uuid, row ):
+                "Update cur_cfg"
+                if row and 'cur_cfg' in row:
+                    self.curCfg = row[ 'cur_cfg' ]
+            self.monitor( 'Open_vSwitch', [ 'cur_cfg' ], setCfg )
+        while self.curCfg < nextCfg:
+            self.poll()
+
+    def select( self, table, where, columns=None ):
+        "Return rows of table matching where clause"
+        op = { 'op': 'select', 'table': table, 'where': where }
+        if columns:
+            op[ 'columns' ] = columns
+        return self.transact( [ op ] )[ 0 ][ 'rows' ]
+
+    # Bridges, ports and controllers
+
+    def bridgeUUIDs( self, names ):
+        "Return dict of bridge name -> UUID for existing bridges"
+        ops = [ { 'op': 'select', 'table': 'Bridge',
+                  'where': [ condition( 'name', name ) ],
+                  'columns': [ '_uuid', 'name' ] } for name in names ]
+        if not ops:
+            return {}
+        return { row[ 'name' ]: row[ '_uuid' ][ 1 ]
+                 for result in self.transact( ops )
+                 for row in result[ 'rows' ] }
+
+    @staticmethod
+    def delBridgeOps( uuids ):
+        "Return ops to delete bridges with UUIDs"
+        if not uuids:
+            return []
+        refs = [ uuid( u ) for u in uuids ]
+        return [ { 'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+                   'mutations': [ [ 'bridges', 'delete', datum( refs ) ] ] }
+                 ] + [ { 'op': 'delete', 'table': 'Bridge',
+                         'where': [ condition( '_uuid', ref ) ] }
+                       for ref in refs ]
+
+    @staticmethod
+    def portOps( name, intf, rowName ):
+        """Return ops to insert a port and its interface
+           name: port/interface name
+           intf: dict of Interface columns
+           rowName: uuid-name for the Port row
+           returns: ops"""
+        row = dict( intf, name=name )
+        return [ { 'op': 'insert', 'table': 'Interface',
+                   'row': { k: datum( v ) for k, v in row.items() },
+                   'uuid-name': rowName + 'i' },
+                 { 'op': 'insert', 'table': 'Port',
+                   'row': { 'name': name, 'interfaces':
+                            datum( [ namedUUID( rowName + 'i' ) ] ) },
+                   'uuid-name': rowName } ]
+
+    def addBridges( self, bridges, replace=True ):
+        """Create bridges in a single transaction
+           bridges: list of dicts with
+             name: bridge name
+             columns: dict of additional Bridge columns
+             ports: list of ( port name, dict of Interface columns )
+             controllers: list of dicts of Controller columns
+           replace: delete existing bridges with the same names?"""
+        ops, refs = [], []
+        if replace:
+            ops += self.delBridgeOps( list( self.bridgeUUIDs(
+                [ bridge[ 'name' ] for bridge in bridges ] ).values() ) )
+        for b, bridge in enumerate( bridges ):
+            name = bridge[ 'name' ]
+            # Every bridge has a local internal port with its name
+            ports = [ ( name, { 'type': 'internal' } ) ]
+            ports += list( bridge.get( 'ports', [] ) )
+            portRefs, controllerRefs = [], []
+            for p, ( portName, intf ) in enumerate( ports ):
+                rowName = 'b%dp%d' % ( b, p )
+                ops += self.portOps( portName, intf, rowName )
+                portRefs.append( namedUUID( rowName ) )
+            for c, controller in enumerate( bridge.get( 'controllers', [] ) ):
+                rowName = 'b%dc%d' % ( b, c )
+                ops.append( { 'op': 'insert', 'table': 'Controller',
+                              'row': { k: datum( v )
+                                       for k, v in controller.items() },
+                              'uuid-name': rowName } )
+                controllerRefs.append( namedUUID( rowName ) )
+            row = { k: datum( v )
+                    for k, v in bridge.get( 'columns', {} ).items() }
+            row.update( name=name, ports=datum( portRefs ),
+                        controller=datum( controllerRefs ) )
+            ops.append( { 'op': 'insert', 'table': 'Bridge', 'row': row,
+                          'uuid-name': 'b%d' % b } )
+            refs.append( namedUUID( 'b%d' % b ) )
+        ops.append( { 'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+                      'mutations': [ [ 'bridges', 'insert',
+                                       datum( refs ) ] ] } )
+        self.transact( ops, wait=True )
+
+    def delBridges( self, names ):
+        "Delete bridges (if they exist) in a single transaction"
+        uuids = list( self.bridgeUUIDs( names ).values() )
+        if uuids:
+            self.transact( self.delBridgeOps( uuids ), wait=True )
+
+    def addPort( self, bridge, name, intf=None ):
+        """Add port to bridge
+           bridge: bridge name
+           name: port/interface name
+           intf: dict of Interface columns (optional)"""
+        ops = self.portOps( name, intf or {}, 'port' )
+        ops.append( { 'op': 'mutate', 'table': 'Bridge',
+                      'where': [ condition( 'name', bridge ) ],
+                      'mutations': [ [ 'ports', 'insert',
+                                       datum( [ namedUUID( 'port' ) ] ) ] ] } )
+        self.transact( ops, wait=True )
+
+    def delPort( self, bridge, name ):
+        "Delete port from bridge"
+        rows = self.select( 'Port', [ condition( 'name', name ) ],
+                            [ '_uuid' ] )
+        if not rows:
+            raise OVSDBError( 'no port named %s' % name )
+        ref = rows[ 0 ][ '_uuid' ]
+        self.transact( [ { 'op': 'mutate', 'table': 'Bridge',
+                           'where': [ condition( 'name', bridge ) ],
+                           'mutations': [ [ 'ports', 'delete',
+                                            datum( [ ref ] ) ] ] },
+                         { 'op': 'delete', 'table': 'Port',
+                           'where': [ condition( '_uuid', ref ) ] } ],
+                       wait=True )
+
+    def bridgeControllers( self, bridge ):
+        "Return list of UUIDs of bridge's controllers"
+        rows = self.select( 'Bridge', [ condition( 'name', bridge ) ],
+                            [ 'controller' ] )
+        if not rows:
+            return []
+        return [ ref[ 1 ] for ref in atoms( rows[ 0 ][ 'controller' ] ) ]
+
+    def controllerBridges( self, bridges ):
+        "Return dict of controller UUID -> bridge name for bridges"
+        ops = [ { 'op': 'select', 'table': 'Bridge',
+                  'where': [ condition( 'name', name ) ],
+                  'columns': [ 'name', 'controller' ] } for name in bridges ]
+        if not ops:
+            return {}
+        return { ref[ 1 ]: row[ 'name' ]
+                 for result in self.transact( ops )
+                 for row in result[ 'rows' ]
+                 for ref in atoms( row[ 'controller' ] ) }
+
+    def waitConnected( self, bridges, callback=None, timeout=None ):
+        """Wait for bridges to connect to one of their controllers,
+           monitoring Controller is_connected rather than polling it
+           bridges: bridge names
+           callback: function called with each bridge as it connects
+           timeout: time to wait in seconds (None: wait forever)
+           returns: list of bridges that did not connect"""
+        owners = self.controllerBridges( bridges )
+        remaining = set( bridges )
+
+        def update( rowId, row ):
+            "Note newly connected bridges"
+            bridge = owners.get( rowId )
+            if ( row and row.get( 'is_connected' ) is True and
+                    bridge in remaining ):
+                remaining.remove( bridge )
+                if callback:
+                    callback( bridge )
+        monitorId = self.monitor( 'Controller', [ 'is_connected' ], update )
+        end = None if timeout is None else time() + timeout
+        try:
+            while remaining:
+                wait = None if end is None else end - time()
+                if wait is not None and wait <= 0:
+                    break
+                self.poll( wait )
+        finally:
+            self.cancel( monitorId )
+        return [ bridge for bridge in bridges if bridge in remaining ]
+
+    def connected( self, uuids ):
+        "Return list of is_connected values for controllers with uuids"
+        if not uuids:
+            return []
+        ops = [ { 'op': 'select', 'table': 'Controller',
+                  'where': [ condition( '_uuid', uuid( u ) ) ],
+                  'columns': [ 'is_connected' ] } for u in uuids ]
+        return [ row[ 'is_connected' ] is True
+                 for result in self.transact( ops )
+                 for row in result[ 'rows' ] ]
+
+
+# Shared connection to the local ovsdb-server
+
+client = None
+clientBroken = False
+
+
+def ovsdbClient():
+    """Return shared OVSDB connection, or None if ovsdb-server is
+       not available"""
+    global client, clientBroken  # pylint: disable=global-statement
+    if client is None and not clientBroken:
+        try:
+            client = OVSDB()
+        except ( socket.error, EnvironmentError ) as e:
+            warn( '*** Cannot connect to ovsdb-server at %s (%s): '
+                  'using ovs-vsctl\n' % ( sockPath(), e ) )
+            clientBroken = True
+    return client
+
+
+def closeClient():
+    "Close shared OVSDB connection"
+    global client, clientBroken  # pylint: disable=global-statement
+    if client:
+        client.close()
+    client, clientBroken = None, False
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the asyncio node interface (Python 3 only)."""
+
+import asyncio
+import socket
+import unittest
+from time import time
+
+from mininet.node import Host
+from mininet.aio import waitStarted, waitListening
+from mininet.clean import cleanup
+
+
+class testAsyncCmd( unittest.TestCase ):
+    "Test Node.acmd(), acmds() and astream() on root-namespace hosts"
+
+    def setUp( self ):
+        self.nodes = [ Host( 'h%d' % i, inNamespace=False )
+                       for i in range( 1, 5 ) ]
+
+    def tearDown( self ):
+        for node in self.nodes:
+            node.terminate()
+
+    def testAcmd( self ):
+        "acmd() returns output and sets lastStatus"
+        node = self.nodes[ 0 ]
+        out = asyncio.run( node.acmd( 'echo hello; false' ) )
+        self.assertEqual( out, 'hello\r\n' )
+        self.assertEqual( node.lastStatus, 1 )
+        self.assertEqual( node.cmd( 'echo ok' ), 'ok\r\n' )
+
+    def testConcurrent( self ):
+        "Commands on different nodes run concurrently"
+        async def run():
+            "Sleep on every node at once"
+            return await asyncio.gather( *[ node.acmd( 'sleep 1; echo done' )
+                                            for node in self.nodes ] )
+        start = time()
+        results = asyncio.run( run() )
+        self.assertLess( time() - start, 2 )
+        self.assertEqual( results, [ 'done\r\n' ] * len( self.nodes ) )
+
+    def testAcmds( self ):
+        "acmds() returns per-command output and status"
+        node = self.nodes[ 0 ]
+        results = asyncio.run( node.acmds( [ 'X=3', 'echo $X', 'false' ] ) )
+        self.assertEqual( results, [ ( '', 0 ), ( '3\r\n', 0 ), ( '', 1 ) ] )
+
+    def testAstream( self ):
+        "astream() yields lines; stopping early interrupts the command"
+        node = self.nodes[ 0 ]
+
+        async def run():
+            "Read three lines of an endless stream"
+            lines = []
+            stream = node.astream( 'while true; do echo line; sleep .1; done' )
+            async for line in stream:
+                lines.append( line )
+                if len( lines ) == 3:
+                    break
+            await stream.aclose()
+            return lines
+        self.assertEqual( asyncio.run( run() ), [ 'line\r\n' ] * 3 )
+        self.assertFalse( node.waiting )
+        self.assertEqual( node.cmd( 'echo ok' ), 'ok\r\n' )
+
+    def testCancel( self ):
+        "Cancelling acmd() interrupts the command"
+        node = self.nodes[ 0 ]
+
+        async def run():
+            "Time out a long command"
+            try:
+                await asyncio.wait_for( node.acmd( 'sleep 10' ), .5 )
+            except asyncio.TimeoutError:
+                return True
+            return False
+        self.assertTrue( asyncio.run( run() ) )
+        self.assertEqual( node.cmd( 'echo ok' ), 'ok\r\n' )
+
+
+class RemoteLikeHost( Host ):
+    "Local host that claims to be remote, so we must use its shell"
+    isRemote = True
+
+
+class testAsyncWait( unittest.TestCase ):
+    "Test aio.waitStarted() and aio.waitListening()"
+
+    def setUp( self ):
+        self.nodes = [ Host( 'h1', inNamespace=False ),
+                       RemoteLikeHost( 'h2', inNamespace=False ) ]
+        self.server = socket.socket()
+        self.server.bind( ( '127.0.0.1', 0 ) )
+        self.port = self.server.getsockname()[ 1 ]
+
+    def tearDown( self ):
+        for node in self.nodes:
+            node.terminate()
+        self.server.close()
+
+    def testWaitStarted( self ):
+        "waitStarted() waits for shells to start up"
+        async def run():
+            "Wait for all shells at once"
+            await asyncio.gather( *[ waitStarted( node )
+                                     for node in self.nodes ] )
+        asyncio.run( run() )
+        for node in self.nodes:
+            self.assertFalse( node.starting )
+
+    def testWaitListening( self ):
+        "waitListening() connects locally or through a remote shell"
+        for node in self.nodes:
+            self.assertFalse( asyncio.run( waitListening(
+                node, '127.0.0.1', self.port, timeout=.5 ) ) )
+        self.server.listen( 5 )
+        for node in self.nodes + [ None ]:
+            self.assertTrue( asyncio.run( waitListening(
+                node, '127.0.0.1', self.port, timeout=5 ) ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
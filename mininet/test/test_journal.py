@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the resource journal and journal-based cleanup."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from subprocess import Popen, PIPE, check_output
+
+import mininet.journal
+from mininet.journal import Journal, readJournals, procStart
+from mininet.clean import cleanup, cleanJournal
+
+
+class testJournal( unittest.TestCase ):
+    "Test Journal and cleanJournal()"
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pattern = os.path.join( self.tmpdir, '*.journal' )
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def journal( self, name='1' ):
+        "Return a journal in our temporary directory"
+        return Journal( os.path.join( self.tmpdir, name + '.journal' ) )
+
+    def testRecords( self ):
+        "Journals record live resources and vanish when they are gone"
+        j1, j2 = self.journal( '1' ), self.journal( '2' )
+        j1.add( 'intf', 's1-eth1' )
+        j1.add( 'node', 'h1', os.getpid() )
+        j1.add( 'cgroup', 'cpu,cpuacct,cpuset:/h1' )
+        j1.remove( 'intf', 's1-eth1' )
+        j1.remove( 'intf', 'bogus' )
+        j2.add( 'ovs', 's1' )
+        paths, records = readJournals( self.pattern )
+        self.assertEqual( paths, [ j1.path, j2.path ] )
+        self.assertEqual( sorted( records ), [
+            ( 'cgroup', 'cpu,cpuacct,cpuset:/h1' ), ( 'node', 'h1' ),
+            ( 'ovs', 's1' ) ] )
+        pid, start, inode = records[ 'node', 'h1' ]
+        self.assertEqual( ( pid, start, inode ),
+                          ( os.getpid(), procStart( os.getpid() ), None ) )
+        # A truncated last line is ignored
+        with open( j2.path, 'a' ) as f:
+            f.write( '["-", "ovs"' )
+        self.assertIn( ( 'ovs', 's1' ), readJournals( self.pattern )[ 1 ] )
+        j1.remove( 'node', 'h1' )
+        j1.remove( 'cgroup', 'cpu,cpuacct,cpuset:/h1' )
+        self.assertFalse( os.path.exists( j1.path ) )
+        self.assertEqual( readJournals( self.pattern )[ 0 ], [ j2.path ] )
+
+    def testCleanProcesses( self ):
+        "cleanJournal() kills recorded processes but not reused pids"
+        sleeper = Popen( [ 'sleep', '100' ] )
+        other = Popen( [ 'sleep', '100' ] )
+        try:
+            j = self.journal()
+            j.add( 'process', 'sleeper', sleeper.pid )
+            # Pretend that other's pid was reused
+            j.write( [ '+', 'process', 'other',
+                       [ other.pid, procStart( other.pid ) - 1, None ] ] )
+            cleanJournal( *readJournals( self.pattern ) )
+            self.assertEqual( sleeper.wait(), -15 )
+            self.assertIsNone( other.poll() )
+            self.assertEqual( readJournals( self.pattern )[ 0 ], [] )
+        finally:
+            for popen in sleeper, other:
+                if popen.poll() is None:
+                    popen.kill()
+                    popen.wait()
+
+    def testCrash( self ):
+        "cleanJournal() removes what a crashed Mininet left behind"
+        script = (
+            'import os, mininet.journal\n'
+            'mininet.journal.journalDir = %r\n'
+            'from mininet.net import Mininet\n'
+            'from mininet.topo import SingleSwitchTopo\n'
+            'from mininet.nodelib import LinuxBridge\n'
+            'net = Mininet( SingleSwitchTopo( 2 ), switch=LinuxBridge,'
+            ' controller=None )\n'
+            'net.start()\n'
+            '# Leave a process running in h1\'s namespace\n'
+            'print( net[ "h1" ].popen( [ "sleep", "100" ] ).pid )\n'
+            'os._exit( 0 )\n' % self.tmpdir )
+        env = dict( os.environ,
+                    PYTHONPATH=os.path.dirname( os.path.dirname(
+                        os.path.dirname( os.path.abspath(
+                            mininet.journal.__file__ ) ) ) ) )
+        popen = Popen( [ sys.executable, '-c', script ], stdout=PIPE,
+                       env=env )
+        out, _err = popen.communicate()
+        self.assertEqual( popen.returncode, 0 )
+        pid = int( out )
+        paths, records = readJournals( self.pattern )
+        self.assertEqual( len( paths ), 1 )
+        self.assertEqual( sorted( name for kind, name in records
+                                  if kind != 'node' ),
+                          [ 's1', 's1-eth1', 's1-eth2' ] )
+        self.assertTrue( procStart( pid ) )
+        cleanJournal( paths, records )
+        self.assertIsNone( procStart( pid ) )
+        links = [ line.split()[ 1 ].split( '@' )[ 0 ].rstrip( ':' )
+                  for line in check_output( [ 'ip', '-o', 'link', 'show' ]
+                                            ).decode().splitlines() ]
+        for intf in 's1', 's1-eth1', 's1-eth2':
+            self.assertNotIn( intf, links )
+        self.assertEqual( readJournals( self.pattern )[ 0 ], [] )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test link and interface configuration."""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Host
+from mininet.nodelib import LinuxBridge
+from mininet.link import Link, TCLink, OVSLink
+from mininet.topo import LinearTopo
+from mininet.clean import cleanup
+
+
+class testTCIntf( unittest.TestCase ):
+    "Test TCIntf reconfiguration"
+
+    def setUp( self ):
+        self.h1, self.h2 = Host( 'h1' ), Host( 'h2' )
+        self.link = TCLink( self.h1, self.h2, bw=10 )
+        self.intf = self.link.intf1
+        # Record the tc batches that config() runs
+        self.batches = []
+        tcBatch = self.intf.tcBatch
+
+        def recordBatch( cmds, *args, **kwargs ):
+            "Record and run tc batch"
+            self.batches.append( cmds )
+            return tcBatch( cmds, *args, **kwargs )
+        self.intf.tcBatch = recordBatch
+
+    def tearDown( self ):
+        for host in self.h1, self.h2:
+            host.terminate()
+
+    def tcShow( self, what ):
+        "Return output of tc what show for our interface"
+        return self.h1.cmd( 'tc', what, 'show dev', self.intf )
+
+    def testChange( self ):
+        "Changing a parameter changes the class in place"
+        self.assertIn( 'rate 10Mbit', self.tcShow( 'class' ) )
+        self.intf.config( bw=20 )
+        self.assertEqual( len( self.batches ), 1 )
+        self.assertEqual( [ cmd.split()[ :2 ] for cmd in self.batches[ 0 ] ],
+                          [ [ 'class', 'change' ] ] )
+        self.assertIn( 'rate 20Mbit', self.tcShow( 'class' ) )
+
+    def testUnchanged( self ):
+        "Reapplying the same configuration runs no tc commands"
+        self.intf.config( bw=10 )
+        self.assertEqual( self.batches, [] )
+
+    def testRebuild( self ):
+        "Changing the qdisc tree rebuilds it in one batch"
+        self.intf.config( bw=5, use_tbf=True )
+        self.assertEqual( len( self.batches ), 1 )
+        self.assertEqual( self.batches[ 0 ][ 0 ],
+                          'qdisc del dev %s root' % self.intf )
+        self.assertIn( 'tbf', self.tcShow( 'qdisc' ) )
+        self.assertNotIn( 'htb', self.tcShow( 'qdisc' ) )
+        # Forgetting our configuration forces a rebuild
+        self.intf.tcCmds = None
+        self.intf.config( bw=5, use_tbf=True )
+        self.assertEqual( len( self.batches ), 2 )
+        self.assertIn( 'rate 5Mbit', self.tcShow( 'qdisc' ) )
+
+
+class testUpdateLinks( unittest.TestCase ):
+    "Test Mininet.updateLinks()"
+
+    def setUp( self ):
+        self.net = Mininet( controller=None, link=TCLink )
+        h1, h2, h3 = [ self.net.addHost( 'h%d' % i ) for i in ( 1, 2, 3 ) ]
+        self.links = [ self.net.addLink( h1, h2, bw=10 ),
+                       self.net.addLink( h2, h3, bw=10 ) ]
+        self.net.build()
+
+    def tearDown( self ):
+        self.net.stop()
+
+    @staticmethod
+    def rate( intf ):
+        "Return htb class rate for intf"
+        return intf.cmd( 'tc class show dev', intf ).split()[ 7 ]
+
+    def testUpdateLinks( self ):
+        "updateLinks() changes many links at once"
+        link1, link2 = self.links
+        elapsed = self.net.updateLinks( {
+            link1: { 'bw': 20 }, link2: ( { 'bw': 5 }, { 'bw': 6 } ) } )
+        self.assertTrue( elapsed > 0 )
+        self.assertEqual( [ self.rate( intf ) for intf in (
+            link1.intf1, link1.intf2, link2.intf1, link2.intf2 ) ],
+            [ '20Mbit', '20Mbit', '5Mbit', '6Mbit' ] )
+        # Subsequent config() calls see the updated configuration
+        self.assertEqual( link2.intf2.tcCmds[ -1 ].split()[ -3 ],
+                          '6.000000Mbit' )
+        # Updates are merged with existing parameters and kept
+        self.net.updateLinks( { link2: { 'delay': '5ms' } } )
+        self.assertEqual( self.rate( link2.intf1 ), '5Mbit' )
+        self.assertEqual( link2.intf1.params[ 'delay' ], '5ms' )
+        self.net.updateLinks( { link2: { 'delay': None } } )
+        self.assertNotIn( 'delay', ' '.join( link2.intf1.tcCmds ) )
+        link2.intf1.config( **link2.intf1.params )
+        self.assertEqual( self.rate( link2.intf1 ), '5Mbit' )
+        # Errors are reported and leave the configuration unknown
+        self.net.updateLinks( { link1: { 'bw': 5, 'delay': 'bogus' } } )
+        self.assertEqual( link1.intf1.tcCmds, None )
+
+
+class testBatchLinks( unittest.TestCase ):
+    "Test building topology links through the batch path"
+
+    def testBatchable( self ):
+        "Only stock veth pair links can be created in a batch"
+        self.assertTrue( Link.batchable() )
+        self.assertTrue( TCLink.batchable() )
+        # OVSLink.makeIntfPair() is an instance method
+        self.assertFalse( OVSLink.batchable() )
+
+    def setUp( self ):
+        self.net = None
+
+    def tearDown( self ):
+        if self.net:
+            self.net.stop()
+
+    def buildNet( self, link, **lopts ):
+        "Build and check a linear network using link"
+        self.net = Mininet( LinearTopo( k=3, lopts=lopts ),
+                            switch=LinuxBridge, controller=None, link=link )
+        self.assertEqual( len( self.net.links ), 5 )
+        for netLink in self.net.links:
+            self.assertIsInstance( netLink, link )
+            for intf in netLink.intf1, netLink.intf2:
+                self.assertIn( 'UP', intf.ifconfig() )
+
+    def testTCLink( self ):
+        "TCLink networks are built in a batch and configured"
+        self.buildNet( TCLink, bw=10 )
+        for link in self.net.links:
+            self.assertIn( 'htb', ' '.join( link.intf1.tcCmds ) )
+
+    def testOVSLink( self ):
+        "OVSLink networks fall back to creating links one at a time"
+        self.buildNet( OVSLink )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
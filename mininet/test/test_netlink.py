@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the rtnetlink interface backend against ip/ifconfig."""
+
+import unittest
+
+from mininet.node import Host
+from mininet.link import Link
+from mininet.netlink import netlinkFor
+from mininet.clean import cleanup
+
+
+class testNetlink( unittest.TestCase ):
+    "Test RtNetlink and netlink=True links between namespace hosts"
+
+    def setUp( self ):
+        self.h1, self.h2 = Host( 'h1' ), Host( 'h2' )
+
+    def tearDown( self ):
+        for host in self.h1, self.h2:
+            host.terminate()
+
+    def testVeth( self ):
+        "RtNetlink creates and configures a veth pair across namespaces"
+        nl1, nl2 = netlinkFor( self.h1 ), netlinkFor( self.h2 )
+        nl1.addVeth( 'h1-eth0', 'h2-eth0', mac1='02:00:00:00:00:01',
+                     netns=self.h2.pid )
+        nl1.setAddr( 'h1-eth0', '10.0.0.1', 24 )
+        self.assertEqual( nl1.getAddrs( 'h1-eth0' ), [ ( '10.0.0.1', 24 ) ] )
+        # ip sees the same configuration
+        out = self.h1.cmd( 'ip -o -4 addr show dev h1-eth0' )
+        self.assertIn( 'inet 10.0.0.1/24 brd 10.0.0.255', out )
+        self.assertIn( '02:00:00:00:00:01',
+                       self.h1.cmd( 'ip link show h1-eth0' ) )
+        self.assertIn( 'h2-eth0', self.h2.cmd( 'ip link show h2-eth0' ) )
+        # Replacing the address removes the old one
+        nl1.setAddr( 'h1-eth0', '10.0.1.1', 8 )
+        self.assertEqual( nl1.getAddrs( 'h1-eth0' ), [ ( '10.0.1.1', 8 ) ] )
+        nl2.delLink( 'h2-eth0' )
+        self.assertRaises( OSError, nl1.getLink, 'h1-eth0' )
+        nl2.delLink( 'h2-eth0', missingOk=True )
+
+    def testLink( self ):
+        "Link( netlink=True ) matches the ip/ifconfig backend"
+        link = Link( self.h1, self.h2, netlink=True,
+                     addr1='02:00:00:00:00:01', addr2='02:00:00:00:00:02' )
+        intf1, intf2 = link.intf1, link.intf2
+        intf1.setIP( '10.0.0.1/8' )
+        intf2.setIP( '10.0.0.2', 8 )
+        self.assertEqual( intf1.updateAddr(),
+                          ( '10.0.0.1', '02:00:00:00:00:01' ) )
+        self.assertTrue( intf2.isUp() )
+        intf2.setMAC( '02:00:00:00:00:03' )
+        self.assertEqual( intf2.updateMAC(), '02:00:00:00:00:03' )
+        # Compare against the shell backend
+        intf2.netlink = False
+        self.assertEqual( intf2.updateAddr(),
+                          ( '10.0.0.2', '02:00:00:00:00:03' ) )
+        intf2.netlink = True
+        intf2.rename( 'h2-foo' )
+        self.assertIn( 'h2-foo', self.h2.cmd( 'ip link show h2-foo' ) )
+        self.assertTrue( intf2.isUp() )
+        link.delete()
+        self.assertEqual( self.h1.cmd( 'ip -o link show type veth' ), '' )
+
+    def testUnavailable( self ):
+        "A node whose namespace is gone doesn't disable rtnetlink for others"
+        h3 = Host( 'h3' )
+        h3.waitStarted()
+        h3.terminate()
+        self.assertEqual( netlinkFor( h3 ), None )
+        self.assertEqual( h3.rtnetlink, False )
+        self.assertTrue( netlinkFor( self.h1 ) )
+        self.assertTrue( netlinkFor() )
+        # Remote nodes' pids aren't ours to enter
+        self.h2.isRemote = True
+        self.assertEqual( netlinkFor( self.h2 ), None )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
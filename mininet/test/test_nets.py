@@ -3,6 +3,7 @@
 """Package: mininet
    Test creation and all-pairs ping for each included mininet topo type."""
 
+import json
 import unittest
 import sys
 from functools import partial
@@ -10,9 +11,10 @@
 from mininet.net import Mininet
 from mininet.node import Host, Controller
 from mininet.node import UserSwitch, OVSSwitch, IVSSwitch
+from mininet.nodelib import LinuxBridge
 from mininet.topo import SingleSwitchTopo, LinearTopo
 from mininet.log import setLogLevel
-from mininet.util import quietRun
+from mininet.util import quietRun, runCounts
 from mininet.clean import cleanup
 
 # Tell pylint not to complain about calls to other class
@@ -103,6 +105,194 @@ class testLinearUserspace( testLinearCommon, unittest.TestCase ):
     switchClass = UserSwitch
 
 
+@unittest.skipUnless( quietRun( 'which ping' ), 'ping is not installed' )
+class testPingMatrix( unittest.TestCase ):
+    "Test concurrent all-pairs ping"
+
+    def setUp( self ):
+        self.net = Mininet( SingleSwitchTopo( k=4 ), switch=LinuxBridge,
+                            controller=None )
+        self.net.addHost( 'h5' )
+        self.net.start()
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def testPingMatrix( self ):
+        "Check loss and rtt matrices"
+        net = self.net
+        net.configLinkStatus( 'h4', 's1', 'down' )
+        loss, rtt = net.pingMatrix( timeout='1' )
+        self.assertEqual( len( loss ), 5 )
+        for i in range( 5 ):
+            for j in range( 5 ):
+                if i == j or j == 4:
+                    # No pings to self or to hosts without intfs
+                    self.assertNotEqual( loss[ i ][ j ], loss[ i ][ j ] )
+                elif i in ( 3, 4 ):
+                    # Hosts without working links can't reach anyone
+                    self.assertEqual( loss[ i ][ j ], 100 )
+                    self.assertNotEqual( rtt[ i ][ j ], rtt[ i ][ j ] )
+                elif j != 3:
+                    self.assertEqual( loss[ i ][ j ], 0 )
+                    self.assertGreater( rtt[ i ][ j ], 0 )
+
+    def testPing( self ):
+        "ping() and pingFull() report all pairs"
+        hosts = self.net.hosts[ :4 ]
+        self.assertEqual( self.net.ping( hosts ), 0 )
+        results = self.net.pingFull( hosts )
+        self.assertEqual( len( results ), 12 )
+        self.assertEqual( [ outputs[ :2 ] for _src, _dest, outputs
+                            in results ], [ ( 1, 1 ) ] * 12 )
+        # A smaller window runs fewer pings at once
+        self.net.pingWindow = 2
+        self.assertEqual( self.net.ping( hosts ), 0 )
+
+
+class testStaticArp( unittest.TestCase ):
+    "Test bulk static ARP entries"
+
+    def testStaticArp( self ):
+        "Every host has a permanent entry for every other host"
+        net = Mininet( SingleSwitchTopo( k=4 ), switch=LinuxBridge,
+                       controller=None, autoStaticArp=True, build=False )
+        # Load entries a couple of hosts at a time
+        net.arpWindow = 2
+        net.start()
+        try:
+            for src in net.hosts:
+                neighbors = src.cmd( 'ip neigh show nud permanent' )
+                for dst in net.hosts:
+                    entry = '%s dev %s lladdr %s' % (
+                        dst.IP(), src.defaultIntf(), dst.MAC() )
+                    if src == dst:
+                        self.assertNotIn( entry, neighbors )
+                    else:
+                        self.assertIn( entry, neighbors )
+        finally:
+            net.stop()
+
+
+class testFastStop( unittest.TestCase ):
+    "Test Mininet.stop( fast=True )"
+
+    def testFastStop( self ):
+        "Fast stop removes every link and node shell"
+        net = Mininet( LinearTopo( k=3, n=2 ), switch=LinuxBridge,
+                       controller=None, fastStop=True )
+        net.start()
+        # A process that keeps a host namespace alive
+        popen = net[ 'h1s1' ].popen( [ 'sleep', '100' ] )
+        intfs = [ intf.name for node in net.switches
+                  for intf in node.intfList() if intf.name != 'lo' ]
+        shells = [ node.shell for node in net.values() ]
+        try:
+            net.stop()
+        finally:
+            popen.kill()
+            popen.wait()
+        self.assertEqual( [ phase for phase, _seconds in net.stopTimes ],
+                          [ 'controllers', 'links', 'hosts',
+                            'namespace links', 'switches' ] )
+        self.assertTrue( all( shell.poll() is not None
+                              for shell in shells ) )
+        links = quietRun( 'ip -o link show' )
+        for intf in intfs + [ 's1', 's2', 's3' ]:
+            self.assertNotIn( ' %s@' % intf, links )
+            self.assertNotIn( ' %s:' % intf, links )
+
+
+class testTimings( unittest.TestCase ):
+    "Test Mininet.timings()"
+
+    def testTimings( self ):
+        "Timings cover every phase, node and link"
+        net = Mininet( LinearTopo( k=2, n=2 ), switch=LinuxBridge,
+                       controller=None, build=False )
+        before = dict( runCounts )
+        net.start()
+        net.stop()
+        timings = json.loads( net.timings() )
+        phases = timings[ 'phases' ]
+        self.assertEqual( [ p[ 'phase' ] for p in phases[ 'start' ] ],
+                          [ 'controllers', 'switches', 'batchStartup' ] )
+        self.assertEqual( [ p[ 'phase' ] for p in phases[ 'stop' ] ],
+                          [ 'controllers', 'links', 'switches', 'hosts' ] )
+        self.assertEqual( [ ( p[ 'phase' ], p[ 'seconds' ] )
+                            for p in phases[ 'build' ] ], net.buildTimes )
+        # Every command and process was counted in some phase
+        for key in 'runs', 'popens', 'cmds':
+            self.assertEqual( sum( p[ key ] for stage in phases.values()
+                                   for p in stage ),
+                              runCounts[ key ] - before[ key ] )
+            self.assertEqual( timings[ 'counts' ][ key ],
+                              runCounts[ key ] )
+        nodes = timings[ 'nodes' ]
+        hosts = [ 'h1s1', 'h1s2', 'h2s1', 'h2s2' ]
+        self.assertEqual( sorted( nodes[ 'addHost' ] ), hosts )
+        self.assertEqual( sorted( nodes[ 'configHost' ] ), hosts )
+        self.assertEqual( sorted( nodes[ 'startShell' ] ),
+                          hosts + [ 's1', 's2' ] )
+        self.assertEqual( sorted( nodes[ 'startSwitch' ] ), [ 's1', 's2' ] )
+        self.assertIn( 'h1s1-eth0<->s1-eth1', nodes[ 'addLink' ] )
+        self.assertEqual( len( nodes[ 'addLink' ] ), 5 )
+
+
+class testMonitor( unittest.TestCase ):
+    "Test Mininet.monitor()"
+
+    def testMonitor( self ):
+        "Monitor returns lines from every host and leaves shells usable"
+        net = Mininet( SingleSwitchTopo( 3 ), switch=LinuxBridge,
+                       controller=None )
+        net.start()
+        try:
+            for host in net.hosts:
+                host.sendCmd( 'for i in 1 2 3; do echo %s $i; sleep .1;'
+                              ' done' % host.name )
+            lines = []
+            for host, line in net.monitor( timeoutms=1000 ):
+                if host is None:
+                    break
+                lines.append( ( host.name, line.strip() ) )
+            self.assertEqual( sorted( lines ), sorted(
+                ( host.name, '%s %d' % ( host.name, i ) )
+                for host in net.hosts for i in ( 1, 2, 3 ) ) )
+            for host in net.hosts:
+                host.waitOutput()
+                self.assertEqual( host.cmd( 'echo ok' ).strip(), 'ok' )
+        finally:
+            net.stop()
+
+
+@unittest.skipUnless( quietRun( 'which iperf' ), 'iperf is not installed' )
+class testTrafficMatrix( unittest.TestCase ):
+    "Test concurrent iperf flows"
+
+    def testTrafficMatrix( self ):
+        "Run all-to-all TCP flows and check per-flow and total rates"
+        net = Mininet( SingleSwitchTopo( k=3 ), switch=LinuxBridge,
+                       controller=None )
+        net.start()
+        try:
+            flows, total = net.trafficMatrix( duration=1 )
+        finally:
+            net.stop()
+        self.assertEqual( len( flows ), 6 )
+        self.assertEqual( set( ( flow[ 'client' ].name,
+                                 flow[ 'server' ].name )
+                               for flow in flows ),
+                          set( ( 'h%d' % i, 'h%d' % j )
+                               for i in range( 1, 4 )
+                               for j in range( 1, 4 ) if i != j ) )
+        for flow in flows:
+            self.assertGreater( flow[ 'sent' ], 0 )
+            self.assertGreater( flow[ 'received' ], 0 )
+        self.assertEqual( total, sum( flow[ 'received' ]
+                                      for flow in flows ) )
+
+
 if __name__ == '__main__':
     setLogLevel( 'warning' )
     unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the Node shell protocol: cmd() output, exit status and PIDs."""
+
+import unittest
+
+from mininet.net import Mininet
+from mininet.node import Host
+from mininet.clean import cleanup
+
+
+class testNodeCmd( unittest.TestCase ):
+    "Test Node.cmd() and monitor() on a root-namespace host"
+
+    def setUp( self ):
+        self.node = Host( 'h1', inNamespace=False )
+
+    def tearDown( self ):
+        self.node.terminate()
+
+    def testOutput( self ):
+        "cmd() returns command output without markers"
+        self.assertEqual( self.node.cmd( 'echo hello' ), 'hello\r\n' )
+        self.assertEqual( self.node.cmd( 'true' ), '' )
+
+    def testExitStatus( self ):
+        "lastStatus is taken from the framed prompt"
+        self.node.cmd( 'true' )
+        self.assertEqual( self.node.lastStatus, 0 )
+        self.node.cmd( 'false' )
+        self.assertEqual( self.node.lastStatus, 1 )
+        self.assertEqual( self.node.cmd( 'echo -n x; (exit 7)' ), 'x' )
+        self.assertEqual( self.node.lastStatus, 7 )
+
+    def testNoCommand( self ):
+        "sendCmd() without a command raises an error"
+        self.assertRaises( TypeError, self.node.sendCmd )
+        self.assertFalse( self.node.waiting )
+        self.assertEqual( self.node.cmd( 'echo ok' ), 'ok\r\n' )
+
+    def testBackgroundPid( self ):
+        "cmd( ... & ) sets lastPid and suppresses job notification"
+        self.assertEqual( self.node.cmd( 'sleep 10 &' ), '' )
+        self.assertTrue( self.node.lastPid )
+        self.node.cmd( 'kill %d' % self.node.lastPid )
+
+    def testLargeOutput( self ):
+        "Output larger than a single read is returned intact"
+        for n in [ 1, Host.readmax - 1, Host.readmax + 1, 1000000 ]:
+            output = self.node.cmd( "head -c %d /dev/zero | tr '\\000' x"
+                                    % n )
+            self.assertEqual( output, 'x' * n )
+
+    def testCmdBatch( self ):
+        "cmdBatch() returns per-command output and exit status"
+        results = self.node.cmdBatch( [ 'echo a', 'false', [ 'echo', 'b' ],
+                                        'echo -n c; (exit 3)' ] )
+        self.assertEqual( results, [ ( 'a\r\n', 0 ), ( '', 1 ),
+                                     ( 'b\r\n', 0 ), ( 'c', 3 ) ] )
+        self.assertEqual( self.node.lastStatus, 3 )
+
+    def testCmdBatchWindow( self ):
+        "cmdBatch() handles more input than fits in the tty queue"
+        cmds = [ 'echo %d' % i for i in range( 1000 ) ]
+        results = self.node.cmdBatch( cmds )
+        self.assertEqual( [ out for out, _status in results ],
+                          [ '%d\r\n' % i for i in range( 1000 ) ] )
+        self.assertEqual( self.node.cmd( 'echo done' ), 'done\r\n' )
+
+    def testDeferred( self ):
+        "Deferred cmd() calls run in order in runDeferred()"
+        self.assertTrue( self.node.deferCmds() )
+        self.assertFalse( self.node.deferCmds() )
+        self.assertEqual( self.node.cmd( 'X=1' ), '' )
+        self.assertEqual( self.node.cmds( [ 'X=$((X+1))', 'echo $X' ] ), '' )
+        results = self.node.runDeferred()
+        self.assertEqual( results[ -1 ], ( '2\r\n', 0 ) )
+        self.assertEqual( self.node.cmd( 'echo $X' ), '2\r\n' )
+
+    def testStopCmds( self ):
+        "stopCmds() interrupts a batch and leaves the shell usable"
+        self.node.sendCmds( [ 'echo a', 'sleep 10', 'echo b' ] )
+        self.node.monitorCmds( timeoutms=500 )
+        self.node.stopCmds()
+        self.assertFalse( self.node.waiting )
+        self.assertEqual( self.node.cmd( 'echo ok' ), 'ok\r\n' )
+
+
+class testCmdAll( unittest.TestCase ):
+    "Test Mininet.cmdAll()"
+
+    def setUp( self ):
+        self.net = Mininet( topo=None, controller=None )
+        for i in range( 1, 4 ):
+            self.net.addHost( 'h%d' % i, inNamespace=False )
+
+    def tearDown( self ):
+        for host in self.net.hosts:
+            host.terminate()
+
+    def testWaitStarted( self ):
+        "waitStarted() waits for all node shells at once"
+        self.assertTrue( any( host.starting for host in self.net.hosts ) )
+        self.net.waitStarted()
+        self.assertFalse( any( host.starting for host in self.net.hosts ) )
+        self.assertEqual( self.net[ 'h1' ].cmd( 'echo ok' ), 'ok\r\n' )
+
+    def testCmdAll( self ):
+        "cmdAll() runs commands on every host"
+        results = self.net.cmdAll( 'echo $((1+2))' )
+        self.assertEqual( set( results.values() ), { '3\r\n' } )
+        results = self.net.cmdAll( { 'h1': [ 'X=5', 'echo $X' ],
+                                     'h2': 'echo two' } )
+        self.assertEqual( results[ self.net[ 'h1' ] ], '5\r\n' )
+        self.assertEqual( results[ self.net[ 'h2' ] ], 'two\r\n' )
+        # Nodes with nothing to run don't hold us up
+        results = self.net.cmdAll( { 'h1': 'echo hi', 'h2': [] } )
+        self.assertEqual( results[ self.net[ 'h2' ] ], '' )
+
+    def testCmdAllTimeout( self ):
+        "Nodes that time out return None and remain usable"
+        h1, h2 = self.net.get( 'h1', 'h2' )
+        results = self.net.cmdAll( { h1: 'sleep 10', h2: 'echo ok' },
+                                   timeout=.5 )
+        self.assertEqual( results, { h1: None, h2: 'ok\r\n' } )
+        self.assertEqual( h1.cmd( 'echo ok' ), 'ok\r\n' )
+
+
+class CustomHost( Host ):
+    "Host whose config() uses command output and tolerates failure"
+
+    def config( self, **params ):
+        "Record command output after the usual configuration"
+        r = super( CustomHost, self ).config( **params )
+        self.cmd( 'false' )
+        self.configured = self.cmd( 'echo configured' ).strip()
+        return r
+
+
+class testConfigHosts( unittest.TestCase ):
+    "Test Mininet.configHosts()"
+
+    def setUp( self ):
+        self.net = Mininet( topo=None, controller=None )
+        for i in range( 1, 6 ):
+            self.net.addHost( 'h%d' % i )
+
+    def tearDown( self ):
+        for host in self.net.hosts:
+            host.terminate()
+
+    def testConfigHosts( self ):
+        "All hosts are configured, a window at a time"
+        self.net.configWindow = 2
+        self.net.configHosts()
+        for host in self.net.hosts:
+            self.assertIn( 'UP', host.cmd( 'ip link show lo' ) )
+            # Hosts can still run commands normally
+            self.assertEqual( host.cmd( 'echo ok' ), 'ok\r\n' )
+            self.assertEqual( host.deferred, None )
+
+    def testFailure( self ):
+        "Configuration stops at the first failure"
+        self.net.configWindow = 1
+        self.net.addHost( 'h0', defaultRoute='dev bogus0' )
+        self.net.hosts.insert( 0, self.net.hosts.pop() )
+        self.assertRaises( Exception, self.net.configHosts )
+        self.assertIn( 'UP', self.net[ 'h0' ].cmd( 'ip link show lo' ) )
+        self.assertNotIn( 'UP', self.net[ 'h1' ].cmd( 'ip link show lo' ) )
+
+    def testCustomConfig( self ):
+        "A custom config() runs its commands itself"
+        self.net.addHost( 'h0', cls=CustomHost )
+        self.net.configHosts()
+        h0 = self.net[ 'h0' ]
+        self.assertEqual( h0.configured, 'configured' )
+        self.assertIn( 'UP', h0.cmd( 'ip link show lo' ) )
+        self.assertIn( 'UP', self.net[ 'h1' ].cmd( 'ip link show lo' ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
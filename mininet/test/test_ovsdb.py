@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test the OVSDB client against an in-memory OVSDB server."""
+
+import json
+import os
+import resource
+import shutil
+import socket
+import tempfile
+import unittest
+from copy import deepcopy
+from threading import Thread, Lock, Timer
+from time import time
+from uuid import uuid4
+
+from mininet.ovsdb import OVSDB, OVSDBError
+import mininet.ovsdb
+from mininet.node import OVSSwitch, RemoteController, Host
+from mininet.link import Link
+from mininet.net import Mininet
+from mininet.util import decode, encode
+from mininet.clean import cleanup
+
+
+class FakeOVSDB( object ):
+    """In-memory stand-in for ovsdb-server (and ovs-vswitchd), which
+       supports the subset of OVSDB that mininet.ovsdb uses"""
+
+    defaults = { 'Controller': { 'is_connected': False },
+                 'Bridge': { 'controller': [ 'set', [] ] } }
+
+    def __init__( self, path ):
+        "path: unix socket path to listen on"
+        self.tables = { 'Open_vSwitch': {
+            str( uuid4() ): { 'bridges': [ 'set', [] ],
+                              'next_cfg': 0, 'cur_cfg': 0 } },
+                        'Bridge': {}, 'Port': {}, 'Interface': {},
+                        'Controller': {} }
+        self.monitors = []  # ( conn, monitor id, table, columns )
+        self.transactions = 0
+        self.lock = Lock()
+        self.server = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        self.server.bind( path )
+        self.server.listen( 5 )
+        self.conns = []
+        thread = Thread( target=self.serve )
+        thread.daemon = True
+        thread.start()
+
+    def close( self ):
+        "Stop serving"
+        self.server.close()
+        for conn in self.conns:
+            conn.close()
+
+    def serve( self ):
+        "Accept connections"
+        while True:
+            try:
+                conn, _addr = self.server.accept()
+            except socket.error:
+                return
+            self.conns.append( conn )
+            thread = Thread( target=self.handle, args=( conn, ) )
+            thread.daemon = True
+            thread.start()
+
+    @staticmethod
+    def send( conn, msg ):
+        "Send msg on conn"
+        conn.sendall( encode( json.dumps( msg ) ) )
+
+    def handle( self, conn ):
+        "Handle JSON-RPC requests on conn"
+        buf, decoder = '', json.JSONDecoder()
+        while True:
+            try:
+                data = conn.recv( 65536 )
+            except socket.error:
+                return
+            if not data:
+                return
+            buf += decode( data )
+            while True:
+                buf = buf.lstrip()
+                try:
+                    msg, end = decoder.raw_decode( buf )
+                except ValueError:
+                    break
+                buf = buf[ end: ]
+                with self.lock:
+                    self.dispatch( conn, msg )
+
+    def dispatch( self, conn, msg ):
+        "Reply to request msg"
+        method, params = msg.get( 'method' ), msg.get( 'params' )
+        if method == 'transact':
+            result = self.transact( params[ 1: ] )
+        elif method == 'monitor':
+            _db, monitorId, requests = params
+            result = {}
+            for table, request in requests.items():
+                columns = request[ 'columns' ]
+                self.monitors.append( ( conn, monitorId, table, columns ) )
+                result[ table ] = {
+                    rowId: { 'new': self.project( table, row, columns ) }
+                    for rowId, row in self.tables[ table ].items() }
+        elif method == 'monitor_cancel':
+            self.monitors = [ m for m in self.monitors
+                              if m[ 1 ] != params[ 0 ] ]
+            result = {}
+        elif method == 'echo':
+            result = params
+        else:
+            self.send( conn, { 'result': None, 'id': msg[ 'id' ],
+                               'error': 'unknown method' } )
+            return
+        self.send( conn, { 'result': result, 'error': None,
+                           'id': msg[ 'id' ] } )
+
+    # Data
+
+    def project( self, table, row, columns ):
+        "Return columns of row"
+        full = dict( self.defaults.get( table, {} ), **row )
+        return { c: full[ c ] for c in columns if c in full }
+
+    @classmethod
+    def refs( cls, value ):
+        "Return UUIDs referenced in datum value"
+        if isinstance( value, list ):
+            if len( value ) == 2 and value[ 0 ] == 'uuid':
+                return [ value[ 1 ] ]
+            return [ ref for item in value for ref in cls.refs( item ) ]
+        return []
+
+    @classmethod
+    def resolve( cls, value, names ):
+        "Replace named-uuid references in value"
+        if isinstance( value, list ):
+            if len( value ) == 2 and value[ 0 ] == 'named-uuid':
+                return [ 'uuid', names[ value[ 1 ] ] ]
+            return [ cls.resolve( item, names ) for item in value ]
+        if isinstance( value, dict ):
+            return { k: cls.resolve( v, names ) for k, v in value.items() }
+        return value
+
+    @staticmethod
+    def atoms( value ):
+        "Return atoms of datum"
+        if isinstance( value, list ) and value[ 0 ] == 'set':
+            return value[ 1 ]
+        return [ value ]
+
+    def matches( self, table, rowId, row, where ):
+        "Does row match where clause?"
+        for column, function, value in where:
+            assert function == '=='
+            actual = ( [ 'uuid', rowId ] if column == '_uuid' else
+                       self.project( table, row, [ column ] ).get( column ) )
+            if self.atoms( actual ) != self.atoms( value ):
+                return False
+        return True
+
+    def rows( self, tables, op ):
+        "Return ( uuid, row ) matching op"
+        table = op[ 'table' ]
+        return [ ( rowId, row ) for rowId, row in tables[ table ].items()
+                 if self.matches( table, rowId, row, op[ 'where' ] ) ]
+
+    # Operations
+
+    def transact( self, ops ):
+        "Run transaction ops"
+        self.transactions += 1
+        names = { op[ 'uuid-name' ]: str( uuid4() ) for op in ops
+                  if op[ 'op' ] == 'insert' and 'uuid-name' in op }
+        ops = self.resolve( ops, names )
+        for op in ops:
+            if 'uuid-name' in op:
+                op[ 'uuid' ] = names[ op[ 'uuid-name' ] ]
+        tables, results = deepcopy( self.tables ), []
+        for op in ops:
+            results.append( getattr( self, op[ 'op' ] )( tables, op ) )
+        # Garbage collect rows that are no longer referenced
+        live = set( tables[ 'Open_vSwitch' ] )
+        rows = { rowId: row for table in tables.values()
+                 for rowId, row in table.items() }
+        frontier = list( live )
+        while frontier:
+            for ref in self.refs( list( rows[ frontier.pop() ].values() ) ):
+                if ref not in live:
+                    if ref not in rows:
+                        return results + [ { 'error':
+                                             'referential integrity' } ]
+                    live.add( ref )
+                    frontier.append( ref )
+        for table in tables.values():
+            for rowId in list( table ):
+                if rowId not in live:
+                    del table[ rowId ]
+        names = [ row[ 'name' ] for row in tables[ 'Bridge' ].values() ]
+        if len( names ) != len( set( names ) ):
+            return results + [ { 'error': 'constraint violation' } ]
+        # Act like ovs-vswitchd, which applies changes immediately
+        for row in tables[ 'Open_vSwitch' ].values():
+            row[ 'cur_cfg' ] = row[ 'next_cfg' ]
+        self.commit( tables )
+        return results
+
+    def commit( self, tables ):
+        "Install new tables and notify monitors"
+        old, self.tables = self.tables, tables
+        for conn, monitorId, table, columns in self.monitors:
+            updates = {}
+            for rowId in set( old[ table ] ) | set( tables[ table ] ):
+                before, after = [ self.project( table, t[ table ][ rowId ],
+                                                columns )
+                                  if rowId in t[ table ] else None
+                                  for t in ( old, tables ) ]
+                if before != after:
+                    updates[ rowId ] = { 'old': before, 'new': after }
+                    if after is None:
+                        del updates[ rowId ][ 'new' ]
+            if updates:
+                self.send( conn, { 'method': 'update', 'id': None,
+                                   'params': [ monitorId,
+                                               { table: updates } ] } )
+
+    @staticmethod
+    def insert( tables, op ):
+        "Insert row"
+        rowId = op.get( 'uuid', str( uuid4() ) )
+        tables[ op[ 'table' ] ][ rowId ] = dict( op[ 'row' ] )
+        return { 'uuid': [ 'uuid', rowId ] }
+
+    def select( self, tables, op ):
+        "Select rows"
+        columns = op.get( 'columns' )
+        result = []
+        for rowId, row in self.rows( tables, op ):
+            row = dict( row, _uuid=[ 'uuid', rowId ] )
+            result.append( self.project( op[ 'table' ], row,
+                                         columns or list( row ) ) )
+        return { 'rows': result }
+
+    def update( self, tables, op ):
+        "Update rows"
+        rows = self.rows( tables, op )
+        for _rowId, row in rows:
+            row.update( op[ 'row' ] )
+        return { 'count': len( rows ) }
+
+    def mutate( self, tables, op ):
+        "Mutate rows"
+        rows = self.rows( tables, op )
+        for _rowId, row in rows:
+            for column, mutator, value in op[ 'mutations' ]:
+                if mutator == '+=':
+                    row[ column ] += value
+                    continue
+                current = self.atoms( row.get( column, [ 'set', [] ] ) )
+                if mutator == 'insert':
+                    current = current + [ v for v in self.atoms( value )
+                                          if v not in current ]
+                else:
+                    current = [ v for v in current
+                                if v not in self.atoms( value ) ]
+                row[ column ] = [ 'set', current ]
+        return { 'count': len( rows ) }
+
+    def delete( self, tables, op ):
+        "Delete rows"
+        rows = self.rows( tables, op )
+        for rowId, _row in rows:
+            del tables[ op[ 'table' ] ][ rowId ]
+        return { 'count': len( rows ) }
+
+    # Test helpers
+
+    def setConnected( self, connected=True ):
+        "Set is_connected for all controllers"
+        with self.lock:
+            tables = deepcopy( self.tables )
+            for row in tables[ 'Controller' ].values():
+                row[ 'is_connected' ] = connected
+            self.commit( tables )
+
+    def byName( self, table ):
+        "Return dict of name -> row for table"
+        with self.lock:
+            return { row[ 'name' ]: row
+                     for row in self.tables[ table ].values() }
+
+
+class testOVSDB( unittest.TestCase ):
+    "Test OVSDB client"
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join( self.tmpdir, 'db.sock' )
+        self.server = FakeOVSDB( self.path )
+        self.db = OVSDB( self.path )
+
+    def tearDown( self ):
+        self.db.close()
+        self.server.close()
+        shutil.rmtree( self.tmpdir )
+
+    def addBridges( self, names ):
+        "Add bridges with two ports and a controller each"
+        self.db.addBridges( [
+            { 'name': name, 'columns': { 'fail_mode': 'secure',
+                                         'other_config': { 'dp-desc': name },
+                                         'protocols': [ 'OpenFlow13' ] },
+              'ports': [ ( '%s-eth%d' % ( name, p ),
+                           { 'ofport_request': p } ) for p in ( 1, 2 ) ],
+              'controllers': [ { 'target': 'tcp:127.0.0.1:6653',
+                                 'max_backoff': 1000 } ] }
+            for name in names ] )
+
+    def testBridges( self ):
+        "Add, replace and delete bridges"
+        self.addBridges( [ 's1', 's2' ] )
+        self.assertEqual( self.server.transactions, 2 )
+        bridges = self.server.byName( 'Bridge' )
+        self.assertEqual( sorted( bridges ), [ 's1', 's2' ] )
+        self.assertEqual( bridges[ 's1' ][ 'other_config' ],
+                          [ 'map', [ [ 'dp-desc', 's1' ] ] ] )
+        intfs = self.server.byName( 'Interface' )
+        self.assertEqual( sorted( intfs ), [ 's1', 's1-eth1', 's1-eth2',
+                                             's2', 's2-eth1', 's2-eth2' ] )
+        self.assertEqual( intfs[ 's1' ][ 'type' ], 'internal' )
+        self.assertEqual( intfs[ 's2-eth2' ][ 'ofport_request' ], 2 )
+        # Replacing bridges leaves no stale rows behind
+        self.addBridges( [ 's2' ] )
+        self.assertEqual( len( self.server.byName( 'Port' ) ), 6 )
+        self.assertEqual( len( self.server.tables[ 'Controller' ] ), 2 )
+        self.db.delBridges( [ 's1', 's2', 's3' ] )
+        for table in 'Bridge', 'Port', 'Interface', 'Controller':
+            self.assertEqual( self.server.tables[ table ], {} )
+        # Every change waited for the configuration to be applied
+        self.assertEqual( self.db.curCfg, 3 )
+
+    def testPorts( self ):
+        "Add and delete ports"
+        self.addBridges( [ 's1' ] )
+        patch = { 'type': 'patch', 'options': { 'peer': 's2-eth1' } }
+        self.db.addPort( 's1', 's1-eth3', patch )
+        self.assertEqual( self.server.byName( 'Interface' )[ 's1-eth3' ][
+            'options' ], [ 'map', [ [ 'peer', 's2-eth1' ] ] ] )
+        self.db.delPort( 's1', 's1-eth1' )
+        self.assertEqual( sorted( self.server.byName( 'Port' ) ),
+                          [ 's1', 's1-eth2', 's1-eth3' ] )
+        self.assertRaises( OVSDBError, self.db.delPort, 's1', 's1-eth1' )
+
+    def testConnected( self ):
+        "Look up controllers and their connection status"
+        self.addBridges( [ 's1' ] )
+        uuids = self.db.bridgeControllers( 's1' )
+        self.assertEqual( len( uuids ), 1 )
+        self.assertEqual( self.db.connected( uuids ), [ False ] )
+        self.server.setConnected()
+        self.assertEqual( self.db.connected( uuids ), [ True ] )
+        self.assertEqual( self.db.bridgeControllers( 'nosuchbridge' ), [] )
+
+    def testWaitConnected( self ):
+        "Wait for controller connections without polling"
+        self.addBridges( [ 's1', 's2' ] )
+        connected = []
+        Timer( .2, self.server.setConnected ).start()
+        start = time()
+        remaining = self.db.waitConnected( [ 's1', 's2' ],
+                                           connected.append, timeout=5 )
+        self.assertEqual( remaining, [] )
+        self.assertEqual( sorted( connected ), [ 's1', 's2' ] )
+        self.assertTrue( .2 <= time() - start < 1 )
+        # Bridges without controllers time out
+        self.db.addBridges( [ { 'name': 's3' } ], replace=False )
+        self.assertEqual( self.db.waitConnected( [ 's1', 's3' ],
+                                                 timeout=.1 ), [ 's3' ] )
+
+    def testErrors( self ):
+        "Failed transactions raise OVSDBError"
+        self.assertRaises( OVSDBError, self.db.transact, [
+            { 'op': 'mutate', 'table': 'Open_vSwitch', 'where': [],
+              'mutations': [ [ 'bridges', 'insert',
+                               [ 'uuid', 'bogus' ] ] ] } ] )
+        self.assertRaises( OVSDBError, self.db.call, 'bogus' )
+
+    def testRecv( self ):
+        "recv() works with high fds and characters split between reads"
+        soft, hard = resource.getrlimit( resource.RLIMIT_NOFILE )
+        if hard != resource.RLIM_INFINITY and hard < 2048:
+            self.skipTest( 'cannot open enough files' )
+        resource.setrlimit( resource.RLIMIT_NOFILE, ( 2048, hard ) )
+        path = os.path.join( self.tmpdir, 'raw.sock' )
+        server = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        server.bind( path )
+        server.listen( 1 )
+        # Use up the low fds so that our connection gets a high one
+        nulls = [ os.open( os.devnull, os.O_RDONLY )
+                  for _ in range( 1100 ) ]
+        try:
+            db = OVSDB( path )
+            self.assertGreater( db.sock.fileno(), 1024 )
+            conn, _addr = server.accept()
+            self.assertIsNone( db.recv( timeout=.01 ) )
+            conn.sendall( b'{"id": 0, "result": "caf\xc3' )
+            Timer( .1, conn.sendall, [ b'\xa9"}' ] ).start()
+            self.assertEqual( db.recv( timeout=5 ),
+                              { 'id': 0, 'result': u'caf\xe9' } )
+            db.close()
+            conn.close()
+        finally:
+            for fd in nulls:
+                os.close( fd )
+            server.close()
+            resource.setrlimit( resource.RLIMIT_NOFILE, ( soft, hard ) )
+
+
+class testOVSSwitch( unittest.TestCase ):
+    "Test OVSSwitch using OVSDB"
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join( self.tmpdir, 'db.sock' )
+        self.server = FakeOVSDB( path )
+        mininet.ovsdb.client = OVSDB( path )
+        # Skip the ovs-vsctl checks in OVSSwitch.setup()
+        OVSSwitch.isSetup, OVSSwitch.OVSVersion = True, '2.17'
+        self.c0 = RemoteController( 'c0', port=6653 )
+        self.h1 = Host( 'h1' )
+        self.switches = [ OVSSwitch( 's%d' % i, batch=True,
+                                     inNamespace=False )
+                          for i in ( 1, 2 ) ]
+        for switch in self.switches:
+            Link( self.h1, switch )
+
+    def tearDown( self ):
+        for node in [ self.c0, self.h1 ] + self.switches:
+            node.terminate()
+        mininet.ovsdb.closeClient()
+        OVSSwitch.isSetup = False
+        self.server.close()
+        shutil.rmtree( self.tmpdir )
+
+    def testStartStop( self ):
+        "Start and stop OVS switches in single transactions"
+        for switch in self.switches:
+            switch.start( [ self.c0 ] )
+        transactions = self.server.transactions
+        OVSSwitch.batchStartup( self.switches )
+        # One to look for existing bridges, one to create them
+        self.assertEqual( self.server.transactions - transactions, 2 )
+        bridges = self.server.byName( 'Bridge' )
+        self.assertEqual( sorted( bridges ), [ 's1', 's2' ] )
+        self.assertEqual( bridges[ 's1' ][ 'fail_mode' ], 'secure' )
+        self.assertIn( [ 'datapath-id', self.switches[ 0 ].dpid ],
+                       bridges[ 's1' ][ 'other_config' ][ 1 ] )
+        self.assertEqual( sorted( self.server.byName( 'Port' ) ),
+                          [ 's1', 's1-eth1', 's2', 's2-eth1' ] )
+        s1 = self.switches[ 0 ]
+        self.assertFalse( s1.connected() )
+        self.server.setConnected()
+        self.assertTrue( s1.connected() )
+        OVSSwitch.batchShutdown( self.switches )
+        self.assertEqual( self.server.byName( 'Bridge' ), {} )
+
+    def testWaitConnected( self ):
+        "Mininet.waitConnected() returns as soon as switches connect"
+        for switch in self.switches:
+            switch.start( [ self.c0 ] )
+        OVSSwitch.batchStartup( self.switches )
+        net = Mininet( build=False )
+        net.switches = self.switches
+        self.assertFalse( net.waitConnected( timeout=.1 ) )
+        Timer( .2, self.server.setConnected ).start()
+        start = time()
+        self.assertTrue( net.waitConnected( timeout=5 ) )
+        self.assertTrue( time() - start < 1 )
+        self.assertEqual( sorted( net.connectTimes ), [ 's1', 's2' ] )
+        for seconds in net.connectTimes.values():
+            self.assertTrue( .2 <= seconds < 1 )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""Package: mininet
+   Test Topo graph backends."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mininet.topo
+from mininet.topo import Topo, MultiGraph, CompactGraph, LinearTopo
+from mininet.topolib import TorusTopo
+from mininet.link import TCLink
+from mininet.net import Mininet
+from mininet.node import OVSBridge
+from mininet.nodelib import LinuxBridge
+from mininet.clean import cleanup
+
+
+class TopoTestCase( unittest.TestCase ):
+    "Topo comparison helpers"
+
+    @staticmethod
+    def topos( cls, *args, **kwargs ):
+        "Return cls topos built with MultiGraph and CompactGraph"
+        return [ cls( *args, graph=graph, **kwargs )
+                 for graph in ( MultiGraph, CompactGraph ) ]
+
+    def assertSameTopo( self, topo1, topo2 ):
+        "Check that topos have the same nodes, links and ports"
+        self.assertEqual( topo1.nodes(), topo2.nodes() )
+        self.assertEqual( topo1.switches(), topo2.switches() )
+        self.assertEqual( topo1.hosts(), topo2.hosts() )
+        for node in topo1.nodes():
+            self.assertEqual( topo1.nodeInfo( node ),
+                              topo2.nodeInfo( node ) )
+            self.assertEqual( sorted( topo1.ports[ node ].items() ),
+                              sorted( topo2.ports[ node ].items() ) )
+        self.assertEqual( topo1.links( sort=True, withKeys=True,
+                                       withInfo=True ),
+                          topo2.links( sort=True, withKeys=True,
+                                       withInfo=True ) )
+        self.assertEqual( sorted( topo1.g.edges( data=True, keys=True ),
+                                  key=str ),
+                          sorted( topo2.g.edges( data=True, keys=True ),
+                                  key=str ) )
+
+
+class testCompactGraph( TopoTestCase ):
+    "CompactGraph Topos should match MultiGraph Topos"
+
+    def testTopos( self ):
+        "Stock topologies are the same with either graph"
+        self.assertSameTopo( *self.topos( LinearTopo, k=4, n=2 ) )
+        self.assertSameTopo( *self.topos( TorusTopo, 3, 3 ) )
+
+    def testParallelLinks( self ):
+        "Parallel links, keys, link info and explicit ports"
+        topos = self.topos( Topo, lopts={ 'bw': 10 } )
+        for topo in topos:
+            s1, s2 = topo.addSwitch( 's1' ), topo.addSwitch( 's2' )
+            h1 = topo.addHost( 'h1', ip='10.0.0.1' )
+            self.assertEqual( topo.addLink( s1, s2 ), 1 )
+            self.assertEqual( topo.addLink( s2, s1, delay='1ms' ), 2 )
+            self.assertEqual( topo.addLink( s1, s2, key='backup' ),
+                              'backup' )
+            topo.addLink( h1, s1, port1=0, port2=10 )
+            self.assertEqual( topo.port( h1, s1 ), ( 0, 10 ) )
+            self.assertEqual( topo.port( s1, s2 ), [ ( 1, 1 ), ( 2, 2 ),
+                                                     ( 3, 3 ) ] )
+            info = topo.linkInfo( s2, s1, key=2 )
+            self.assertEqual( info, { 'delay': '1ms', 'node1': 's2',
+                                      'node2': 's1', 'port1': 2,
+                                      'port2': 2 } )
+            topo.setlinkInfo( s1, s2, dict( info, delay='2ms' ), key=2 )
+            self.assertEqual( topo.linkInfo( s1, s2, 2 )[ 'delay' ], '2ms' )
+            self.assertEqual( len( topo.links( sort=True ) ), 4 )
+            topo.setNodeInfo( h1, { 'ip': '10.0.0.2' } )
+        self.assertSameTopo( *topos )
+
+    def testSharedAttrs( self ):
+        "Links with the same options share their attributes"
+        topo = LinearTopo( k=10, n=1, graph=CompactGraph,
+                           lopts={ 'bw': 10, 'delay': '1ms' } )
+        graph = topo.g
+        self.assertEqual( len( set( graph.edgeAttrs ) ), 1 )
+        # {}, switch and link attributes
+        self.assertEqual( len( graph.attrs ), 3 )
+        self.assertEqual( topo.linkInfo( 'h1', 's1' ),
+                          { 'bw': 10, 'delay': '1ms', 'node1': 'h1',
+                            'node2': 's1', 'port1': 0, 'port2': 1 } )
+        # Changing one link's attributes doesn't change the others'
+        topo.linkInfo( 'h1', 's1' )[ 'bw' ] = 20
+        self.assertEqual( topo.linkInfo( 'h2', 's2' )[ 'bw' ], 10 )
+        self.assertEqual( len( set( graph.edgeAttrs ) ), 2 )
+
+    def testInPlace( self ):
+        "Attribute dicts can be changed in place, as with MultiGraph"
+        topos = self.topos( LinearTopo, k=3, lopts={ 'bw': 10 } )
+        for topo in topos:
+            # Warm the sorted link cache
+            topo.links( sort=True, withInfo=True )
+            info = topo.nodeInfo( 's1' )
+            info[ 'isSwitch' ] = False
+            info.setdefault( 'ip', '10.0.0.9' )
+            self.assertFalse( topo.isSwitch( 's1' ) )
+            self.assertEqual( topo.nodeInfo( 's1' )[ 'ip' ], '10.0.0.9' )
+            info = topo.linkInfo( 's2', 's1' )
+            info.update( delay='1ms' )
+            del info[ 'bw' ]
+            expected = { 'delay': '1ms', 'node1': 's2', 'node2': 's1',
+                         'port1': 2, 'port2': 2 }
+            self.assertEqual( topo.linkInfo( 's1', 's2' ), expected )
+            self.assertIn( ( 's2', 's1', expected ),
+                           topo.links( sort=True, withInfo=True ) )
+        self.assertSameTopo( *topos )
+
+    def testSortCache( self ):
+        "Sorted nodes and links are cached until the topo changes"
+        topo = LinearTopo( k=3, graph=CompactGraph )
+        links = topo.links( sort=True )
+        links.append( 'bogus' )
+        self.assertEqual( topo.links( sort=True ), links[ :-1 ] )
+        topo.addLink( 'h1', 's3' )
+        self.assertEqual( len( topo.links( sort=True ) ), 6 )
+        topo.addHost( 'h0' )
+        self.assertEqual( topo.hosts()[ 0 ], 'h0' )
+
+
+class testTopoFile( TopoTestCase ):
+    "Test Topo.save() and Topo.load()"
+
+    def setUp( self ):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.tmpdir )
+
+    def reload( self, topo, name='topo.json', **kwargs ):
+        "Save and reload topo"
+        path = os.path.join( self.tmpdir, name )
+        topo.save( path )
+        return Topo.load( path, **kwargs )
+
+    def testSaveLoad( self ):
+        "Loaded topologies match saved topologies"
+        for topo in self.topos( LinearTopo, k=3, n=2,
+                                lopts={ 'cls': TCLink, 'bw': 10 } ):
+            topo.addSwitch( 's9', cls=OVSBridge, stp=True )
+            topo.addLink( 's9', 's1', key='extra', port2=9 )
+            for name in 'topo.json', 'topo.json.gz':
+                loaded = self.reload( topo, name )
+                self.assertEqual( type( loaded.g ), type( topo.g ) )
+                self.assertSameTopo( topo, loaded )
+        self.assertEqual( loaded.linkInfo( 's9', 's1' )[ 'port2' ], 9 )
+        self.assertEqual( loaded.nodeInfo( 's9' )[ 'cls' ], OVSBridge )
+        self.assertEqual( type( self.reload(
+            topo, graph=MultiGraph ).g ), MultiGraph )
+
+    def testNoSort( self ):
+        "Loaded topologies are not sorted again"
+        loaded = self.reload( TorusTopo( 3, 3 ) )
+        saved = mininet.topo.natural, mininet.topo.naturalSeq
+        mininet.topo.natural = mininet.topo.naturalSeq = None
+        try:
+            self.assertEqual( len( loaded.hosts() ), 9 )
+            self.assertEqual( len( loaded.links( sort=True,
+                                                 withInfo=True ) ), 27 )
+        finally:
+            mininet.topo.natural, mininet.topo.naturalSeq = saved
+
+    def testErrors( self ):
+        "Bad files and values are rejected"
+        path = os.path.join( self.tmpdir, 'bogus' )
+        with open( path, 'w' ) as f:
+            f.write( '["node", "h1", {}]\n' )
+        self.assertRaises( Exception, Topo.load, path )
+        topo = Topo()
+        topo.addHost( 'h1', ip=object() )
+        self.assertRaises( TypeError, topo.save, path )
+
+    def testClasses( self ):
+        "Only mininet classes are loaded unless others are allowed"
+        topo = Topo()
+        topo.addHost( 'h1', cls=unittest.TestCase )
+        path = os.path.join( self.tmpdir, 'topo.json' )
+        topo.save( path, desc='custom' )
+        self.assertRaises( Exception, Topo.load, path )
+        loaded = Topo.load( path, classes={
+            'unittest.case.TestCase': unittest.TestCase } )
+        self.assertEqual( loaded.nodeInfo( 'h1' )[ 'cls' ],
+                          unittest.TestCase )
+        self.assertEqual( loaded.desc, 'custom' )
+        self.assertEqual( self.reload( LinearTopo( k=2 ) ).desc, None )
+
+
+class testApplyTopo( unittest.TestCase ):
+    "Test Mininet.applyTopo()"
+
+    @staticmethod
+    def topo( bw=10, h2=True, h3=False, **params ):
+        "Return h1, h2, h3 - s1 - s2 topology with optional nodes"
+        topo = Topo()
+        s1 = topo.addSwitch( 's1' )
+        topo.addLink( topo.addHost( 'h1' ), s1, bw=bw, **params )
+        if h2:
+            topo.addLink( topo.addHost( 'h2' ), s1, bw=10 )
+        if h3:
+            topo.addLink( topo.addHost( 'h3' ), s1, bw=10, port2=3 )
+            topo.addLink( s1, topo.addSwitch( 's2' ), port1=4 )
+        return topo
+
+    def setUp( self ):
+        self.net = Mininet( self.topo(), switch=LinuxBridge, link=TCLink,
+                            controller=None )
+        self.net.start()
+
+    def tearDown( self ):
+        self.net.stop()
+
+    def bridged( self, switch ):
+        "Return interfaces attached to bridge switch"
+        out = self.net[ switch ].cmd( 'ip -o link show master', switch )
+        return sorted( line.split()[ 1 ].split( '@' )[ 0 ].rstrip( ':' )
+                       for line in out.splitlines() )
+
+    def testApplyTopo( self ):
+        "Apply changes to a running network"
+        net = self.net
+        h1link = net.linksBetween( net[ 'h1' ], net[ 's1' ] )[ 0 ]
+        changes = net.applyTopo( self.topo( bw=20, h2=False, h3=True ) )
+        self.assertEqual( changes, {
+            'addNodes': [ 'h3', 's2' ], 'delNodes': [ 'h2' ],
+            'addLinks': [ ( 'h3', 's1' ), ( 's1', 's2' ) ],
+            'delLinks': [ ( 'h2', 's1' ) ],
+            'updateLinks': [ ( 'h1', 's1' ) ] } )
+        self.assertEqual( sorted( net.keys() ), [ 'h1', 'h3', 's1', 's2' ] )
+        self.assertEqual( self.bridged( 's1' ), [ 's1-eth1', 's1-eth3',
+                                                  's1-eth4' ] )
+        self.assertEqual( self.bridged( 's2' ), [ 's2-eth1' ] )
+        self.assertIn( net[ 'h3' ].IP(),
+                       net[ 'h3' ].cmd( 'ip addr show h3-eth0' ) )
+        # The h1 link was updated in place
+        self.assertIs( net.linksBetween( net[ 'h1' ], net[ 's1' ] )[ 0 ],
+                       h1link )
+        self.assertIn( 'rate 20Mbit',
+                       net[ 'h1' ].cmd( 'tc class show dev h1-eth0' ) )
+        # Nothing changed
+        changes = net.applyTopo( self.topo( bw=20, h2=False, h3=True ) )
+        self.assertEqual( sum( changes.values(), [] ), [] )
+
+    def testRecreate( self ):
+        "Links with changed options are recreated"
+        net = self.net
+        h1link = net.linksBetween( net[ 'h1' ], net[ 's1' ] )[ 0 ]
+        changes = net.applyTopo( self.topo( addr1='00:00:00:00:00:aa' ) )
+        self.assertEqual( changes[ 'addLinks' ], [ ( 'h1', 's1' ) ] )
+        self.assertEqual( changes[ 'delLinks' ], [ ( 'h1', 's1' ) ] )
+        self.assertNotIn( h1link, net.links )
+        h1 = net[ 'h1' ]
+        self.assertEqual( h1.MAC(), '00:00:00:00:00:aa' )
+        self.assertIn( h1.IP(), h1.cmd( 'ip addr show h1-eth0' ) )
+        self.assertIn( 's1-eth1', self.bridged( 's1' ) )
+
+
+if __name__ == '__main__':
+    unittest.main()
+    cleanup()
@@ -3,9 +3,17 @@
 """Package: mininet
    Test functions defined in mininet.util."""
 
+import sys
 import unittest
+from subprocess import Popen, PIPE, STDOUT
+from time import time
 
-from mininet.util import quietRun
+from mininet.util import ( quietRun, makeIntfPairs, waitListening, errRun,
+                           errRuns, startRootShell, stopRootShell,
+                           pmonitor, Multiplexer, communicateAll,
+                           batchDelIntfs )
+from mininet.node import Host
+from mininet.link import Link
 
 class testQuietRun( unittest.TestCase ):
     """Test quietRun that runs a command and returns its merged output from
@@ -36,5 +44,215 @@ def testMultipleReads( self ):
             self.assertEqual( n, len( output ) )
 
 
+class testRootShell( unittest.TestCase ):
+    "Test running errRun() commands through a persistent root shell"
+
+    cmds = [ ( 'echo hello', {} ),
+             ( 'ls /nonexistent', {} ),
+             ( [ 'printf', '%s', 'no newline' ], {} ),
+             ( 'echo out; echo err >&2; exit 3', { 'shell': True } ),
+             ( 'echo out; echo err >&2', { 'shell': True,
+                                            'stderr': STDOUT } ) ]
+
+    def tearDown( self ):
+        stopRootShell()
+
+    def testErrRun( self ):
+        "errRun() returns the same results with and without the root shell"
+        results = [ errRun( cmd, **kwargs ) for cmd, kwargs in self.cmds ]
+        startRootShell()
+        self.assertEqual( [ errRun( cmd, **kwargs )
+                            for cmd, kwargs in self.cmds ], results )
+        # Commands can't change the root shell's state
+        errRun( 'cd /; exit 1', shell=True )
+        self.assertEqual( errRun( 'echo ok' ).out, 'ok\n' )
+        self.assertRaises( OSError, errRun, 'nonexistentcommand' )
+
+    def testErrRuns( self ):
+        "Pipelined commands return results in order"
+        startRootShell()
+        cmds = [ 'echo %d' % i for i in range( 2000 ) ]
+        self.assertEqual( [ result.out for result in errRuns( cmds ) ],
+                          [ '%d\n' % i for i in range( 2000 ) ] )
+
+
+class testCommunicateAll( unittest.TestCase ):
+    "Test communicateAll()"
+
+    def testLargeIO( self ):
+        "Processes with more input and output than a pipe holds"
+        data = ''.join( '%d\n' % i for i in range( 200000 ) )
+        popens = [ ( Popen( [ 'cat' ], stdin=PIPE, stdout=PIPE ), data ),
+                   ( Popen( [ 'wc', '-l' ], stdin=PIPE, stdout=PIPE ),
+                     data ),
+                   ( Popen( [ 'echo', 'hi' ], stdin=PIPE, stdout=PIPE ),
+                     '' ),
+                   # Exits without reading its input
+                   ( Popen( [ 'true' ], stdin=PIPE, stdout=PIPE ), data ) ]
+        self.assertEqual( communicateAll( popens ),
+                          [ data, '200000\n', 'hi\n', '' ] )
+
+    def testWindow( self ):
+        "Processes are started lazily, a window at a time"
+        started = []
+
+        def popens():
+            "Start processes, recording how many were running"
+            for i in range( 20 ):
+                started.append( sum( popen.poll() is None
+                                     for popen in running ) )
+                popen = Popen( [ 'sh', '-c', 'cat; sleep .01' ],
+                               stdin=PIPE, stdout=PIPE )
+                running.append( popen )
+                yield popen, '%d\n' % i
+
+        running = []
+        self.assertEqual( communicateAll( popens(), window=3 ),
+                          [ '%d\n' % i for i in range( 20 ) ] )
+        self.assertLessEqual( max( started ), 2 )
+
+    def testDeleteMissing( self ):
+        "batchDelIntfs() doesn't hang on many missing interfaces"
+        start = time()
+        batchDelIntfs( 'nosuchintf%d' % i for i in range( 24000 ) )
+        self.assertLess( time() - start, 30 )
+
+
+class testMultiplexer( unittest.TestCase ):
+    "Test Multiplexer and pmonitor()"
+
+    @staticmethod
+    def popen( script ):
+        "Return Popen running shell script"
+        return Popen( [ 'sh', '-c', script ], stdout=PIPE )
+
+    def testLines( self ):
+        "pmonitor() returns complete lines from each process"
+        popens = { 1: self.popen( 'echo one; sleep .1; echo two;'
+                                  ' printf "thr"; sleep .1; printf "ee"' ),
+                   2: self.popen( 'printf "%050d\n" 0; seq 3' ) }
+        lines = { 1: [], 2: [] }
+        for key, line in pmonitor( popens, timeoutms=50, readmax=16 ):
+            if key:
+                lines[ key ].append( line )
+        self.assertEqual( popens, {} )
+        self.assertEqual( lines[ 1 ], [ 'one\n', 'two\n', 'three' ] )
+        # Long lines are split at readmax
+        self.assertEqual( ''.join( lines[ 2 ] ), '0' * 50 + '\n1\n2\n3\n' )
+        self.assertEqual( len( lines[ 2 ] ), 7 )
+
+    def testCallbacks( self ):
+        "Callbacks get output, and paused processes are not read"
+        mux = Multiplexer()
+        fast, slow = [], []
+        count = 100000
+        popens = [ self.popen( 'seq %d' % count ),
+                   self.popen( 'echo hello' ) ]
+        mux.add( 'fast', popens[ 0 ].stdout,
+                 lambda _key, line: fast.append( line ) )
+        mux.add( 'slow', popens[ 1 ].stdout,
+                 lambda _key, line: slow.append( line ) )
+        mux.pause( 'fast' )
+        while 'slow' in mux:
+            mux.poll()
+        self.assertEqual( slow, [ 'hello\n', None ] )
+        self.assertEqual( fast, [] )
+        # seq blocks writing to its full pipe
+        self.assertIsNone( popens[ 0 ].poll() )
+        mux.resume( 'fast' )
+        mux.run()
+        self.assertEqual( len( fast ), count + 1 )
+        self.assertEqual( fast[ -2: ], [ '%d\n' % count, None ] )
+        mux.close()
+        for popen in popens:
+            popen.wait()
+
+
+class testMakeIntfPairs( unittest.TestCase ):
+    "Test bulk veth pair creation"
+
+    def setUp( self ):
+        self.h1, self.h2 = Host( 'h1' ), Host( 'h2' )
+        self.r1 = Host( 'r1', inNamespace=False )
+
+    def tearDown( self ):
+        for node in self.h1, self.h2, self.r1:
+            node.terminate()
+
+    def isUp( self, node, intf ):
+        "Is intf up in node?"
+        return ',UP' in node.cmd( 'ip -o link show', intf )
+
+    def testMakeIntfPairs( self ):
+        "makeIntfPairs() creates interfaces in the right namespaces"
+        h1, h2, r1 = self.h1, self.h2, self.r1
+        isUp = makeIntfPairs( [
+            ( 'h1-eth0', 'h2-eth0', None, None, h1, h2 ),
+            ( 'r1-eth0', 'h1-eth1', None, '02:00:00:00:00:01', r1, h1 ) ],
+            up=True )
+        # Of the namespace-to-namespace pair, only intf1 can come up
+        self.assertEqual( isUp, [ ( True, False ), ( True, True ) ] )
+        self.assertTrue( self.isUp( h1, 'h1-eth0' ) )
+        self.assertFalse( self.isUp( h2, 'h2-eth0' ) )
+        self.assertTrue( self.isUp( r1, 'r1-eth0' ) )
+        self.assertTrue( self.isUp( h1, 'h1-eth1' ) )
+        self.assertIn( '02:00:00:00:00:01', h1.cmd( 'ip link show h1-eth1' ) )
+        r1.cmd( 'ip link del r1-eth0' )
+        self.assertRaises( Exception, makeIntfPairs,
+                           [ ( 'h1-eth0', 'h2-eth0', None, None, h1, h2 ) ] )
+
+    def testBatchCreate( self ):
+        "Link( batch=True ) creates its interfaces in batchCreate()"
+        links = [ Link( self.h1, self.h2, port1=0, port2=0, batch=True ),
+                  Link( self.h1, self.r1, port1=1, port2=0, batch=True,
+                        params1={ 'up': False } ) ]
+        self.assertEqual( self.h1.intfList(), [] )
+        Link.batchCreate( links )
+        self.assertEqual( [ intf.name for intf in self.h1.intfList() ],
+                          [ 'h1-eth0', 'h1-eth1' ] )
+        # Interfaces come up unless told otherwise
+        for intf in links[ 0 ].intf1, links[ 0 ].intf2, links[ 1 ].intf2:
+            self.assertTrue( intf.isUp() )
+        self.assertFalse( links[ 1 ].intf1.isUp() )
+        links[ 1 ].delete()
+
+
+class testWaitListening( unittest.TestCase ):
+    "Test socket-based waitListening()"
+
+    # Listen on port 5555 after a delay
+    server = ( 'import socket, time; time.sleep( %s ); '
+               's = socket.socket(); s.bind( ( "127.0.0.1", 5555 ) ); '
+               's.listen( 1 ); s.accept()' )
+
+    def setUp( self ):
+        self.h1 = Host( 'h1' )
+
+    def tearDown( self ):
+        self.h1.terminate()
+
+    def testListening( self ):
+        "Detect a server soon after it starts listening"
+        h1 = self.h1
+        h1.cmd( 'ip link set lo up' )
+        popen = h1.popen( [ sys.executable, '-c', self.server % .3 ] )
+        start = time()
+        self.assertTrue( waitListening( h1, '127.0.0.1', 5555,
+                                        timeout=5 ) )
+        elapsed = time() - start
+        popen.wait()
+        self.assertGreaterEqual( elapsed, .3 )
+        self.assertLess( elapsed, .5 )
+        # Not listening any more
+        self.assertFalse( waitListening( h1, '127.0.0.1', 5555,
+                                         timeout=.2 ) )
+
+    def testUnreachable( self ):
+        "Give up at once if there is no route to the server"
+        start = time()
+        self.assertFalse( waitListening( self.h1, '127.0.0.1', 5555 ) )
+        self.assertLess( time() - start, .5 )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -11,7 +11,14 @@
 setup for testing, and can even be emulated with the Mininet package.
 """
 
-from mininet.util import irange, natural, naturalSeq
+import gc
+import gzip
+import json
+from array import array
+from functools import partial
+from importlib import import_module
+
+from mininet.util import irange, natural, naturalSeq, encode, decode
 
 # pylint: disable=too-many-arguments
 
@@ -68,14 +75,14 @@ def edges_iter( self, data=False, keys=False ):
                 for k, attrs in entrykeys.items():
                     if data:
                         if keys:
-                            yield( src, dst, k, attrs )
+                            yield src, dst, k, attrs
                         else:
-                            yield( src, dst, attrs )
+                            yield src, dst, attrs
                     else:
                         if keys:
-                            yield( src, dst, k )
+                            yield src, dst, k
                         else:
-                            yield( src, dst )
+                            yield src, dst
 
     def edges( self, data=False, keys=False ):
         "Return list of graph edges"
@@ -99,6 +106,495 @@ def convertTo( self, cls, data=False, keys=False ):
         return g
 
 
+class CompactGraph( object ):
+    """Compact MultiGraph replacement for very large topologies
+       Nodes are numbered, and edges are stored in arrays, with an
+       array of incident edge numbers per node. Attribute dicts are
+       interned as tuples, so that nodes or links with the same options
+       share storage; Topo link endpoints and port numbers are stored
+       in arrays rather than in each link's attribute dict.
+       Attribute dicts are rebuilt on lookup, as CompactAttrs that
+       store any changes made to them back in the graph."""
+
+    noPort = -2 ** 31  # port1/port2 not stored in port arrays
+
+    def __init__( self ):
+        self.names = []  # node number -> node
+        self.ids = {}  # node -> node number
+        self.nodeAttrs = array( 'i' )  # node number -> attrs number
+        self.adj = []  # node number -> array of incident edge numbers
+        self.nbrs = []  # node number -> array of neighbor node numbers
+        self.portCount = array( 'i' )  # node number -> number of ports
+        self.attrs = []  # attrs number -> tuple of attribute items
+        self.attrIds = {}  # tuple of attribute items -> attrs number
+        self.switchAttrs = bytearray()  # attrs number -> isSwitch set?
+        # Edge number -> ...
+        self.src, self.dst = array( 'i' ), array( 'i' )
+        self.keys = {}  # key, unless it is 1
+        self.edgeAttrs = array( 'i' )  # attrs number
+        self.ends = array( 'b' )  # node1, node2 are src, dst?
+        self.port1, self.port2 = array( 'i' ), array( 'i' )  # or noPort
+        self.node = CompactNodes( self )
+        self.ports = CompactPorts( self )
+        # Topo's sorted nodes and links, cleared by CompactAttrs
+        self.sortCache = {}
+
+    def intern( self, attrs ):
+        "Return attrs number for attribute dict attrs"
+        items = tuple( sorted( attrs.items() ) )
+        try:
+            attrId = self.attrIds.get( items )
+            hashable = True
+        except TypeError:
+            # Unhashable values, so don't share
+            attrId, hashable = None, False
+        if attrId is None:
+            attrId = len( self.attrs )
+            self.attrs.append( items )
+            self.switchAttrs.append( bool( attrs.get( 'isSwitch', False ) ) )
+            if hashable:
+                self.attrIds[ items ] = attrId
+        return attrId
+
+    def nodeId( self, node ):
+        "Return number for node, adding it if necessary"
+        nodeId = self.ids.get( node )
+        if nodeId is None:
+            nodeId = self.ids[ node ] = len( self.names )
+            self.names.append( node )
+            self.nodeAttrs.append( self.intern( {} ) )
+            self.adj.append( array( 'i' ) )
+            self.nbrs.append( array( 'i' ) )
+            self.portCount.append( 0 )
+        return nodeId
+
+    def add_node( self, node, attr_dict=None, **attrs ):
+        """Add node to graph
+           attr_dict: attribute dict (optional)
+           attrs: more attributes (optional)
+           warning: updates attr_dict with attrs"""
+        attr_dict = {} if attr_dict is None else attr_dict
+        attr_dict.update( attrs )
+        self.nodeAttrs[ self.nodeId( node ) ] = self.intern( attr_dict )
+
+    def between( self, src, dst ):
+        "Return numbers of edges between node numbers src and dst"
+        if len( self.adj[ dst ] ) < len( self.adj[ src ] ):
+            src, dst = dst, src
+        return [ e for e, nbr in zip( self.adj[ src ], self.nbrs[ src ] )
+                 if nbr == dst ]
+
+    def key( self, edge ):
+        "Return key of edge number edge"
+        return self.keys.get( edge, 1 )
+
+    def setEdge( self, edge, attrs ):
+        "Store attribute dict attrs for edge number edge"
+        attrs = dict( attrs )
+        names = self.names
+        ends = ( attrs.get( 'node1' ) == names[ self.src[ edge ] ] and
+                 attrs.get( 'node2' ) == names[ self.dst[ edge ] ] )
+        if ends:
+            del attrs[ 'node1' ], attrs[ 'node2' ]
+        self.ends[ edge ] = ends
+        # Ports are stored in the arrays as a pair, or not at all
+        port1, port2 = attrs.get( 'port1' ), attrs.get( 'port2' )
+        if ( type( port1 ) is int and type( port2 ) is int and
+                self.noPort < port1 < 2 ** 31 and
+                self.noPort < port2 < 2 ** 31 ):
+            del attrs[ 'port1' ], attrs[ 'port2' ]
+        else:
+            port1 = port2 = self.noPort
+        self.port1[ edge ], self.port2[ edge ] = port1, port2
+        self.edgeAttrs[ edge ] = self.intern( attrs )
+
+    def getEdge( self, edge ):
+        "Return attribute dict for edge number edge"
+        items = self.attrs[ self.edgeAttrs[ edge ] ]
+        if self.ends[ edge ]:
+            items += ( ( 'node1', self.names[ self.src[ edge ] ] ),
+                       ( 'node2', self.names[ self.dst[ edge ] ] ) )
+        if self.port1[ edge ] != self.noPort:
+            items += ( ( 'port1', self.port1[ edge ] ),
+                       ( 'port2', self.port2[ edge ] ) )
+        return CompactAttrs( items, self, edge=edge )
+
+    def add_edge( self, src, dst, key=None, attr_dict=None, **attrs ):
+        """Add edge to graph
+           key: optional key
+           attr_dict: optional attribute dict
+           attrs: more attributes
+           warning: updates attr_dict with attrs"""
+        attr_dict = {} if attr_dict is None else attr_dict
+        attr_dict.update( attrs )
+        s, d = self.ids.get( src ), self.ids.get( dst )
+        if s is None:
+            s = self.nodeId( src )
+        if d is None:
+            d = self.nodeId( dst )
+        # Scanning the neighbor array is much faster than between()
+        edges = self.between( s, d ) if d in self.nbrs[ s ] else []
+        # If no key, pick next ordinal number
+        if key is None:
+            keys = [ self.key( e ) for e in edges ]
+            keys = [ k for k in keys if isinstance( k, int ) ]
+            key = max( [ 0 ] + keys ) + 1
+        for e in edges:
+            if self.key( e ) == key:
+                # Replace existing edge's attributes
+                self.setEdge( e, attr_dict )
+                return key
+        edge = self.newEdge( s, d, key )
+        self.setEdge( edge, attr_dict )
+        if self.ends[ edge ] and self.port1[ edge ] != self.noPort:
+            self.portCount[ s ] += 1
+            self.portCount[ d ] += 1
+        return key
+
+    def newEdge( self, src, dst, key, attrs=0, ends=False,
+                 port1=noPort, port2=noPort ):
+        """Append an edge between node numbers src and dst
+           key: edge key
+           attrs, ends, port1, port2: array values for the edge
+           returns: edge number"""
+        edge = len( self.src )
+        self.src.append( src )
+        self.dst.append( dst )
+        if key != 1 or type( key ) is not int:
+            self.keys[ edge ] = key
+        self.edgeAttrs.append( attrs )
+        self.ends.append( ends )
+        self.port1.append( port1 )
+        self.port2.append( port2 )
+        self.adj[ src ].append( edge )
+        self.nbrs[ src ].append( dst )
+        if dst != src:
+            self.adj[ dst ].append( edge )
+            self.nbrs[ dst ].append( src )
+        return edge
+
+    # Link options that Topo.addLink() sets and we store in arrays
+    linkKeys = frozenset( ( 'node1', 'node2', 'port1', 'port2' ) )
+
+    def addLink( self, node1, node2, port1=None, port2=None, key=None,
+                 opts=None ):
+        """Add a link for Topo.addLink(), numbering ports as
+           Topo.addPort() would. Unless it is a parallel link or has
+           an explicit key or unusual ports or options, we skip the
+           add_edge() bookkeeping and just append it to our arrays.
+           returns: link key"""
+        opts = {} if opts is None else opts
+        ids, nodeAttrs, portCount = self.ids, self.nodeAttrs, self.portCount
+        # Next port is number of ports + 1 for switches, 0 for hosts
+        if port1 is None:
+            s = ids[ node1 ]
+            port1 = portCount[ s ] + self.switchAttrs[ nodeAttrs[ s ] ]
+        if port2 is None:
+            d = ids[ node2 ]
+            port2 = portCount[ d ] + self.switchAttrs[ nodeAttrs[ d ] ]
+        s, d = ids.get( node1 ), ids.get( node2 )
+        noPort, maxPort = self.noPort, 2 ** 31
+        if ( key is not None or s is None or d is None or
+                d in self.nbrs[ s ] or not self.linkKeys.isdisjoint( opts ) or
+                type( port1 ) is not int or type( port2 ) is not int or
+                not noPort < port1 < maxPort or
+                not noPort < port2 < maxPort ):
+            opts = dict( opts, node1=node1, node2=node2,
+                         port1=port1, port2=port2 )
+            return self.add_edge( node1, node2, key, opts )
+        self.newEdge( s, d, 1, self.intern( opts ), True, port1, port2 )
+        self.portCount[ s ] += 1
+        self.portCount[ d ] += 1
+        return 1
+
+    def nodes( self, data=False ):
+        """Return list of graph nodes
+           data: return list of ( node, attrs)"""
+        return self.node.items() if data else list( self.names )
+
+    def edges_iter( self, data=False, keys=False ):
+        "Iterator: return graph edges, optionally with data and keys"
+        names = self.names
+        for edge in range( len( self.src ) ):
+            src, dst = names[ self.src[ edge ] ], names[ self.dst[ edge ] ]
+            if src > dst:
+                # Same edge order as MultiGraph
+                src, dst = dst, src
+            if data:
+                if keys:
+                    yield src, dst, self.key( edge ), self.getEdge( edge )
+                else:
+                    yield src, dst, self.getEdge( edge )
+            else:
+                if keys:
+                    yield src, dst, self.key( edge )
+                else:
+                    yield src, dst
+
+    def edges( self, data=False, keys=False ):
+        "Return list of graph edges"
+        return list( self.edges_iter( data=data, keys=keys ) )
+
+    def __getitem__( self, node ):
+        "Return link dict for given src node"
+        return CompactAdjacency( self, self.ids[ node ] )
+
+    def __len__( self ):
+        "Return the number of nodes"
+        return len( self.names )
+
+    def convertTo( self, cls, data=False, keys=False ):
+        """Convert to a new object of networkx.MultiGraph-like class cls
+           data: include node and edge data
+           keys: include edge keys as well as edge data"""
+        g = cls()
+        g.add_nodes_from( self.nodes( data=data ) )
+        g.add_edges_from( self.edges( data=( data or keys ), keys=keys ) )
+        return g
+
+
+class CompactAttrs( dict ):
+    """Attribute dict for a CompactGraph node or edge. Changing it in
+       place stores the change in the graph, as it would for a
+       MultiGraph attribute dict."""
+
+    __slots__ = ( 'graph', 'nodeId', 'edge' )
+
+    def __init__( self, items, graph, nodeId=None, edge=None ):
+        """items: attribute items
+           graph: CompactGraph
+           nodeId: node number, for node attributes
+           edge: edge number, for edge attributes"""
+        dict.__init__( self, items )
+        self.graph, self.nodeId, self.edge = graph, nodeId, edge
+
+    def save( self ):
+        "Store our attributes in the graph"
+        graph = self.graph
+        if self.edge is None:
+            graph.nodeAttrs[ self.nodeId ] = graph.intern( self )
+        else:
+            graph.setEdge( self.edge, self )
+        # Sorted links include attribute dicts, so they are now stale
+        graph.sortCache.clear()
+
+    def __setitem__( self, key, value ):
+        dict.__setitem__( self, key, value )
+        self.save()
+
+    def __delitem__( self, key ):
+        dict.__delitem__( self, key )
+        self.save()
+
+    def clear( self ):
+        "Remove all attributes"
+        dict.clear( self )
+        self.save()
+
+    def pop( self, *args ):
+        "Remove attribute and return its value"
+        result = dict.pop( self, *args )
+        self.save()
+        return result
+
+    def popitem( self ):
+        "Remove and return an attribute item"
+        result = dict.popitem( self )
+        self.save()
+        return result
+
+    def setdefault( self, key, default=None ):
+        "Return attribute value, setting it to default if missing"
+        if key not in self:
+            self[ key ] = default
+        return self[ key ]
+
+    def update( self, *args, **kwargs ):
+        "Update attributes"
+        dict.update( self, *args, **kwargs )
+        self.save()
+
+
+class CompactNodes( object ):
+    "CompactGraph node -> attribute dict mapping (CompactGraph.node)"
+
+    def __init__( self, graph ):
+        self.graph = graph
+
+    def __getitem__( self, node ):
+        graph = self.graph
+        nodeId = graph.ids[ node ]
+        return CompactAttrs( graph.attrs[ graph.nodeAttrs[ nodeId ] ],
+                             graph, nodeId=nodeId )
+
+    def __setitem__( self, node, attrs ):
+        self.graph.add_node( node, dict( attrs ) )
+
+    def __contains__( self, node ):
+        return node in self.graph.ids
+
+    def __iter__( self ):
+        return iter( self.graph.names )
+
+    def __len__( self ):
+        return len( self.graph.names )
+
+    def keys( self ):
+        "Return list of nodes"
+        return list( self.graph.names )
+
+    def items( self ):
+        "Return list of ( node, attrs )"
+        return [ ( node, self[ node ] ) for node in self.graph.names ]
+
+
+class CompactPorts( object ):
+    """Node -> CompactNodePorts mapping derived from CompactGraph
+       link ports, for use as Topo.ports"""
+
+    def __init__( self, graph ):
+        self.graph = graph
+
+    def __getitem__( self, node ):
+        return CompactNodePorts( self.graph, self.graph.ids[ node ] )
+
+    def setdefault( self, node, default=None ):
+        "Return ports for node, or default for unknown nodes"
+        if node in self.graph.ids:
+            return self[ node ]
+        return {} if default is None else default
+
+    def __contains__( self, node ):
+        return node in self.graph.ids
+
+    def __iter__( self ):
+        return iter( self.graph.names )
+
+    def __len__( self ):
+        return len( self.graph.names )
+
+
+class CompactNodePorts( object ):
+    """Port -> ( peer, peer port ) mapping for a CompactGraph node;
+       ports are recorded when links are added, so assignment is
+       ignored"""
+
+    def __init__( self, graph, nodeId ):
+        self.graph, self.nodeId = graph, nodeId
+
+    def ports( self ):
+        "Return dict of port -> ( peer, peer port )"
+        graph, nodeId, ports = self.graph, self.nodeId, {}
+        for edge in graph.adj[ nodeId ]:
+            src, dst = graph.src[ edge ], graph.dst[ edge ]
+            port1, port2 = graph.port1[ edge ], graph.port2[ edge ]
+            if graph.noPort in ( port1, port2 ) or not graph.ends[ edge ]:
+                continue
+            if src == nodeId:
+                ports[ port1 ] = ( graph.names[ dst ], port2 )
+            if dst == nodeId:
+                ports[ port2 ] = ( graph.names[ src ], port1 )
+        return ports
+
+    def __len__( self ):
+        return self.graph.portCount[ self.nodeId ]
+
+    def __getitem__( self, port ):
+        return self.ports()[ port ]
+
+    def __setitem__( self, port, peer ):
+        pass
+
+    def __contains__( self, port ):
+        return port in self.ports()
+
+    def __iter__( self ):
+        return iter( self.ports() )
+
+    def keys( self ):
+        "Return list of ports"
+        return list( self.ports() )
+
+    def items( self ):
+        "Return list of ( port, ( peer, peer port ) )"
+        return list( self.ports().items() )
+
+
+class CompactAdjacency( object ):
+    "Neighbor -> CompactEdges mapping for a CompactGraph node"
+
+    def __init__( self, graph, nodeId ):
+        self.graph, self.nodeId = graph, nodeId
+
+    def __getitem__( self, node ):
+        dst = self.graph.ids[ node ]
+        if not self.graph.between( self.nodeId, dst ):
+            raise KeyError( node )
+        return CompactEdges( self.graph, self.nodeId, dst )
+
+    def __contains__( self, node ):
+        return ( node in self.graph.ids and
+                 bool( self.graph.between( self.nodeId,
+                                           self.graph.ids[ node ] ) ) )
+
+    def __iter__( self ):
+        return iter( self.keys() )
+
+    def __len__( self ):
+        return len( self.keys() )
+
+    def keys( self ):
+        "Return list of neighbors"
+        graph, neighbors = self.graph, []
+        for nbr in graph.nbrs[ self.nodeId ]:
+            neighbor = graph.names[ nbr ]
+            if neighbor not in neighbors:
+                neighbors.append( neighbor )
+        return neighbors
+
+    def items( self ):
+        "Return list of ( neighbor, CompactEdges )"
+        return [ ( node, self[ node ] ) for node in self.keys() ]
+
+
+class CompactEdges( object ):
+    "Key -> attribute dict mapping for CompactGraph edges between two nodes"
+
+    def __init__( self, graph, src, dst ):
+        self.graph, self.src, self.dst = graph, src, dst
+
+    def edges( self ):
+        "Return dict of key -> edge number"
+        return { self.graph.key( e ): e
+                 for e in self.graph.between( self.src, self.dst ) }
+
+    def __getitem__( self, key ):
+        return self.graph.getEdge( self.edges()[ key ] )
+
+    def __setitem__( self, key, attrs ):
+        graph = self.graph
+        graph.add_edge( graph.names[ self.src ], graph.names[ self.dst ],
+                        key, dict( attrs ) )
+
+    def __contains__( self, key ):
+        return key in self.edges()
+
+    def __iter__( self ):
+        return iter( self.edges() )
+
+    def __len__( self ):
+        return len( self.edges() )
+
+    def keys( self ):
+        "Return list of keys"
+        return list( self.edges() )
+
+    def items( self ):
+        "Return list of ( key, attrs )"
+        return [ ( key, self.graph.getEdge( edge ) )
+                 for key, edge in self.edges().items() ]
+
+
 class Topo( object ):
     "Data center network representation for structured multi-trees."
 
@@ -108,13 +604,19 @@ def __init__( self, *args, **params ):
            hinfo: default host options
            sopts: default switch options
            lopts: default link options
+           graph: graph class (MultiGraph, or CompactGraph for
+                  very large topologies)
            calls build()"""
-        self.g = MultiGraph()
+        self.g = params.pop( 'graph', MultiGraph )()
         self.hopts = params.pop( 'hopts', {} )
         self.sopts = params.pop( 'sopts', {} )
         self.lopts = params.pop( 'lopts', {} )
+        # Sorted nodes and links, until the graph changes
+        self.sortCache = getattr( self.g, 'sortCache', {} )
         # ports[src][dst][sport] is port on dst that connects to src
-        self.ports = {}
+        self.ports = getattr( self.g, 'ports', {} )
+        # Description saved in topology file, for load()ed topos
+        self.desc = None
         self.build( *args, **params )
 
     def build( self, *args, **params ):
@@ -127,6 +629,7 @@ def addNode( self, name, **opts ):
            opts: node options
            returns: node name"""
         self.g.add_node( name, **opts )
+        self.sortCache.clear()
         return name
 
     def addHost( self, name, **opts ):
@@ -156,6 +659,11 @@ def addLink( self, node1, node2, port1=None, port2=None,
            returns: link info key"""
         if not opts and self.lopts:
             opts = self.lopts
+        self.sortCache.clear()
+        addLink = getattr( self.g, 'addLink', None )
+        if addLink:
+            # CompactGraph numbers ports and stores the link itself
+            return addLink( node1, node2, port1, port2, key, opts )
         port1, port2 = self.addPort( node1, node2, port1, port2 )
         opts = dict( opts )
         opts.update( node1=node1, node2=node2, port1=port1, port2=port2 )
@@ -164,7 +672,9 @@ def addLink( self, node1, node2, port1=None, port2=None,
     def nodes( self, sort=True ):
         "Return nodes in graph"
         if sort:
-            return self.sorted( self.g.nodes() )
+            if 'nodes' not in self.sortCache:
+                self.sortCache[ 'nodes' ] = self.sorted( self.g.nodes() )
+            return list( self.sortCache[ 'nodes' ] )
         else:
             return self.g.nodes()
 
@@ -193,14 +703,14 @@ def iterLinks( self, withKeys=False, withInfo=False ):
             node1, node2 = info[ 'node1' ], info[ 'node2' ]
             if withKeys:
                 if withInfo:
-                    yield( node1, node2, key, info )
+                    yield node1, node2, key, info
                 else:
-                    yield( node1, node2, key )
+                    yield node1, node2, key
             else:
                 if withInfo:
-                    yield( node1, node2, info )
+                    yield node1, node2, info
                 else:
-                    yield( node1, node2 )
+                    yield node1, node2
 
     def links( self, sort=False, withKeys=False, withInfo=False ):
         """Return links
@@ -208,12 +718,16 @@ def links( self, sort=False, withKeys=False, withInfo=False ):
            withKeys: return link keys
            withInfo: return link info
            returns: list of ( src, dst [,key, info ] )"""
-        links = list( self.iterLinks( withKeys, withInfo ) )
         if not sort:
-            return links
-        # Ignore info when sorting
-        tupleSize = 3 if withKeys else 2
-        return sorted( links, key=( lambda l: naturalSeq( l[ :tupleSize ] ) ) )
+            return list( self.iterLinks( withKeys, withInfo ) )
+        cacheKey = ( 'links', withKeys, withInfo )
+        if cacheKey not in self.sortCache:
+            links = self.iterLinks( withKeys, withInfo )
+            # Ignore info when sorting
+            tupleSize = 3 if withKeys else 2
+            self.sortCache[ cacheKey ] = sorted(
+                links, key=( lambda link: naturalSeq( link[ :tupleSize ] ) ) )
+        return list( self.sortCache[ cacheKey ] )
 
     # This legacy port management mechanism is clunky and will probably
     # be removed at some point.
@@ -223,18 +737,17 @@ def addPort( self, src, dst, sport=None, dport=None ):
             src: source switch name
             dst: destination switch name"""
         # Initialize if necessary
-        ports = self.ports
-        ports.setdefault( src, {} )
-        ports.setdefault( dst, {} )
+        srcPorts = self.ports.setdefault( src, {} )
+        dstPorts = self.ports.setdefault( dst, {} )
         # New port: number of outlinks + base
         if sport is None:
             src_base = 1 if self.isSwitch( src ) else 0
-            sport = len( ports[ src ] ) + src_base
+            sport = len( srcPorts ) + src_base
         if dport is None:
             dst_base = 1 if self.isSwitch( dst ) else 0
-            dport = len( ports[ dst ] ) + dst_base
-        ports[ src ][ sport ] = ( dst, dport )
-        ports[ dst ][ dport ] = ( src, sport )
+            dport = len( dstPorts ) + dst_base
+        srcPorts[ sport ] = ( dst, dport )
+        dstPorts[ dport ] = ( src, sport )
         return sport, dport
 
     def port( self, src, dst ):
@@ -268,6 +781,7 @@ def setlinkInfo( self, src, dst, info, key=None ):
         "Set link metadata dict"
         entry, key = self._linkEntry( src, dst, key )
         entry[ key ] = info
+        self.sortCache.clear()
 
     def nodeInfo( self, name ):
         "Return metadata (dict) for node"
@@ -288,6 +802,130 @@ def sorted( items ):
         "Items sorted in natural (i.e. alphabetical) order"
         return sorted( items, key=natural )
 
+    # Topology files: a JSON header line, followed by a JSON line for
+    # each node and each link, in sorted order. Classes in node and
+    # link options are saved by name.
+
+    fileFormat, fileVersion = 'mininet-topo', 1
+
+    def save( self, path, desc=None ):
+        """Save topology to a file that load() can read quickly
+           path: file name (gzipped if it ends in .gz)
+           desc: optional description of where the topology came from
+                 (e.g. mn --topo argument), returned by load() as
+                 topo.desc"""
+        opener = gzip.open if path.endswith( '.gz' ) else open
+        dumps = json.JSONEncoder( default=saveValue ).encode
+        header = { 'format': self.fileFormat, 'version': self.fileVersion,
+                   'graph': type( self.g ).__name__ }
+        if desc is not None:
+            header[ 'desc' ] = desc
+        lines = [ dumps( header ) ]
+        lines += [ dumps( [ 'node', node, self.nodeInfo( node ) ] )
+                   for node in self.nodes() ]
+        for node1, node2, key, info in self.links(
+                sort=True, withKeys=True, withInfo=True ):
+            info = dict( info )
+            del info[ 'node1' ], info[ 'node2' ]
+            lines.append( dumps( [ 'link', node1, node2, key, info ] ) )
+        with opener( path, 'wb' ) as f:
+            f.write( encode( '\n'.join( lines ) + '\n' ) )
+
+    @staticmethod
+    def load( path, graph=None, classes=None ):
+        """Load topology saved by save(), without sorting it again.
+           Only classes in mininet modules are imported by default, so
+           that a topology file can't import arbitrary modules.
+           path: file name (gzipped if it ends in .gz)
+           graph: graph class (default: as saved)
+           classes: other allowed classes and functions, as a dict
+                    of 'module.name' -> class or function
+           returns: Topo, with desc as saved"""
+        opener = gzip.open if path.endswith( '.gz' ) else open
+        with opener( path, 'rb' ) as f:
+            header, _, records = decode( f.read() ).partition( '\n' )
+        try:
+            header = json.loads( header )
+        except ValueError:
+            header = None
+        if ( not isinstance( header, dict ) or
+                header.get( 'format' ) != Topo.fileFormat ):
+            raise Exception( '%s is not a Mininet topology file' % path )
+        if header.get( 'version' ) != Topo.fileVersion:
+            raise Exception( '%s: unsupported topology file version %s' %
+                             ( path, header.get( 'version' ) ) )
+        if graph is None:
+            graph = { 'CompactGraph': CompactGraph }.get(
+                header.get( 'graph' ), MultiGraph )
+        topo = Topo( graph=graph )
+        topo.desc = header.get( 'desc' )
+        # Decoding one JSON list is much faster than decoding each line
+        records = json.loads( '[%s]' % ','.join( records.splitlines() ),
+                              object_hook=partial( loadValue,
+                                                   classes=classes ) )
+        # We only create acyclic objects, so skip garbage collection
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            nodes, links = topo.loadRecords( records )
+        finally:
+            if gcEnabled:
+                gc.enable()
+        # Already sorted
+        topo.sortCache.update( {
+            'nodes': nodes, ( 'links', True, True ): links,
+            ( 'links', False, True ): [ ( node1, node2, info ) for
+                                        node1, node2, _key, info in links ] } )
+        return topo
+
+    def loadRecords( self, records ):
+        """Add nodes and links from topology file records
+           returns: nodes, links ( node1, node2, key, info )"""
+        ports = self.ports if isinstance( self.ports, dict ) else None
+        nodes, links = [], []
+        for record in records:
+            if record[ 0 ] == 'node':
+                _, node, info = record
+                self.g.add_node( node, info )
+                nodes.append( node )
+                if ports is not None:
+                    ports[ node ] = {}
+            elif record[ 0 ] == 'link':
+                _, node1, node2, key, info = record
+                info.update( node1=node1, node2=node2 )
+                port1, port2 = info[ 'port1' ], info[ 'port2' ]
+                if ports is not None:
+                    ports[ node1 ][ port1 ] = ( node2, port2 )
+                    ports[ node2 ][ port2 ] = ( node1, port1 )
+                self.g.add_edge( node1, node2, key, info )
+                links.append( ( node1, node2, key, info ) )
+        return nodes, links
+
+
+def saveValue( value ):
+    "JSON encoder hook: save classes and functions by name"
+    if hasattr( value, '__module__' ) and hasattr( value, '__name__' ):
+        return { '__class__': '%s.%s' % ( value.__module__,
+                                          value.__name__ ) }
+    raise TypeError( 'Cannot save %r in a topology file' % ( value, ) )
+
+
+def loadValue( obj, classes=None ):
+    """JSON decoder hook: load classes and functions saved by saveValue()
+       classes: allowed classes and functions outside of mininet, as a
+                dict of 'module.name' -> class or function"""
+    if len( obj ) == 1 and '__class__' in obj:
+        fullName = obj[ '__class__' ]
+        if classes and fullName in classes:
+            return classes[ fullName ]
+        module, name = fullName.rsplit( '.', 1 )
+        if module != 'mininet' and not module.startswith( 'mininet.' ):
+            raise Exception( 'Topology file refers to %s: only mininet '
+                             'classes can be loaded unless others are '
+                             'given explicitly' % fullName )
+        return getattr( import_module( module ), name )
+    return obj
+
 
 # Our idiom defines additional parameters in build(param...)
 # pylint: disable=arguments-differ
@@ -1,8 +1,10 @@
 "Utility functions for Mininet."
 
 import codecs
+import errno
 import os
 import re
+import socket
 import sys
 
 from collections import namedtuple
@@ -10,12 +12,18 @@
 from functools import partial
 from os import O_NONBLOCK
 from resource import getrlimit, setrlimit, RLIMIT_NPROC, RLIMIT_NOFILE
-from select import poll, POLLIN, POLLHUP
+from select import ( poll, POLLIN, POLLOUT, POLLHUP, epoll, EPOLLIN,
+                     EPOLLET, EPOLLHUP, EPOLLERR )
 from subprocess import call, check_call, Popen, PIPE, STDOUT
 from sys import exit  # pylint: disable=redefined-builtin
-from time import sleep
+from time import sleep, time
+try:
+    from shlex import quote
+except ImportError:
+    from pipes import quote
 
 from mininet.log import output, info, error, warn, debug
+from mininet.netlink import netlinkFor, netlinkError, nsCall
 
 # pylint: disable=too-many-arguments
 
@@ -129,6 +137,11 @@ def oldQuietRun( *cmd ):
 
 CmdResult = namedtuple( 'CmdResult', 'out err ret' )
 
+# Numbers of commands run in the root namespace by errRun() (runs),
+# other processes started by Mininet (popens) and commands sent to
+# node shells (cmds), for Mininet.timings()
+runCounts = { 'runs': 0, 'popens': 0, 'cmds': 0 }
+
 # pylint: disable=too-many-branches,too-many-statements
 def errRun( *cmd, **kwargs ):
     """Run a command and return stdout, stderr and return code
@@ -152,6 +165,15 @@ def errRun( *cmd, **kwargs ):
     elif isinstance( cmd, list ) and shell:
         cmd = " ".join( arg for arg in cmd )
     debug( '*** errRun:', cmd, '\n' )
+    runCounts[ 'runs' ] += 1
+    if rootShell and not echo:
+        try:
+            result = rootShell.run( cmd, stderr=stderr, shell=shell )
+            debug( *result )
+            return result
+        except EOFError:
+            error( '*** Root shell exited: using Popen()\n' )
+            stopRootShell()
     # pylint: disable=consider-using-with
     popen = Popen( cmd, stdout=PIPE, stderr=stderr, shell=shell )
     # We use poll() because select() doesn't work with large fd numbers,
@@ -173,17 +195,22 @@ def errRun( *cmd, **kwargs ):
             f = fdToFile[ fd ]
             decoder = fdToDecoder[ fd ]
             if event & ( POLLIN | POLLHUP ):
-                data = decoder.decode( f.read( 1024 ) )
+                # Read whatever is available rather than blocking
+                data = os.read( fd, 65536 )
+                if not data:
+                    # Stop polling at EOF, or poll() will keep
+                    # returning POLLHUP until the other file is done
+                    poller.unregister( fd )
+                done = not data
+                data = decoder.decode( data )
                 if echo:
                     output( data )
                 if f == popen.stdout:
                     out += data
-                    if data == '':
-                        outDone = True
+                    outDone = outDone or done
                 elif f == popen.stderr:
                     err += data
-                    if data == '':
-                        errDone = True
+                    errDone = errDone or done
             else:  # something unexpected
                 if f == popen.stdout:
                     outDone = True
@@ -201,6 +228,164 @@ def errRun( *cmd, **kwargs ):
 
 # pylint: enable=too-many-branches
 
+
+class RootShell( object ):
+    """Persistent root-namespace bash which runs commands for errRun()
+       Each command costs a fork and exec in bash rather than a Popen()
+       from Python, and several commands may be sent before reading
+       their results. Each command's output is followed by a marker
+       and its exit status."""
+
+    # Stop sending when this many bytes of commands are outstanding,
+    # so that we never block writing while bash blocks writing to us
+    window = 16384
+
+    def __init__( self ):
+        self.marker = '\001mininet-%d\002' % os.getpid()
+        self.mark = encode( self.marker )
+        # pylint: disable=consider-using-with
+        self.popen = Popen( [ 'bash', '--norc', '--noprofile' ],
+                            stdin=PIPE, stdout=PIPE, stderr=PIPE )
+        self.outFd = self.popen.stdout.fileno()
+        self.errFd = self.popen.stderr.fileno()
+        self.poller = poll()
+        self.poller.register( self.outFd, POLLIN )
+        self.poller.register( self.errFd, POLLIN )
+        self.out, self.err = b'', b''
+        self.sent = []
+
+    def send( self, cmd, stderr=PIPE, shell=False ):
+        """Send a command without waiting for it to complete
+           cmd: list of command and args, or shell command string
+           stderr: STDOUT to merge stderr with stdout, None to pass it
+                   through to our stderr
+           shell: cmd is a shell command string"""
+        if not shell:
+            cmd = ' '.join( quote( str( arg ) ) for arg in cmd )
+        # Run in a subshell so that exit, cd etc. don't affect us
+        line = '( eval %s ) </dev/null%s; printf "%%s\\n" %s"$?"; ' \
+               'printf %s >&2\n' % (
+                   quote( cmd ), ' 2>&1' if stderr == STDOUT else '',
+                   quote( self.marker ), quote( self.marker ) )
+        self.popen.stdin.write( encode( line ) )
+        self.popen.stdin.flush()
+        self.sent.append( ( len( line ), shell, stderr ) )
+
+    def receive( self ):
+        """Wait for the oldest outstanding command to complete
+           returns: CmdResult( out, err, ret )"""
+        mark = self.mark
+        while True:
+            outEnd = self.out.find( mark )
+            retEnd = self.out.find( b'\n', outEnd ) if outEnd >= 0 else -1
+            errEnd = self.err.find( mark )
+            if retEnd >= 0 and errEnd >= 0:
+                break
+            for fd, _event in self.poller.poll():
+                data = os.read( fd, 65536 )
+                if not data:
+                    raise EOFError( 'root shell exited' )
+                if fd == self.outFd:
+                    self.out += data
+                else:
+                    self.err += data
+        out, ret = self.out[ :outEnd ], self.out[ outEnd + len( mark ):
+                                                  retEnd ]
+        err = self.err[ :errEnd ]
+        self.out = self.out[ retEnd + 1: ]
+        self.err = self.err[ errEnd + len( mark ): ]
+        _length, shell, stderr = self.sent.pop( 0 )
+        ret = int( ret )
+        if ret == 127 and not shell and b'command not found' in err:
+            # Match Popen()
+            raise OSError( errno.ENOENT, decode( err ).strip() )
+        err = decode( err )
+        if stderr is None:
+            # Like Popen( stderr=None ), send errors to our stderr
+            sys.stderr.write( err )
+            err = ''
+        return CmdResult( decode( out ), err, ret )
+
+    def run( self, cmd, stderr=PIPE, shell=False ):
+        """Run a command and return stdout, stderr and return code
+           cmd: list of command and args, or shell command string
+           stderr: STDOUT to merge stderr with stdout
+           shell: cmd is a shell command string
+           returns: CmdResult( out, err, ret )"""
+        while self.sent:
+            self.receive()
+        self.send( cmd, stderr=stderr, shell=shell )
+        return self.receive()
+
+    def runMany( self, cmds, stderr=PIPE, shell=False ):
+        """Run several commands, sending each command without waiting
+           for the previous ones to complete
+           cmds: list of commands (see run())
+           returns: list of CmdResult( out, err, ret )"""
+        while self.sent:
+            self.receive()
+        results = []
+        for cmd in cmds:
+            while self.sent and ( sum( sent[ 0 ] for sent in self.sent )
+                                  > self.window ):
+                results.append( self.receive() )
+            self.send( cmd, stderr=stderr, shell=shell )
+        while self.sent:
+            results.append( self.receive() )
+        return results
+
+    def close( self ):
+        "Stop our shell"
+        self.popen.stdin.close()
+        self.popen.stdout.close()
+        self.popen.stderr.close()
+        self.popen.wait()
+
+
+rootShell = None
+
+def startRootShell():
+    """Run errRun() and quietRun() commands (except with echo=True)
+       through a persistent root-namespace shell
+       returns: RootShell"""
+    global rootShell  # pylint: disable=global-statement
+    if rootShell is None:
+        rootShell = RootShell()
+    return rootShell
+
+def stopRootShell():
+    "Stop the root shell and go back to running commands with Popen()"
+    global rootShell  # pylint: disable=global-statement
+    if rootShell:
+        shell, rootShell = rootShell, None
+        try:
+            shell.close()
+        except EnvironmentError:
+            pass
+
+def errRuns( cmds, **kwargs ):
+    """Run several commands, pipelined through the root shell if it is
+       running, and return their stdout, stderr and return codes
+       cmds: list of commands (see errRun())
+       kwargs: stderr and shell (see errRun())
+       returns: list of CmdResult( out, err, ret )"""
+    stderr, shell = kwargs.get( 'stderr', PIPE ), kwargs.get( 'shell', False )
+    if rootShell:
+        if shell:
+            cmds = [ cmd if isinstance( cmd, BaseString )
+                     else ' '.join( cmd ) for cmd in cmds ]
+        else:
+            cmds = [ cmd.split( ' ' ) if isinstance( cmd, BaseString )
+                     else cmd for cmd in cmds ]
+        try:
+            results = rootShell.runMany( cmds, stderr=stderr, shell=shell )
+            runCounts[ 'runs' ] += len( cmds )
+            return results
+        except EOFError:
+            error( '*** Root shell exited: using Popen()\n' )
+            stopRootShell()
+    return [ errRun( cmd, **kwargs ) for cmd in cmds ]
+
 def errFail( *cmd, **kwargs ):
     "Run a command using errRun and raise exception on nonzero exit"
     out, err, ret = errRun( *cmd, **kwargs )
@@ -247,7 +432,7 @@ def isShellBuiltin( cmd ):
 # explicitly moved.
 
 def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
-                  deleteIntfs=True, runCmd=None ):
+                  deleteIntfs=True, runCmd=None, netlink=False ):
     """Make a veth pair connnecting new interfaces intf1 and intf2
        intf1: name for interface 1
        intf2: name for interface 2
@@ -257,7 +442,25 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
        node2: home node for interface 2 (optional)
        deleteIntfs: delete intfs before creating them
        runCmd: function to run shell commands (quietRun)
+       netlink: use rtnetlink rather than ip if possible (False)
        raises Exception on failure"""
+    if node2:
+        # Make sure node2's shell has entered its namespace
+        node2.waitStarted()
+    nl1 = netlinkFor( node1 ) if netlink and not runCmd else None
+    if nl1:
+        netns = 1 if not node2 else node2.pid
+        try:
+            if deleteIntfs:
+                nl1.delLink( intf1, missingOk=True )
+                nl2 = netlinkFor( node2 )
+                if nl2:
+                    nl2.delLink( intf2, missingOk=True )
+            nl1.addVeth( intf1, intf2, addr1, addr2, netns=netns )
+        except EnvironmentError as e:
+            raise Exception( "Error creating interface pair (%s,%s): %s " %
+                             ( intf1, intf2, netlinkError( e ) ) )
+        return
     if not runCmd:
         runCmd = quietRun if not node1 else node1.cmd
         runCmd2 = quietRun if not node2 else node2.cmd
@@ -282,6 +485,158 @@ def makeIntfPair( intf1, intf2, addr1=None, addr2=None, node1=None, node2=None,
         raise Exception( "Error creating interface pair (%s,%s): %s " %
                          ( intf1, intf2, cmdOutput ) )
 
+def makeIntfPairs( pairs, up=False ):
+    """Make many veth pairs using a single ip -batch command
+       pairs: list of ( intf1, intf2, addr1, addr2, node1, node2 )
+              as for makeIntfPair(); addresses and nodes may be None
+       up: bring interfaces up, where we can do so in the batch (False)
+       Each interface is created directly in its node's namespace.
+       returns: list of ( up1, up2 ): which interfaces were brought up
+       raises Exception on failure"""
+    lines, isUp = [], []
+    for intf1, intf2, addr1, addr2, node1, node2 in pairs:
+        args, local = [], []
+        for intf, addr, node in ( ( intf1, addr1, node1 ),
+                                  ( intf2, addr2, node2 ) ):
+            if node:
+                # Make sure node's shell has entered its namespace
+                node.waitStarted()
+            args.append( 'name %s%s netns %s' % (
+                intf, ' address %s' % addr if addr else '',
+                node.pid if node else 1 ) )
+            local.append( not node or not node.inNamespace )
+        # The kernel can only bring up the first interface of a new
+        # veth pair, so if just one end is in our namespace we make
+        # it the peer and bring it up with a second command
+        first, peer = ( 1, 0 ) if local[ 0 ] and not local[ 1 ] else ( 0, 1 )
+        flags = [ False, False ]
+        if up:
+            args[ first ] += ' up'
+            flags[ first ] = True
+        lines.append( 'link add %s type veth peer %s\n' %
+                      ( args[ first ], args[ peer ] ) )
+        if up and local[ peer ]:
+            lines.append( 'link set dev %s up\n' %
+                          ( intf1, intf2 )[ peer ] )
+            flags[ peer ] = True
+        isUp.append( tuple( flags ) )
+    if not lines:
+        return isUp
+    popen = Popen(  # pylint: disable=consider-using-with
+        [ 'ip', '-force', '-batch', '-' ], stdin=PIPE,
+        stdout=PIPE, stderr=STDOUT )
+    runCounts[ 'popens' ] += 1
+    out, _err = popen.communicate( encode( ''.join( lines ) ) )
+    if popen.returncode:
+        raise Exception( "Error creating %d interface pairs: %s" %
+                         ( len( pairs ), decode( out ) ) )
+    return isUp
+
+def communicateAll( popens, window=None ):
+    """Send input to and read output from several processes at once.
+       Unlike writing all of the input and then reading the output,
+       this can't deadlock when a process blocks writing to its full
+       output pipe before it has read all of its input.
+       popens: list or iterable of ( popen, input ), where popen has
+               stdin and stdout pipes (stderr merged or not piped),
+               and input is a string or bytes
+       window: maximum number of processes to run at once; with a
+               window, each process is only taken from popens (and
+               so may be started lazily) once there is room for it
+       returns: list of decoded output from each process, once it
+                has exited"""
+    popens = iter( popens )
+    poller = poll()
+    fdToIndex, pending, procs, outs = {}, {}, [], []
+
+    def start():
+        "Start communicating with the next process, if any"
+        try:
+            popen, data = next( popens )
+        except StopIteration:
+            return False
+        fd = popen.stdout.fileno()
+        fdToIndex[ fd ] = len( procs )
+        procs.append( popen )
+        outs.append( [] )
+        poller.register( fd, POLLIN )
+        data = encode( data ) if isinstance( data, BaseString ) else data
+        if data:
+            fd = popen.stdin.fileno()
+            fcntl( fd, F_SETFL, fcntl( fd, F_GETFL ) | O_NONBLOCK )
+            pending[ fd ] = ( popen, memoryview( data ) )
+            poller.register( fd, POLLOUT )
+        else:
+            popen.stdin.close()
+        return True
+
+    running = 0
+    while ( window is None or running < window ) and start():
+        running += 1
+    while running:
+        finished = 0
+        for fd, event in poller.poll():
+            if fd in pending:
+                popen, data = pending[ fd ]
+                try:
+                    data = data[ os.write( fd, data ): ]
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        continue
+                    # EPIPE: it exited without reading everything
+                    data = b''
+                if data:
+                    pending[ fd ] = ( popen, data )
+                    continue
+                poller.unregister( fd )
+                del pending[ fd ]
+                popen.stdin.close()
+                continue
+            if fd not in fdToIndex:
+                # Stale event for a closed stdin
+                continue
+            if event & ( POLLIN | POLLHUP ):
+                data = os.read( fd, 65536 )
+                if data:
+                    outs[ fdToIndex[ fd ] ].append( data )
+                    continue
+            poller.unregister( fd )
+            popen = procs[ fdToIndex.pop( fd ) ]
+            if not popen.stdin.closed:
+                # It exited without reading everything
+                if pending.pop( popen.stdin.fileno(), None ):
+                    poller.unregister( popen.stdin.fileno() )
+                popen.stdin.close()
+            popen.stdout.close()
+            popen.wait()
+            finished += 1
+        # Start more processes only once we are done with this poll()
+        # result, whose fds may otherwise be reused
+        running -= finished
+        while finished and start():
+            finished -= 1
+            running += 1
+    return [ decode( b''.join( out ) ) for out in outs ]
+
+def batchDelIntfs( intfs, procs=4 ):
+    """Delete many root namespace interfaces using ip -batch commands,
+       ignoring any which have already gone away
+       intfs: interface names
+       procs: max number of ip commands to run at once; the kernel
+              takes a while to delete each interface, but it can
+              overlap some of that work"""
+    intfs = list( intfs )
+    popens = []
+    for i in range( min( procs, len( intfs ) ) ):
+        popen = Popen(  # pylint: disable=consider-using-with
+            [ 'ip', '-force', '-batch', '-' ], stdin=PIPE,
+            stdout=PIPE, stderr=STDOUT )
+        runCounts[ 'popens' ] += 1
+        popens.append( ( popen, ''.join(
+            'link del %s\n' % intf for intf in intfs[ i::procs ] ) ) )
+    for out in communicateAll( popens ):
+        debug( '*** deleteIntfs:', out, '\n' )
+
 def retry( retries, delaySecs, fn, *args, **keywords ):
     """Try something several times before giving up.
        n: number of times to retry
@@ -296,14 +651,24 @@ def retry( retries, delaySecs, fn, *args, **keywords ):
         error( "*** gave up after %i retries\n" % tries )
         exit( 1 )
 
-def moveIntfNoRetry( intf, dstNode, printError=False ):
+def moveIntfNoRetry( intf, dstNode, printError=False, netlink=False ):
     """Move interface to node, without retrying.
        intf: string, interface
         dstNode: destination Node
-        printError: if true, print error"""
+        printError: if true, print error
+        netlink: use rtnetlink rather than ip if possible (False)"""
     intf = str( intf )
-    cmd = 'ip link set %s netns %s' % ( intf, dstNode.pid )
-    cmdOutput = quietRun( cmd )
+    dstNode.waitStarted()
+    nl = netlinkFor() if netlink else None
+    if nl:
+        try:
+            nl.setLink( intf, netns=dstNode.pid )
+            cmdOutput = ''
+        except EnvironmentError as e:
+            cmdOutput = netlinkError( e )
+    else:
+        cmd = 'ip link set %s netns %s' % ( intf, dstNode.pid )
+        cmdOutput = quietRun( cmd )
     # If ip link set does not produce any output, then we can assume
     # that the link has been moved successfully.
     if cmdOutput:
@@ -315,13 +680,14 @@ def moveIntfNoRetry( intf, dstNode, printError=False ):
     return True
 
 def moveIntf( intf, dstNode, printError=True,
-              retries=3, delaySecs=0.001 ):
+              retries=3, delaySecs=0.001, netlink=False ):
     """Move interface to node, retrying on failure.
        intf: string, interface
        dstNode: destination Node
-       printError: if true, print error"""
+       printError: if true, print error
+       netlink: use rtnetlink rather than ip if possible (False)"""
     retry( retries, delaySecs, moveIntfNoRetry, intf, dstNode,
-           printError=printError )
+           printError=printError, netlink=netlink )
 
 # Support for dumping network
 
@@ -450,50 +816,296 @@ def makeNumeric( s ):
     else:
         return s
 
+
 # Popen support
 
-def pmonitor(popens, timeoutms=500, readline=True,
-             readmax=1024 ):
+if Python3:
+    def decodeBuffer( data ):
+        "Decode a bytearray or memoryview without copying it first"
+        return str( data, Encoding, 'replace' )
+else:
+    def decodeBuffer( data ):
+        "Return a bytearray or memoryview as a str"
+        return memoryview( data ).tobytes()
+
+if hasattr( os, 'readv' ):
+    def readInto( fd, view ):
+        """Read from fd into a writable memoryview
+           returns: number of bytes read"""
+        return os.readv( fd, [ view ] )
+else:
+    def readInto( fd, view ):
+        """Read from fd into a writable memoryview (Python 2)
+           returns: number of bytes read"""
+        data = os.read( fd, len( view ) )
+        view[ :len( data ) ] = data
+        return len( data )
+
+
+class MuxSource( object ):
+    "An output source for Multiplexer"
+
+    __slots__ = ( 'key', 'fd', 'callback', 'flags', 'pending', 'decoder' )
+
+    def __init__( self, key, fd, callback, flags ):
+        self.key, self.fd, self.callback, self.flags = (
+            key, fd, callback, flags )
+        self.pending = bytearray()
+        self.decoder = getincrementaldecoder()
+
+
+class Multiplexer( object ):
+    """Read output from many files a line (or chunk) at a time.
+       We use edge-triggered epoll, so waiting costs nothing per idle
+       source. Each ready source is read in turn, up to readmax bytes
+       at a time, into a single shared buffer, and complete lines are
+       decoded straight out of it; only partial lines are copied into
+       a source's own buffer. A paused source is not read until it is
+       resumed, so its writer blocks once its pipe fills up.
+       Output is returned by poll() and lines(), or passed to each
+       source's callback by poll() and run()."""
+
+    def __init__( self, readline=True, readmax=65536 ):
+        """readline: return complete lines rather than whatever
+             output is available
+           readmax: maximum bytes read at a time from a source, and
+             maximum line length"""
+        self.readline = readline
+        self.readmax = readmax
+        self.buf = bytearray( readmax )
+        self.view = memoryview( self.buf )
+        self.epoll = epoll()
+        self.sources = {}  # fd -> MuxSource
+        self.keyToFd = {}
+        self.ready = set()  # fds which may be readable
+        self.hungup = set()  # fds which will reach EOF
+        self.paused = set()
+        self.queued = []
+
+    def add( self, key, f, callback=None, data=b'' ):
+        """Start reading from a file
+           key: key returned with its output (e.g. host)
+           f: file object or descriptor
+           callback: optional function which poll() calls with
+             key, output (and key, None at EOF) instead of returning
+             the output
+           data: output that has already been read from f"""
+        fd = f if isinstance( f, int ) else f.fileno()
+        flags = fcntl( fd, F_GETFL )
+        fcntl( fd, F_SETFL, flags | O_NONBLOCK )
+        source = MuxSource( key, fd, callback, flags )
+        self.sources[ fd ] = source
+        self.keyToFd[ key ] = fd
+        self.epoll.register( fd, EPOLLIN | EPOLLET )
+        # Output may be waiting already, and we will not get an edge
+        self.ready.add( fd )
+        if data:
+            data = bytearray( data )
+            self.process( source, data, memoryview( data ), len( data ),
+                          self.queued )
+
+    def remove( self, key ):
+        """Stop reading from a file and restore its flags
+           key: key it was added with
+           returns: output read from it but not yet returned"""
+        fd = self.keyToFd.pop( key )
+        source = self.sources.pop( fd )
+        self.ready.discard( fd )
+        self.hungup.discard( fd )
+        self.paused.discard( fd )
+        try:
+            self.epoll.unregister( fd )
+            fcntl( fd, F_SETFL, source.flags )
+        except EnvironmentError:
+            # Already closed
+            pass
+        return bytes( source.pending )
+
+    def __contains__( self, key ):
+        "returns True if we are reading from key's file"
+        return key in self.keyToFd
+
+    def __len__( self ):
+        "returns number of files we are reading from"
+        return len( self.sources )
+
+    def pause( self, key ):
+        """Stop reading from a file until it is resumed
+           key: key it was added with"""
+        self.paused.add( self.keyToFd[ key ] )
+
+    def resume( self, key ):
+        """Resume reading from a paused file
+           key: key it was added with"""
+        self.paused.discard( self.keyToFd[ key ] )
+
+    def process( self, source, buf, view, count, out ):
+        """Append source's output in buf[ :count ] to out
+           source: MuxSource
+           buf: bytearray
+           view: memoryview of buf
+           count: number of bytes of output
+           out: list of ( source, list of output strings )"""
+        if not self.readline:
+            out.append( ( source, [ source.decoder.decode(
+                bytes( view[ :count ] ) ) ] ) )
+            return
+        readmax, start, lines = self.readmax, 0, []
+        if source.pending:
+            end = buf.find( b'\n', 0, count ) + 1 or count
+            end = min( end, readmax - len( source.pending ) )
+            source.pending += view[ :end ]
+            if ( not source.pending.endswith( b'\n' ) and
+                 len( source.pending ) < readmax ):
+                return
+            # Line is complete or too long to wait for
+            lines.append( decodeBuffer( source.pending ) )
+            source.pending = bytearray()
+            start = end
+        end = buf.rfind( b'\n', start, count ) + 1
+        if end > start:
+            # Decode all complete lines at once and split them in C
+            text = decodeBuffer( view[ start:end ] )
+            lines.extend( [ line + '\n' for line in
+                            text.split( '\n' )[ :-1 ] ] )
+            start = end
+        if count - start >= readmax:
+            lines.append( decodeBuffer( view[ start:count ] ) )
+        elif start < count:
+            source.pending = bytearray( view[ start:count ] )
+        if lines:
+            out.append( ( source, lines ) )
+
+    def read( self, fd, out ):
+        """Read once from fd, appending its output to out
+           fd: ready file descriptor
+           out: list of ( source, list of output strings or None )
+           returns: True if fd may have more output"""
+        source = self.sources[ fd ]
+        try:
+            count = readInto( fd, self.view )
+        except EnvironmentError as e:
+            if e.errno in ( errno.EAGAIN, errno.EWOULDBLOCK ):
+                # Drained: wait for the next edge
+                return False
+            if e.errno != errno.EIO:
+                raise
+            # Pty whose other end has been closed
+            count = 0
+        if count:
+            self.process( source, self.buf, self.view, count, out )
+            # A short read drained fd, so more output will be an
+            # edge; but a hangup only arrives once, so read to EOF
+            return count == self.readmax or fd in self.hungup
+        if source.pending:
+            out.append( ( source, [ decodeBuffer( source.pending ) ] ) )
+            source.pending = bytearray()
+        out.append( ( source, None ) )
+        self.remove( source.key )
+        return False
+
+    def readReady( self, timeoutms=None ):
+        """Wait for output, and read once from each ready file
+           timeoutms: maximum time to wait (None: forever)
+           returns: list of ( source, list of output strings, or
+             None at EOF )"""
+        out, self.queued = self.queued, []
+        while True:
+            busy = out or self.ready - self.paused
+            if busy:
+                # Don't wait, but do look for other ready files
+                timeout = 0
+            elif timeoutms is None:
+                timeout = -1
+            else:
+                timeout = timeoutms / 1000.0
+            for fd, event in self.epoll.poll( timeout ):
+                self.ready.add( fd )
+                if event & ( EPOLLHUP | EPOLLERR ):
+                    self.hungup.add( fd )
+            for fd in list( self.ready ):
+                if fd not in self.paused and not self.read( fd, out ):
+                    self.ready.discard( fd )
+            # Only return empty-handed once we have waited
+            if out or not busy:
+                return out
+
+    def poll( self, timeoutms=None ):
+        """Wait for output, and read once from each ready file
+           timeoutms: maximum time to wait (None: forever)
+           returns: list of ( key, output ) for files without
+             callbacks; output is None at EOF, after which the
+             file has been removed"""
+        results = []
+        for source, lines in self.readReady( timeoutms ):
+            key, callback = source.key, source.callback
+            if lines is None:
+                lines = [ None ]
+            if callback:
+                for line in lines:
+                    callback( key, line )
+            else:
+                results.extend( [ ( key, line ) for line in lines ] )
+        return results
+
+    def lines( self, timeoutms=None, eof=False ):
+        """Generate output until every file has been removed
+           timeoutms: yield None, '' after waiting this long for output
+           eof: also yield key, None when a file reaches EOF
+           yields: key, line (or output)"""
+        while self.sources or self.queued:
+            idle = True
+            for source, lines in self.readReady( timeoutms ):
+                key, callback = source.key, source.callback
+                if lines is None:
+                    if callback:
+                        callback( key, None )
+                    elif eof:
+                        idle = False
+                        yield key, None
+                elif callback:
+                    for line in lines:
+                        callback( key, line )
+                else:
+                    idle = False
+                    for line in lines:
+                        yield key, line
+            if idle and timeoutms is not None:
+                yield None, ''
+
+    def run( self ):
+        """Pass output to callbacks until every file has been removed;
+           output from files without callbacks is discarded"""
+        while self.sources or self.queued:
+            self.poll()
+
+    def close( self ):
+        "Remove all files and close our epoll object"
+        for key in list( self.keyToFd ):
+            self.remove( key )
+        self.epoll.close()
+
+
+def pmonitor( popens, timeoutms=500, readline=True,
+              readmax=65536 ):
     """Monitor dict of hosts to popen objects
        a line at a time
        timeoutms: timeout for poll()
        readline: return single line of output
+       readmax: maximum line/output length
        yields: host, line/output (if any)
        terminates: when all EOFs received"""
-    poller = poll()
-    fdToHost = {}
-    fdToDecoder = {}
+    mux = Multiplexer( readline=readline, readmax=readmax )
     for host, popen in popens.items():
-        fd = popen.stdout.fileno()
-        fdToHost[ fd ] = host
-        fdToDecoder[ fd ] = getincrementaldecoder()
-        poller.register( fd, POLLIN )
-        flags = fcntl( fd, F_GETFL )
-        fcntl( fd, F_SETFL, flags | O_NONBLOCK )
-    # pylint: disable=too-many-nested-blocks
-    while popens:
-        fds = poller.poll( timeoutms )
-        if fds:
-            for fd, event in fds:
-                host = fdToHost[ fd ]
-                decoder = fdToDecoder[ fd ]
-                popen = popens[ host ]
-                if event & ( POLLIN | POLLHUP ):
-                    while True:
-                        try:
-                            f = popen.stdout
-                            line = decoder.decode( f.readline() if readline
-                                                   else f.read( readmax ) )
-                        except IOError:
-                            line = ''
-                        if line == '':
-                            break
-                        yield host, line
-                if event & POLLHUP:
-                    poller.unregister( fd )
-                    del popens[ host ]
-        else:
-            yield None, ''
+        mux.add( host, popen.stdout )
+    try:
+        for host, line in mux.lines( timeoutms, eof=True ):
+            if line is None:
+                del popens[ host ]
+            else:
+                yield host, line
+    finally:
+        mux.close()
 
 # Other stuff we use
 def sysctlTestAndSet( name, limit ):
@@ -690,32 +1302,100 @@ def ensureRoot():
         error( '*** Mininet must run as root.\n' )
         exit( 1 )
 
-def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
-    """Wait until server is listening on port.
+def nodeSocket( node=None, family=socket.AF_INET,
+                stype=socket.SOCK_STREAM ):
+    """Return a non-blocking socket in node's network namespace
+       node: node (None or not in a namespace: our own namespace)
+       family: address family (AF_INET)
+       stype: socket type (SOCK_STREAM)"""
+    if node is None or not node.inNamespace:
+        sock = socket.socket( family, stype )
+    else:
+        # Make sure node's shell has entered its namespace
+        node.waitStarted()
+        sock = nsCall( node.pid, socket.socket, family, stype )
+    sock.setblocking( False )
+    return sock
+
+
+# Connection errors which mean that retrying won't help
+unreachableErrnos = ( errno.ENETUNREACH, errno.EHOSTUNREACH )
+
+
+def connectCmd( ip, port, timeout=1 ):
+    """Return a shell command that tries once to make a TCP connection
+       to ip:port, for nodes whose namespace we can't enter
+       ip: server IP address
+       port: server TCP port
+       timeout: time to wait for the connection, in seconds"""
+    return ( "timeout %s bash -c 'exec 3<>/dev/tcp/%s/%d' 2>&1 && "
+             "echo Connected" % ( timeout, ip, port ) )
+
+def connectCmdErrno( result ):
+    """Return errno for the output of connectCmd()
+       result: command output
+       returns: 0 if connected, else errno"""
+    if 'Connected' in result:
+        return 0
+    if 'No route' in result or 'unreachable' in result:
+        return errno.EHOSTUNREACH
+    return errno.ECONNREFUSED
+
+def connectErrno( ip, port, node=None, timeout=1 ):
+    """Try once to make a TCP connection to ip:port
+       ip: server IP address
+       port: server TCP port
+       node: node to connect from (None: our own namespace)
+       timeout: time to wait for the connection, in seconds
+       returns: 0 if connected, else errno (ETIMEDOUT on timeout)"""
+    if getattr( node, 'isRemote', False ):
+        # We can't enter a remote node's namespace, so ask its shell
+        return connectCmdErrno( node.cmd( connectCmd( ip, port, timeout ) ) )
+    sock = nodeSocket( node )
+    try:
+        err = sock.connect_ex( ( ip, port ) )
+        if err == errno.EINPROGRESS:
+            poller = poll()
+            poller.register( sock, POLLOUT )
+            if not poller.poll( int( timeout * 1000 ) ):
+                return errno.ETIMEDOUT
+            err = sock.getsockopt( socket.SOL_SOCKET, socket.SO_ERROR )
+        return err
+    finally:
+        sock.close()
+
+def waitListening( client=None, server='127.0.0.1', port=80, timeout=None,
+                   maxDelay=.1 ):
+    """Wait until server is listening on port, retrying TCP connections
+       from client's namespace with exponential backoff.
+       client: node to connect from (None: our own namespace)
+       server: server node or IP address
+       port: server TCP port
+       timeout: time to wait, in seconds (None: wait indefinitely)
+       maxDelay: maximum time between connection attempts
        returns True if server is listening"""
-    runCmd = ( client.cmd if client else
-               partial( quietRun, shell=True ) )
-    if not runCmd( 'which telnet' ):
-        raise Exception('Could not find telnet' )
     # pylint: disable=maybe-no-member
     serverIP = server if isinstance( server, BaseString ) else server.IP()
-    cmd = ( 'echo A | telnet -e A %s %s' % ( serverIP, port ) )
-    time = 0
-    result = runCmd( cmd )
-    while 'Connected' not in result:
-        if 'No route' in result:
-            rtable = runCmd( 'route' )
-            error( 'no route to %s:\n%s' % ( server, rtable ) )
+    start = time()
+    delay = .001
+    while True:
+        attempt = 1
+        if timeout:
+            attempt = max( .01, min( attempt, start + timeout - time() ) )
+        err = connectErrno( serverIP, port, client, timeout=attempt )
+        if not err:
+            return True
+        if err in unreachableErrnos:
+            runCmd = ( client.cmd if client else
+                       partial( quietRun, shell=True ) )
+            error( 'no route to %s:\n%s' % ( server, runCmd( 'route' ) ) )
             return False
-        if timeout and time >= timeout:
+        if timeout and time() - start >= timeout:
             error( 'could not connect to %s on port %d\n' % ( server, port ) )
             return False
         debug( 'waiting for', server, 'to listen on port', port, '\n' )
-        info( '.' )
-        sleep( .5 )
-        time += .5
-        result = runCmd( cmd )
-    return True
+        sleep( delay )
+        delay = min( 2 * delay, maxDelay )
 
 def unitScale( num, prefix='' ):
     "Return unit scale prefix and factor"